@@ -15,15 +15,50 @@ La integración permite compartir datos entre módulos y ofrecer una
 experiencia unificada de gestión empresarial.
 """
 
-from flask import Flask, request, jsonify, render_template, session
+from flask import Flask, Response, request, jsonify, render_template, session
+from flask.json.provider import JSONProvider
 import os
-import json
+import time
+import gzip
+import zlib
+import hashlib
+import queue
+import atexit
 import webbrowser
-from threading import Timer
+from threading import Timer, Lock, Event
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeout
 from modules import load_backend_modules
+from modules._cache import DOCUMENT_CACHE
+from modules._results import REPORT_CACHE, ResultCache
+from modules import _serializer as serializer
+from modules import _jobs as jobs
+from modules import _events as events
+from modules._storage import create_storage
+from werkzeug.http import parse_accept_header
+
+try:
+    import brotli
+except ImportError:  # Sin brotli: solo se comprime con gzip
+    brotli = None
+
+class SerializerJSONProvider(JSONProvider):
+    """jsonify y request.get_json con el serializador de los módulos (orjson si está instalado)"""
+    
+    def dumps(self, obj, **kwargs):
+        return serializer.dumps_str(obj, sort_keys=kwargs.get("sort_keys", True), default=str)
+    
+    def loads(self, s, **kwargs):
+        return serializer.loads(s)
+    
+    def response(self, *args, **kwargs):
+        # Siempre compacto (también en modo debug) y con las claves ordenadas, como jsonify
+        obj = self._prepare_response_obj(args, kwargs)
+        return self._app.response_class(serializer.dumps(obj, sort_keys=True, default=str),
+                                        mimetype="application/json")
 
 app = Flask(__name__, static_folder="static", template_folder="templates")
+app.json = SerializerJSONProvider(app)
 app.secret_key = "jocarsa_suite_2026_secret_key"
 
 # Configuración
@@ -33,9 +68,88 @@ DATA_DIR = os.path.join(BASE_DIR, "data")
 # Aseguramos que existe el directorio de datos
 os.makedirs(DATA_DIR, exist_ok=True)
 
+# Almacenamiento de los módulos: "json" (archivos en data/), "jsonlog"
+# (archivos en data/ más log de operaciones) o "sqlite"
+STORAGE_BACKEND = os.environ.get("JOCARSA_STORAGE", "json")
+STORAGE = create_storage(STORAGE_BACKEND, DATA_DIR)
+atexit.register(STORAGE.close)
+
+# Consultas GET /api/module/<name>: campos por los que se puede filtrar y
+# tamaño máximo de página
+QUERY_FILTERS = ("estado", "cliente_id", "proyecto_id", "formulario_id", "tipo", "activo")
+MAX_PAGE_SIZE = 1000
+
+# Acciones máximas por petición execute_batch y acciones que pueden fallar
+# con una excepción en un lote no atómico antes de abortarlo (cada una obliga
+# a deshacer la transacción y repetir el lote)
+MAX_BATCH_SIZE = 10000
+MAX_BATCH_ERRORS = 10
+
+# Exportación NDJSON: tamaño aproximado de cada bloque enviado al cliente
+EXPORT_CHUNK_SIZE = 64 * 1024
+
+# Dashboard: los resúmenes de los módulos se calculan en paralelo y cada uno
+# tiene un tiempo máximo; si lo supera se devuelve su último resumen conocido
+DASHBOARD_WORKERS = int(os.environ.get("JOCARSA_DASHBOARD_WORKERS", "4"))
+DASHBOARD_TIMEOUT = float(os.environ.get("JOCARSA_DASHBOARD_TIMEOUT", "2.0"))
+_dashboard_pool = ThreadPoolExecutor(max_workers=DASHBOARD_WORKERS, thread_name_prefix="dashboard")
+_dashboard_lock = Lock()
+_summaries_in_flight = {}
+_last_summaries = {}
+
+# Compresión de las respuestas JSON: tamaño mínimo y nivel de gzip/brotli
+COMPRESS_MIN_SIZE = 1024
+GZIP_LEVEL = 6
+BROTLI_QUALITY = 5
+
+# Respuestas de GET /api/module/<name> ya codificadas (y comprimidas) por
+# versión de los datos: mientras no cambian no se vuelven a serializar
+RESPONSE_CACHE_MB = int(os.environ.get("JOCARSA_RESPONSE_CACHE_MB", "64"))
+RESPONSE_CACHE = ResultCache(max_entries=512, max_bytes=RESPONSE_CACHE_MB * 1024 * 1024)
+
+# Segundos que los navegadores pueden reutilizar /api/modules sin preguntar
+# (la lista solo cambia al recargar los módulos)
+MODULES_MAX_AGE = int(os.environ.get("JOCARSA_MODULES_MAX_AGE", "86400"))
+
+# Eventos de cambio (/api/events): eventos pendientes como máximo por conexión
+# (si se llena, el cliente recibe "reset" y lo vuelve a pedir todo), segundos
+# entre comentarios para mantener viva la conexión y espera de reconexión
+EVENTS_QUEUE_SIZE = 256
+EVENTS_KEEPALIVE = 15.0
+EVENTS_RETRY_MS = 3000
+
+# Flujos de eventos abiertos a la vez como máximo en este proceso: cada uno
+# ocupa un hilo del servidor mientras dura (serve.py lo ajusta a los hilos
+# de cada worker). Pasado el límite se responde 503 y con 0 no se ofrecen
+# eventos: la interfaz vuelve a pedir los datos como antes
+EVENTS_MAX_STREAMS = int(os.environ.get("JOCARSA_EVENTS_MAX_STREAMS", "32"))
+EVENTS_BUSY_RETRY_MS = 30000
+_events_lock = Lock()
+_events_open = 0
+
+# Al activarse se cierran los flujos de eventos abiertos (parada del servidor)
+EVENTS_STOP = Event()
+
+# Recarga en caliente: se vigilan los archivos de modules/ y cada módulo que
+# cambia se vuelve a importar sin reiniciar (siempre en modo desarrollo)
+MODULES_RELOAD = os.environ.get("JOCARSA_RELOAD") == "1"
+MODULES_RELOAD_INTERVAL = float(os.environ.get("JOCARSA_RELOAD_INTERVAL", "1.0"))
+
 # Cargar módulos backend de forma dinámica
 BACKEND_MODULES = load_backend_modules()
 
+def watch_modules():
+    """Vigila modules/ en este proceso y recarga en caliente los módulos que cambian"""
+    global MODULES_MAX_AGE
+    BACKEND_MODULES.watch(MODULES_RELOAD_INTERVAL)
+    # Los módulos pueden cambiar en cualquier momento: siempre se revalida
+    MODULES_MAX_AGE = 0
+
+# En modo desarrollo (python app.py) se vigila desde __main__, solo en el
+# proceso que atiende las peticiones
+if MODULES_RELOAD and __name__ != "__main__":
+    watch_modules()
+
 @app.route("/")
 def index():
     """Página principal - Dashboard integrado"""
@@ -55,7 +169,17 @@ def api_modules():
         }
         modules.append(module_info)
     
-    return jsonify({"modules": modules})
+    # Si el servidor ofrece /api/events (la interfaz solo se conecta entonces)
+    live = EVENTS_MAX_STREAMS > 0
+    etag = _etag("modules", modules, live)
+    matched = _matching_etag(request.headers.get("If-None-Match"), etag)
+    if matched:
+        return _not_modified(matched)
+    
+    response = jsonify({"modules": modules, "events": live})
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = f"public, max-age={MODULES_MAX_AGE}" if MODULES_MAX_AGE else "no-cache"
+    return response
 
 @app.route("/api/module/<module_name>", methods=["GET", "POST"])
 def api_module(module_name):
@@ -69,11 +193,38 @@ def api_module(module_name):
     if request.method == "GET":
         # Obtener datos del módulo
         try:
-            data = module["get_data"]({
-                "DATA_DIR": DATA_DIR,
-                "session": dict(session)
-            })
-            return jsonify({"ok": True, "data": data})
+            query = _parse_query(request.args)
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
+        
+        # Sin cambios desde la copia del cliente: 304 sin leer ni serializar nada
+        etag = _module_etag(module_name, module, sorted(request.args.items(multi=True)))
+        matched = _matching_etag(request.headers.get("If-None-Match"), etag)
+        if matched:
+            return _not_modified(matched)
+        
+        context = {
+            "DATA_DIR": DATA_DIR,
+            "storage": STORAGE,
+            "session": dict(session),
+            "query": query
+        }
+        try:
+            if etag is None:
+                return jsonify({"ok": True, "data": module["get_data"](context)})
+            
+            body, encoding = _encoded_response(
+                (module_name, tuple(sorted(request.args.items(multi=True)))), etag,
+                _negotiate_encoding(request.headers.get("Accept-Encoding")),
+                lambda: {"ok": True, "data": module["get_data"](context)}
+            )
+            response = Response(body, mimetype="application/json")
+            if encoding is not None:
+                response.headers["Content-Encoding"] = encoding
+                etag = _encoded_etag(etag, encoding)
+            return _with_etag(response, etag)
+        except ValueError as e:
+            return jsonify({"ok": False, "error": str(e)}), 400
         except Exception as e:
             return jsonify({"ok": False, "error": str(e)}), 500
     
@@ -84,10 +235,19 @@ def api_module(module_name):
             action = payload.get("action", "")
             params = payload.get("params", {})
             
+            if action == "execute_batch":
+                payload, status = _execute_batch(module, params, {
+                    "DATA_DIR": DATA_DIR,
+                    "storage": STORAGE,
+                    "session": dict(session)
+                })
+                return jsonify(payload), status
+            
             result = module["execute"]({
                 "action": action,
                 "params": params,
                 "DATA_DIR": DATA_DIR,
+                "storage": STORAGE,
                 "session": dict(session)
             })
             
@@ -95,34 +255,518 @@ def api_module(module_name):
         except Exception as e:
             return jsonify({"ok": False, "error": str(e)}), 500
 
+@app.route("/api/module/<module_name>/export")
+def api_module_export(module_name):
+    """
+    Exporta una colección en NDJSON (un registro JSON por línea).
+    
+    La respuesta se genera por partes a medida que se recorre la colección,
+    sin construirla entera en memoria. Admite los mismos filtros y campos
+    que GET /api/module/<name>; ?cursor=<id> reanuda una exportación
+    interrumpida después del último id recibido. Se comprime con gzip si el
+    cliente lo acepta o si se pide ?gzip=1.
+    """
+    if module_name not in BACKEND_MODULES:
+        return jsonify({"error": "Módulo no encontrado"}), 404
+    
+    module = BACKEND_MODULES[module_name]
+    if module["export"] is None:
+        return jsonify({"ok": False, "error": "El módulo no permite exportar"}), 404
+    
+    try:
+        records = module["export"]({
+            "DATA_DIR": DATA_DIR,
+            "storage": STORAGE,
+            "session": dict(session),
+            "query": _parse_query(request.args)
+        })
+    except ValueError as e:
+        return jsonify({"ok": False, "error": str(e)}), 400
+    
+    # El flujo solo se comprime con gzip (y solo si el cliente lo acepta con q > 0)
+    use_gzip = (request.args.get("gzip") == "1"
+                or _negotiate_encoding(request.headers.get("Accept-Encoding"), ["gzip"]) is not None)
+    body = _ndjson_chunks(records)
+    
+    response = Response(_gzip_chunks(body) if use_gzip else body, mimetype="application/x-ndjson")
+    if use_gzip:
+        response.headers["Content-Encoding"] = "gzip"
+        response.headers["Vary"] = "Accept-Encoding"
+    return response
+
+def _ndjson_chunks(records):
+    """Agrupa los registros serializados en bloques de EXPORT_CHUNK_SIZE bytes aprox."""
+    lines, size = [], 0
+    for record in records:
+        line = serializer.dumps(record) + b"\n"
+        lines.append(line)
+        size += len(line)
+        if size >= EXPORT_CHUNK_SIZE:
+            yield b"".join(lines)
+            lines, size = [], 0
+    if lines:
+        yield b"".join(lines)
+
+def _gzip_chunks(chunks):
+    """Comprime en gzip un flujo de bloques sin esperar a tenerlos todos"""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, zlib.MAX_WBITS | 16)
+    for chunk in chunks:
+        # SYNC_FLUSH: el cliente puede descomprimir cada bloque según llega
+        yield compressor.compress(chunk) + compressor.flush(zlib.Z_SYNC_FLUSH)
+    yield compressor.flush()
+
+class _BatchItemError(Exception):
+    """Fallo de una acción dentro de execute_batch"""
+    
+    def __init__(self, position, message):
+        super().__init__(message)
+        self.position = position
+
+def _execute_batch(module, params, context):
+    """
+    Ejecuta varias acciones del módulo en una sola transacción:
+    
+    {"action": "execute_batch", "params": {"actions": [{action, params}, ...],
+                                           "atomic": false}}
+    
+    Todas las escrituras se persisten de una vez al final. Con atomic, si
+    una acción falla no se aplica ninguna; sin él, las acciones que fallan
+    se descartan y el resto se aplica, salvo si más de MAX_BATCH_ERRORS
+    lanzan una excepción: entonces no se aplica ninguna. Devuelve el
+    resultado de cada acción en el mismo orden.
+    
+    Devuelve (respuesta, código HTTP).
+    """
+    items = params.get("actions")
+    atomic = bool(params.get("atomic", False))
+    
+    if not isinstance(items, list) or not all(isinstance(item, dict) for item in items):
+        return {"ok": False, "error": "actions debe ser una lista de {action, params}"}, 400
+    if len(items) > MAX_BATCH_SIZE:
+        return {"ok": False, "error": f"Máximo {MAX_BATCH_SIZE} acciones por lote"}, 400
+    
+    # Una acción que lanza una excepción puede haber dejado escrituras a
+    # medias: se deshace la transacción y se repite el lote sin ella
+    failed = {}
+    while True:
+        try:
+            results = _run_batch(module, items, atomic, failed, context)
+            break
+        except _BatchItemError as e:
+            if atomic:
+                return {"ok": False, "error": str(e), "failed_index": e.position}, 400
+            failed[e.position] = {"ok": False, "error": str(e)}
+            if len(failed) > MAX_BATCH_ERRORS:
+                return {"ok": False, "failed_index": e.position,
+                        "error": f"Más de {MAX_BATCH_ERRORS} acciones con error: no se ha aplicado el lote"}, 400
+    
+    return {"ok": True, "result": {
+        "results": results,
+        "applied": sum(1 for r in results if r["ok"]),
+        "failed": sum(1 for r in results if not r["ok"])
+    }}, 200
+
+def _run_batch(module, items, atomic, failed, context):
+    """Aplica las acciones del lote (salvo las ya descartadas) en una transacción"""
+    results = []
+    with STORAGE.transaction():
+        for position, item in enumerate(items):
+            if position in failed:
+                results.append(failed[position])
+                continue
+            
+            action = item.get("action", "")
+            if action == "execute_batch":
+                raise _BatchItemError(position, "Los lotes no se pueden anidar")
+            
+            try:
+                result = module["execute"](dict(context, action=action, params=item.get("params", {})))
+            except Exception as e:
+                raise _BatchItemError(position, str(e))
+            
+            if isinstance(result, dict) and "error" in result:
+                if atomic:
+                    raise _BatchItemError(position, result["error"])
+                results.append({"ok": False, "error": result["error"]})
+            else:
+                results.append({"ok": True, "result": result})
+    return results
+
+def _parse_value(value):
+    """Convierte un valor de la URL al tipo que tendría en los datos"""
+    if value.lstrip("-").isdigit():
+        return int(value)
+    if value in ("true", "false"):
+        return value == "true"
+    if value == "null":
+        return None
+    return value
+
+def _parse_query(args):
+    """
+    Traduce los parámetros de GET /api/module/<name> a la consulta que
+    reciben los módulos en context["query"] (None si no hay ninguno):
+    
+    ?collection=clientes,oportunidades&fields=id,nombre&limit=50&cursor=120
+    &estado=abierta&cliente_id=3
+    """
+    if not args:
+        return None
+    
+    query = {}
+    
+    if args.get("collection"):
+        query["collections"] = [c for c in args["collection"].split(",") if c]
+    
+    if args.get("fields"):
+        query["fields"] = [f for f in args["fields"].split(",") if f]
+    
+    if args.get("limit"):
+        if not args["limit"].isdigit() or int(args["limit"]) == 0:
+            raise ValueError("limit debe ser un entero positivo")
+        query["limit"] = min(int(args["limit"]), MAX_PAGE_SIZE)
+    
+    if args.get("cursor"):
+        query["cursor"] = _parse_value(args["cursor"])
+    
+    filters = {field: _parse_value(args[field]) for field in QUERY_FILTERS if field in args}
+    if filters:
+        query["filters"] = filters
+    
+    return query
+
 @app.route("/api/dashboard")
 def api_dashboard():
     """Obtiene datos consolidados de todos los módulos para el dashboard"""
+    started = time.perf_counter()
+    
+    etag = _dashboard_etag()
+    matched = _matching_etag(request.headers.get("If-None-Match"), etag)
+    if matched:
+        return _not_modified(matched)
+    
     dashboard_data = {
         "timestamp": datetime.now().isoformat(),
         "modules_summary": []
     }
     
-    for mod_type, module in BACKEND_MODULES.items():
+    context = {
+        "DATA_DIR": DATA_DIR,
+        "storage": STORAGE,
+        "session": dict(session)
+    }
+    
+    futures = _submit_summaries(BACKEND_MODULES, context)
+    deadline = time.monotonic() + DASHBOARD_TIMEOUT
+    
+    for mod_type, future in futures.items():
+        module = BACKEND_MODULES[mod_type]
+        entry = {"module": mod_type, "name": module["name"]}
+        
         try:
-            summary = module.get("get_summary", lambda x: {})({
-                "DATA_DIR": DATA_DIR,
-                "session": dict(session)
-            })
-            
-            dashboard_data["modules_summary"].append({
-                "module": mod_type,
-                "name": module["name"],
-                "summary": summary
-            })
+            summary, elapsed_ms = future.result(timeout=max(0, deadline - time.monotonic()))
+            entry.update({"summary": summary, "stale": False, "elapsed_ms": elapsed_ms})
+        except FutureTimeout:
+            _stale_summary(mod_type, entry)
         except Exception as e:
-            dashboard_data["modules_summary"].append({
-                "module": mod_type,
-                "name": module["name"],
-                "error": str(e)
-            })
+            entry["error"] = str(e)
+        
+        dashboard_data["modules_summary"].append(entry)
+    
+    dashboard_data["elapsed_ms"] = round((time.perf_counter() - started) * 1000, 2)
+    
+    # Un resumen obsoleto o con error no se puede reutilizar aunque no cambien los datos
+    complete = all(not entry.get("stale") and "error" not in entry for entry in dashboard_data["modules_summary"])
+    return _with_etag(jsonify(dashboard_data), etag if complete else None)
+
+# ----- Peticiones condicionales (ETag) y compresión -----
+
+def _etag(*parts, weak=False):
+    """ETag a partir de los valores de los que depende una respuesta"""
+    digest = hashlib.blake2b(serializer.dumps(parts, default=str), digest_size=12).hexdigest()
+    return f'W/"{digest}"' if weak else f'"{digest}"'
+
+def _module_version(mod_type, module):
+    """
+    Versión de los datos de un módulo: su documento, la versión de este en el
+    almacenamiento, la firma de sus archivos (por si el contador de versiones
+    se reinicia o los datos se editan fuera de la suite) y la del código del
+    módulo (cambia al recargarlo). None si no se sabe de qué documento lee.
+    """
+    document = getattr(module, "document", None)
+    if document is None:
+        return None
+    return [mod_type, document, STORAGE.version(document), STORAGE.signature(document),
+            getattr(module, "signature", None)]
+
+def _module_etag(mod_type, module, args):
+    """ETag fuerte de GET /api/module/<name> con los argumentos args"""
+    version = _module_version(mod_type, module)
+    if version is None:
+        return None
+    return _etag(STORAGE_BACKEND, version, args)
+
+def _dashboard_etag():
+    """
+    ETag del dashboard a partir de las versiones de todos los módulos. Es
+    débil: la fecha y los tiempos de la respuesta cambian aunque los datos no.
+    """
+    versions = [_module_version(mod_type, module) for mod_type, module in BACKEND_MODULES.items()]
+    if any(version is None for version in versions):
+        return None
+    return _etag(STORAGE_BACKEND, "dashboard", versions, weak=True)
+
+def _matching_etag(if_none_match, etag):
+    """
+    ETag de If-None-Match que corresponde a etag (comparación débil y en
+    cualquier codificación), o None si el cliente no tiene esa versión.
+    """
+    if not if_none_match or etag is None:
+        return None
+    if if_none_match.strip() == "*":
+        return etag
+    opaque = _opaque_tag(etag)
+    for candidate in if_none_match.split(","):
+        if _opaque_tag(candidate) == opaque:
+            return candidate.strip()
+    return None
+
+def _opaque_tag(tag):
+    """Valor de una ETag sin W/ ni el sufijo de la compresión"""
+    tag = tag.strip()
+    if tag.startswith("W/"):
+        tag = tag[2:]
+    tag = tag.strip('"')
+    for encoding in ("gzip", "br"):
+        if tag.endswith(f"-{encoding}"):
+            return tag[:-len(encoding) - 1]
+    return tag
+
+def _not_modified(etag):
+    """Respuesta 304: el cliente puede usar su copia (la de etag)"""
+    response = Response(status=304)
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = "no-cache"
+    response.vary.add("Accept-Encoding")
+    return response
+
+def _with_etag(response, etag):
+    """Añade la ETag (si la hay) a una respuesta que el cliente debe revalidar antes de reutilizar"""
+    if etag is not None:
+        response.headers["ETag"] = etag
+        response.headers["Cache-Control"] = "no-cache"
+    return response
+
+def _negotiate_encoding(accept_encoding, available=None):
+    """Codificación preferida por el cliente entre las disponibles (br, gzip por defecto) o None"""
+    if available is None:
+        available = ["br", "gzip"] if brotli is not None else ["gzip"]
+    return parse_accept_header(accept_encoding or "").best_match(available)
+
+def _compress(body, encoding):
+    """Comprime body; gzip sin fecha para que la misma respuesta dé los mismos bytes"""
+    if encoding == "br":
+        return brotli.compress(body, quality=BROTLI_QUALITY)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL, mtime=0)
+
+def _encoded_etag(etag, encoding):
+    """ETag de la respuesta comprimida: distinta de la sin comprimir, como exige una ETag fuerte"""
+    return f'{etag[:-1]}-{encoding}"'
+
+def _encoded_response(key, etag, encoding, payload_fn):
+    """
+    Cuerpo JSON de payload_fn() comprimido con encoding (si merece la pena),
+    guardado en RESPONSE_CACHE para la versión etag. Devuelve (bytes,
+    codificación aplicada o None).
+    """
+    body, _ = RESPONSE_CACHE.get_or_compute((key, None), etag, lambda: serializer.dumps(payload_fn(), sort_keys=True))
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return body, None
+    compressed, _ = RESPONSE_CACHE.get_or_compute((key, encoding), etag, lambda: _compress(body, encoding))
+    return compressed, encoding
+
+@app.after_request
+def compress_response(response):
+    """Comprime las respuestas JSON según Accept-Encoding"""
+    if (response.status_code != 200 or response.is_streamed or response.direct_passthrough
+            or response.mimetype != "application/json" or "Content-Encoding" in response.headers):
+        return response
+    
+    response.vary.add("Accept-Encoding")
+    body = response.get_data()
+    encoding = _negotiate_encoding(request.headers.get("Accept-Encoding"))
+    if encoding is None or len(body) < COMPRESS_MIN_SIZE:
+        return response
+    
+    response.set_data(_compress(body, encoding))
+    response.headers["Content-Encoding"] = encoding
+    if "ETag" in response.headers:
+        response.headers["ETag"] = _encoded_etag(response.headers["ETag"], encoding)
+    return response
+
+def _submit_summaries(modules, context):
+    """Lanza a la vez los resúmenes de modules en el pool (reutilizando los que sigan en curso)"""
+    futures = {}
+    with _dashboard_lock:
+        for mod_type, module in modules.items():
+            future = _summaries_in_flight.get(mod_type)
+            if future is None or future.done():
+                future = _dashboard_pool.submit(_compute_summary, mod_type, module, context)
+                _summaries_in_flight[mod_type] = future
+            futures[mod_type] = future
+    return futures
+
+def _stale_summary(mod_type, entry):
+    """El módulo tarda demasiado: último resumen conocido, marcado como obsoleto"""
+    last = _last_summaries.get(mod_type)
+    entry.update({"summary": last["summary"] if last else {}, "stale": True,
+                  "elapsed_ms": round(DASHBOARD_TIMEOUT * 1000, 2)})
+    if last:
+        entry["computed_at"] = last["computed_at"]
+    else:
+        entry["error"] = "Tiempo de espera agotado"
+
+def _remember_summary(mod_type, summary):
+    _last_summaries[mod_type] = {
+        "summary": summary,
+        "computed_at": datetime.now().isoformat()
+    }
+
+def _compute_summary(mod_type, module, context):
+    """Calcula el resumen de un módulo (en el pool del dashboard) y lo recuerda"""
+    started = time.perf_counter()
+    summary = module.get("get_summary", lambda x: {})(context)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    
+    _remember_summary(mod_type, summary)
+    return summary, elapsed_ms
+
+@app.route("/api/events")
+def api_events():
+    """
+    Flujo Server-Sent Events con los cambios de los módulos.
+    
+    Cada evento "change" lleva el módulo, la colección, la operación
+    (insert/update/delete), el registro o los campos que cambian y los
+    deltas de los agregados; cada evento "summary" lleva el resumen del
+    dashboard de un módulo. La interfaz los aplica sobre lo que ya tiene y
+    solo vuelve a pedir los datos completos al reconectar o tras un "reset".
     
-    return jsonify(dashboard_data)
+    Cada conexión abierta ocupa un hilo del servidor mientras dure: como
+    mucho hay EVENTS_MAX_STREAMS a la vez y las demás reciben 503.
+    """
+    release = _reserve_event_stream()
+    if release is None:
+        response = Response(f"retry: {EVENTS_BUSY_RETRY_MS}\n\n", status=503, mimetype="text/event-stream")
+        response.headers["Retry-After"] = str(EVENTS_BUSY_RETRY_MS // 1000)
+        return response
+    
+    bus = events.bus_for(STORAGE.data_dir)
+    
+    def stream():
+        pending = queue.Queue(maxsize=EVENTS_QUEUE_SIZE)
+        overflow = Event()
+        
+        def deliver(event):
+            try:
+                pending.put_nowait(event)
+            except queue.Full:
+                overflow.set()
+        
+        token = bus.subscribe(deliver)
+        try:
+            yield f"retry: {EVENTS_RETRY_MS}\n\n".encode("utf-8")
+            last_sent = time.monotonic()
+            while not EVENTS_STOP.is_set():
+                try:
+                    event = pending.get(timeout=1.0)
+                except queue.Empty:
+                    if time.monotonic() - last_sent >= EVENTS_KEEPALIVE:
+                        # Comentario: mantiene la conexión y detecta clientes que se han ido
+                        yield b": ping\n\n"
+                        last_sent = time.monotonic()
+                    continue
+                if overflow.is_set():
+                    overflow.clear()
+                    _drain(pending)
+                    event = {"type": "reset"}
+                yield _sse(event)
+                last_sent = time.monotonic()
+        finally:
+            bus.unsubscribe(token)
+    
+    response = Response(stream(), mimetype="text/event-stream")
+    response.headers["Cache-Control"] = "no-cache"
+    response.headers["X-Accel-Buffering"] = "no"
+    # Al cerrar la respuesta, aunque el cliente se vaya antes de empezar el flujo
+    response.call_on_close(release)
+    return response
+
+def _reserve_event_stream():
+    """Ocupa un hueco de flujo de eventos: devuelve la función que lo libera, o None si no quedan"""
+    global _events_open
+    with _events_lock:
+        if _events_open >= EVENTS_MAX_STREAMS:
+            return None
+        _events_open += 1
+    
+    released = Event()
+    
+    def release():
+        global _events_open
+        if released.is_set():
+            return
+        released.set()
+        with _events_lock:
+            _events_open -= 1
+    
+    return release
+
+def _sse(event):
+    """Un evento en formato Server-Sent Events"""
+    data = serializer.dumps_str(event, default=str)
+    return f"event: {event.get('type', 'message')}\ndata: {data}\n\n".encode("utf-8")
+
+def _drain(pending):
+    """Vacía la cola de eventos de una conexión"""
+    while True:
+        try:
+            pending.get_nowait()
+        except queue.Empty:
+            return
+
+@app.route("/healthz")
+def healthz():
+    """Comprobación de estado para el servidor de producción y balanceadores"""
+    return jsonify({
+        "status": "ok",
+        "pid": os.getpid(),
+        "modules": len(BACKEND_MODULES),
+        "storage": STORAGE_BACKEND
+    })
+
+@app.route("/api/metrics")
+def api_metrics():
+    """Métricas internas de la suite (cachés y almacenamiento)"""
+    return jsonify({
+        "cache": DOCUMENT_CACHE.stats(),
+        "reports": REPORT_CACHE.stats(),
+        "responses": RESPONSE_CACHE.stats(),
+        "serializer": serializer.BACKEND,
+        "jobs": jobs.stats(),
+        "modules": BACKEND_MODULES.stats(),
+        "events": dict(events.bus_for(STORAGE.data_dir).stats(),
+                       streams=_events_open, max_streams=EVENTS_MAX_STREAMS),
+        "storage": STORAGE.stats()
+    })
+
+def start_modules():
+    """Arranca en este proceso las tareas en segundo plano de los módulos (informes programados...)"""
+    BACKEND_MODULES.start({
+        "DATA_DIR": DATA_DIR,
+        "storage": STORAGE,
+        "session": {}
+    })
 
 def open_browser():
     """Abre el navegador automáticamente"""
@@ -135,8 +779,17 @@ if __name__ == "__main__":
     print(f"\n📦 Módulos cargados: {len(BACKEND_MODULES)}")
     for mod_name, mod_data in BACKEND_MODULES.items():
         print(f"  {mod_data.get('icon', '📦')} {mod_data['name']}")
-    print(f"\n🌐 Abriendo navegador en http://127.0.0.1:5000/")
+    print(f"\n💾 Almacenamiento: {STORAGE_BACKEND}")
+    print(f"🚀 Modo desarrollo (para producción: python serve.py)")
+    print(f"🌐 Abriendo navegador en http://127.0.0.1:5000/")
     print("=" * 60)
     
+    # Con el recargador de Flask atiende las peticiones el proceso hijo. El
+    # recargador reinicia el proceso si cambia app.py, pero no por modules/:
+    # esos archivos se recargan en caliente sin reiniciar
+    if os.environ.get("WERKZEUG_RUN_MAIN") == "true":
+        watch_modules()
+        start_modules()
     Timer(1.0, open_browser).start()
-    app.run(debug=True, port=5000)
+    app.run(debug=True, port=5000,
+            exclude_patterns=[os.path.join(os.path.abspath(BACKEND_MODULES.base_dir), "*")])
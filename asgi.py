@@ -0,0 +1,394 @@
+"""
+Jocarsa Suite - Aplicación ASGI
+Misma API que app.py (/api/modules, /api/module/<name>, su exportación y
+/api/dashboard) para servidores asíncronos como uvicorn o hypercorn:
+
+    uvicorn asgi:application --port 5000
+
+/api/events (Server-Sent Events) no ocupa ningún hilo mientras espera: los
+eventos se pasan al bucle de eventos desde el hilo lector del bus.
+
+Los módulos pueden definir versiones "async def" de get_data, execute y
+get_summary (get_data_async, ...), que se ejecutan en el bucle de eventos.
+Las funciones normales se ejecutan en un pool de hilos, así que una lectura
+o escritura lenta en disco no bloquea al resto de conexiones.
+
+La interfaz web (/ y /static) la sigue sirviendo app.py; aquí no hay sesión
+de Flask y los módulos reciben una sesión vacía.
+"""
+
+import os
+import time
+import asyncio
+from datetime import datetime
+from urllib.parse import parse_qsl
+from concurrent.futures import ThreadPoolExecutor
+
+# Registro de módulos, almacenamiento y lógica compartida con la app Flask
+import app as suite
+from modules import _events as events
+from modules import _serializer as serializer
+
+# Hilos para las funciones síncronas de los módulos
+ASGI_THREADS = int(os.environ.get("JOCARSA_ASGI_THREADS", "32"))
+_executor = ThreadPoolExecutor(max_workers=ASGI_THREADS, thread_name_prefix="asgi")
+
+
+def _context(**extra):
+    context = {
+        "DATA_DIR": suite.DATA_DIR,
+        "storage": suite.STORAGE,
+        "session": {}
+    }
+    context.update(extra)
+    return context
+
+
+async def _call(module, function_name, context):
+    """Llama a la versión async de la función del módulo o, si no la tiene, a la normal en el pool"""
+    async_function = module.get(f"{function_name}_async")
+    if async_function is not None:
+        return await async_function(context)
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, module[function_name], context)
+
+
+async def _run(function, *args):
+    """Ejecuta una función bloqueante en el pool"""
+    loop = asyncio.get_running_loop()
+    return await loop.run_in_executor(_executor, function, *args)
+
+
+# ----- Respuestas -----
+
+def _header(scope, name):
+    """Valor de una cabecera de la petición (o None)"""
+    for key, value in scope["headers"]:
+        if key == name:
+            return value.decode("latin-1")
+    return None
+
+
+async def _send_json(send, payload, status=200, scope=None, etag=None, cache_control="no-cache"):
+    """
+    Envía payload en JSON. Con scope se comprime según Accept-Encoding (ver
+    compress_response en app.py); con etag se añade la ETag.
+    """
+    body = serializer.dumps(payload)
+    headers = [(b"content-type", b"application/json; charset=utf-8")]
+
+    encoding = None
+    if scope is not None and status == 200:
+        headers.append((b"vary", b"Accept-Encoding"))
+        encoding = suite._negotiate_encoding(_header(scope, b"accept-encoding"))
+        if encoding is not None and len(body) >= suite.COMPRESS_MIN_SIZE:
+            body = await _run(suite._compress, body, encoding)
+            headers.append((b"content-encoding", encoding.encode()))
+        else:
+            encoding = None
+    if etag is not None:
+        headers += [
+            (b"etag", (suite._encoded_etag(etag, encoding) if encoding else etag).encode()),
+            (b"cache-control", cache_control.encode())
+        ]
+
+    await _send_body(send, body, status, headers)
+
+
+async def _send_body(send, body, status, headers):
+    headers = headers + [(b"content-length", str(len(body)).encode())]
+    await send({"type": "http.response.start", "status": status, "headers": headers})
+    await send({"type": "http.response.body", "body": body})
+
+
+async def _not_modified(scope, send, etag):
+    """304 si el cliente ya tiene la versión etag; devuelve si se ha enviado"""
+    matched = suite._matching_etag(_header(scope, b"if-none-match"), etag)
+    if not matched:
+        return False
+    await send({
+        "type": "http.response.start",
+        "status": 304,
+        "headers": [(b"etag", matched.encode()), (b"cache-control", b"no-cache"), (b"vary", b"Accept-Encoding")]
+    })
+    await send({"type": "http.response.body", "body": b""})
+    return True
+
+
+async def _read_body(receive) -> bytes:
+    chunks = []
+    while True:
+        message = await receive()
+        if message["type"] == "http.disconnect":
+            break
+        chunks.append(message.get("body", b""))
+        if not message.get("more_body"):
+            break
+    return b"".join(chunks)
+
+
+async def _wait_disconnect(receive):
+    """Termina cuando el cliente cierra la conexión"""
+    while (await receive())["type"] != "http.disconnect":
+        pass
+
+
+# ----- Endpoints -----
+
+async def api_modules(scope, receive, send):
+    """Devuelve la lista de módulos disponibles"""
+    modules = [
+        {
+            "type": mod_type,
+            "name": mod_data["name"],
+            "description": mod_data["description"],
+            "icon": mod_data.get("icon", "📦"),
+            "category": mod_data.get("category", "general")
+        }
+        for mod_type, mod_data in suite.BACKEND_MODULES.items()
+    ]
+    # Aquí los flujos de eventos no ocupan hilos: siempre se ofrecen
+    etag = suite._etag("modules", modules, True)
+    if await _not_modified(scope, send, etag):
+        return
+    max_age = suite.MODULES_MAX_AGE
+    await _send_json(send, {"modules": modules, "events": True}, scope=scope, etag=etag,
+                     cache_control=f"public, max-age={max_age}" if max_age else "no-cache")
+
+
+async def api_module(scope, receive, send, module_name):
+    """Obtiene los datos de un módulo (GET) o ejecuta una acción (POST)"""
+    module = suite.BACKEND_MODULES[module_name]
+
+    if scope["method"] == "GET":
+        try:
+            args = parse_qsl(scope["query_string"].decode())
+            query = suite._parse_query(dict(args))
+            etag = await _run(suite._module_etag, module_name, module, sorted(args))
+            if await _not_modified(scope, send, etag):
+                return
+            context = _context(query=query)
+            if etag is None or module.get("get_data_async") is not None:
+                data = await _call(module, "get_data", context)
+            else:
+                # Respuesta ya codificada de RESPONSE_CACHE (ver api_module en app.py)
+                encoding = suite._negotiate_encoding(_header(scope, b"accept-encoding"))
+                body, encoding = await _run(suite._encoded_response, (module_name, tuple(sorted(args))), etag, encoding,
+                                            lambda: {"ok": True, "data": module["get_data"](context)})
+                headers = [(b"content-type", b"application/json; charset=utf-8"), (b"vary", b"Accept-Encoding"),
+                           (b"cache-control", b"no-cache")]
+                if encoding is not None:
+                    headers.append((b"content-encoding", encoding.encode()))
+                    etag = suite._encoded_etag(etag, encoding)
+                return await _send_body(send, body, 200, headers + [(b"etag", etag.encode())])
+        except ValueError as e:
+            return await _send_json(send, {"ok": False, "error": str(e)}, 400)
+        except Exception as e:
+            return await _send_json(send, {"ok": False, "error": str(e)}, 500)
+        return await _send_json(send, {"ok": True, "data": data}, scope=scope, etag=etag)
+
+    if scope["method"] != "POST":
+        return await _send_json(send, {"error": "Método no permitido"}, 405)
+
+    try:
+        payload = serializer.loads(await _read_body(receive) or b"{}")
+        action = payload.get("action", "")
+        params = payload.get("params", {})
+
+        if action == "execute_batch":
+            # El lote es una sola transacción: se ejecuta entero en un hilo
+            result, status = await _run(suite._execute_batch, module, params, _context())
+            return await _send_json(send, result, status)
+
+        result = await _call(module, "execute", _context(action=action, params=params))
+    except Exception as e:
+        return await _send_json(send, {"ok": False, "error": str(e)}, 500)
+    await _send_json(send, {"ok": True, "result": result}, scope=scope)
+
+
+async def api_module_export(scope, receive, send, module_name):
+    """Exporta una colección en NDJSON (ver api_module_export en app.py)"""
+    module = suite.BACKEND_MODULES[module_name]
+    if module["export"] is None:
+        return await _send_json(send, {"ok": False, "error": "El módulo no permite exportar"}, 404)
+
+    args = dict(parse_qsl(scope["query_string"].decode()))
+    try:
+        records = await _run(module["export"], _context(query=suite._parse_query(args)))
+    except ValueError as e:
+        return await _send_json(send, {"ok": False, "error": str(e)}, 400)
+
+    use_gzip = (args.get("gzip") == "1"
+                or suite._negotiate_encoding(_header(scope, b"accept-encoding"), ["gzip"]) is not None)
+    chunks = suite._ndjson_chunks(records)
+    if use_gzip:
+        chunks = suite._gzip_chunks(chunks)
+
+    response_headers = [(b"content-type", b"application/x-ndjson")]
+    if use_gzip:
+        response_headers += [(b"content-encoding", b"gzip"), (b"vary", b"Accept-Encoding")]
+    await send({"type": "http.response.start", "status": 200, "headers": response_headers})
+
+    # Cada bloque se genera en el pool: recorrer la colección no bloquea el bucle
+    while True:
+        chunk = await _run(next, chunks, None)
+        if chunk is None:
+            break
+        await send({"type": "http.response.body", "body": chunk, "more_body": True})
+    await send({"type": "http.response.body", "body": b""})
+
+
+async def api_dashboard(scope, receive, send):
+    """Datos consolidados de todos los módulos (ver api_dashboard en app.py)"""
+    started = time.perf_counter()
+    context = _context()
+
+    etag = await _run(suite._dashboard_etag)
+    if await _not_modified(scope, send, etag):
+        return
+
+    # Los módulos síncronos comparten el pool y los resúmenes en curso de app.py
+    sync_modules = {t: m for t, m in suite.BACKEND_MODULES.items() if m.get("get_summary_async") is None}
+    futures = {t: asyncio.wrap_future(f) for t, f in suite._submit_summaries(sync_modules, context).items()}
+    for mod_type, module in suite.BACKEND_MODULES.items():
+        if mod_type not in sync_modules:
+            futures[mod_type] = asyncio.ensure_future(_compute_summary_async(mod_type, module, context))
+
+    if futures:
+        await asyncio.wait(futures.values(), timeout=suite.DASHBOARD_TIMEOUT)
+
+    summaries = []
+    for mod_type, module in suite.BACKEND_MODULES.items():
+        future = futures[mod_type]
+        entry = {"module": mod_type, "name": module["name"]}
+        if not future.done():
+            suite._stale_summary(mod_type, entry)
+        elif future.exception() is not None:
+            entry["error"] = str(future.exception())
+        else:
+            summary, elapsed_ms = future.result()
+            entry.update({"summary": summary, "stale": False, "elapsed_ms": elapsed_ms})
+        summaries.append(entry)
+
+    complete = all(not entry.get("stale") and "error" not in entry for entry in summaries)
+    await _send_json(send, {
+        "timestamp": datetime.now().isoformat(),
+        "modules_summary": summaries,
+        "elapsed_ms": round((time.perf_counter() - started) * 1000, 2)
+    }, scope=scope, etag=etag if complete else None)
+
+
+async def _compute_summary_async(mod_type, module, context):
+    """Resumen de un módulo con get_summary_async, recordado como el de los síncronos"""
+    started = time.perf_counter()
+    summary = await module["get_summary_async"](context)
+    elapsed_ms = round((time.perf_counter() - started) * 1000, 2)
+    suite._remember_summary(mod_type, summary)
+    return summary, elapsed_ms
+
+
+async def api_events(scope, receive, send):
+    """Flujo Server-Sent Events con los cambios de los módulos (ver api_events en app.py)"""
+    loop = asyncio.get_running_loop()
+    pending = asyncio.Queue(maxsize=suite.EVENTS_QUEUE_SIZE)
+    overflow = False
+
+    def enqueue(event):
+        nonlocal overflow
+        try:
+            pending.put_nowait(event)
+        except asyncio.QueueFull:
+            overflow = True
+
+    bus = events.bus_for(suite.STORAGE.data_dir)
+    token = bus.subscribe(lambda event: loop.call_soon_threadsafe(enqueue, event))
+    disconnected = asyncio.ensure_future(_wait_disconnect(receive))
+    try:
+        await send({
+            "type": "http.response.start",
+            "status": 200,
+            "headers": [
+                (b"content-type", b"text/event-stream; charset=utf-8"),
+                (b"cache-control", b"no-cache"),
+                (b"x-accel-buffering", b"no")
+            ]
+        })
+        await send({"type": "http.response.body", "body": f"retry: {suite.EVENTS_RETRY_MS}\n\n".encode(), "more_body": True})
+        while True:
+            next_event = asyncio.ensure_future(pending.get())
+            done, _ = await asyncio.wait({next_event, disconnected}, timeout=suite.EVENTS_KEEPALIVE,
+                                         return_when=asyncio.FIRST_COMPLETED)
+            if disconnected in done:
+                next_event.cancel()
+                return
+            if next_event not in done:
+                next_event.cancel()
+                await send({"type": "http.response.body", "body": b": ping\n\n", "more_body": True})
+                continue
+            event = next_event.result()
+            if overflow:
+                overflow = False
+                while not pending.empty():
+                    pending.get_nowait()
+                event = {"type": "reset"}
+            await send({"type": "http.response.body", "body": suite._sse(event), "more_body": True})
+    finally:
+        bus.unsubscribe(token)
+        disconnected.cancel()
+
+
+async def healthz(scope, receive, send):
+    """Comprobación de estado"""
+    await _send_json(send, {
+        "status": "ok",
+        "pid": os.getpid(),
+        "modules": len(suite.BACKEND_MODULES),
+        "storage": suite.STORAGE_BACKEND
+    })
+
+
+# ----- Aplicación -----
+
+async def _lifespan(receive, send):
+    while True:
+        message = await receive()
+        if message["type"] == "lifespan.startup":
+            # Tareas en segundo plano de los módulos (informes programados...)
+            await _run(suite.start_modules)
+            await send({"type": "lifespan.startup.complete"})
+        elif message["type"] == "lifespan.shutdown":
+            _executor.shutdown(wait=True)
+            suite.STORAGE.close()
+            await send({"type": "lifespan.shutdown.complete"})
+            return
+
+
+async def application(scope, receive, send):
+    """Punto de entrada ASGI"""
+    if scope["type"] == "lifespan":
+        return await _lifespan(receive, send)
+    if scope["type"] != "http":
+        return
+
+    path = scope["path"].rstrip("/") or "/"
+    parts = path.strip("/").split("/")
+
+    if path == "/api/modules":
+        return await api_modules(scope, receive, send)
+    if path == "/api/dashboard":
+        return await api_dashboard(scope, receive, send)
+    if path == "/api/events":
+        return await api_events(scope, receive, send)
+    if path == "/healthz":
+        return await healthz(scope, receive, send)
+
+    if len(parts) in (3, 4) and parts[:2] == ["api", "module"]:
+        module_name = parts[2]
+        if module_name not in suite.BACKEND_MODULES:
+            return await _send_json(send, {"error": "Módulo no encontrado"}, 404)
+        if len(parts) == 3:
+            return await api_module(scope, receive, send, module_name)
+        if parts[3] == "export":
+            return await api_module_export(scope, receive, send, module_name)
+
+    await _send_json(send, {"error": "No encontrado"}, 404)
@@ -0,0 +1,109 @@
+"""
+Benchmark de la analítica en columnas (modules/_columnar.py)
+Genera tareas sintéticas y compara la agrupación con bucles de diccionarios
+(como hacían los informes) con la de ColumnTable, tanto con la tabla ya
+construida como en el primer informe tras un cambio (construcción incluida).
+
+Uso:
+    python benchmarks/columnar_tareas.py [--tareas 1000000]
+"""
+
+import os
+import sys
+import time
+import random
+import argparse
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules._columnar import AVAILABLE, ColumnTable  # noqa: E402
+
+ESTADOS = ["pendiente", "en_progreso", "completada"]
+ASIGNADOS = ["Analista", "Desarrollador Backend", "Desarrollador Frontend", "Diseñador UX", ""]
+
+
+def generar_tareas(total, proyectos=500):
+    rnd = random.Random(42)
+    tareas = []
+    for i in range(total):
+        estado = rnd.choice(ESTADOS)
+        tareas.append({
+            "id": i + 1,
+            "proyecto_id": rnd.randint(1, proyectos),
+            "asignado_a": rnd.choice(ASIGNADOS),
+            "estado": estado,
+            "tiempo_estimado": rnd.randint(1, 40),
+            "tiempo_real": rnd.randint(0, 60),
+            "fecha_completada": f"2026-{rnd.randint(1, 12):02d}-15T10:00:00" if estado == "completada" else None
+        })
+    return tareas
+
+
+def con_diccionarios(tareas):
+    desviacion_proyecto = {}
+    desviacion_asignado = {}
+    completadas_mes = {}
+    for t in tareas:
+        diferencia = t.get("tiempo_real", 0) - t.get("tiempo_estimado", 0)
+        desviacion_proyecto[t["proyecto_id"]] = desviacion_proyecto.get(t["proyecto_id"], 0) + diferencia
+        desviacion_asignado[t["asignado_a"]] = desviacion_asignado.get(t["asignado_a"], 0) + diferencia
+        if t["estado"] == "completada":
+            mes = t["fecha_completada"][:7]
+            completadas_mes[mes] = completadas_mes.get(mes, 0) + 1
+    return desviacion_proyecto, desviacion_asignado, completadas_mes
+
+
+def con_columnas(tabla):
+    resultado = []
+    for campo in ("proyecto_id", "asignado_a"):
+        estimadas = tabla.group_sum(campo, "tiempo_estimado")
+        reales = tabla.group_sum(campo, "tiempo_real")
+        resultado.append({clave: reales[clave] - estimadas[clave] for clave in estimadas})
+    resultado.append(tabla.group_sum("fecha_completada.mes", mask=tabla.mask("estado", ["completada"])))
+    return tuple(resultado)
+
+
+def medir(funcion, *args, repeticiones=3):
+    """Mejor tiempo (en segundos) de varias ejecuciones"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de la analítica en columnas")
+    parser.add_argument("--tareas", type=int, default=1_000_000)
+    args = parser.parse_args()
+
+    print(f"NumPy: {'sí' if AVAILABLE else 'no (implementación en Python puro)'}")
+    print(f"Generando {args.tareas} tareas...")
+    tareas = generar_tareas(args.tareas)
+
+    t_diccionarios, esperado = medir(con_diccionarios, tareas)
+    t_construir, tabla = medir(lambda: ColumnTable(
+        tareas,
+        numeric=("tiempo_estimado", "tiempo_real"),
+        categorical=("proyecto_id", "asignado_a", "estado"),
+        months=("fecha_completada",)
+    ), repeticiones=1)
+    t_columnas, obtenido = medir(con_columnas, tabla)
+
+    # Mismos resultados (la tabla omite el mes None de las tareas sin completar)
+    obtenido_meses = {k: v for k, v in obtenido[2].items() if k is not None}
+    assert obtenido[0] == esperado[0] and obtenido[1] == esperado[1] and obtenido_meses == esperado[2]
+
+    # La tabla se reconstruye tras cada escritura en el documento: el primer
+    # informe después de un cambio paga la construcción y la consulta
+    t_primero = t_construir + t_columnas
+    print(f"Bucles de diccionarios:   {t_diccionarios * 1000:9.1f} ms")
+    print(f"Construcción de la tabla: {t_construir * 1000:9.1f} ms (una vez por versión del documento)")
+    print(f"Consulta en columnas:     {t_columnas * 1000:9.1f} ms ({t_diccionarios / t_columnas:.1f}x)")
+    print(f"Primer informe tras un cambio: {t_primero * 1000:9.1f} ms ({t_diccionarios / t_primero:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,127 @@
+"""
+Benchmark de memoria de los registros compactos (modules/_records.py)
+Genera tareas y respuestas sintéticas, las decodifica como al cargar un
+documento y compara los bytes por registro en memoria:
+
+- antes: un dict por registro, tal cual sale del JSON
+- compactos: registros con __slots__ y los campos tipo enumerado internados
+
+También mide lo que cuesta: cargar (decodificar y compactar), leer un campo
+de cada registro y serializarlos para una respuesta.
+
+Uso:
+    python benchmarks/records_memory.py [--registros 200000]
+"""
+
+import os
+import sys
+import gc
+import time
+import random
+import argparse
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import _serializer as serializer  # noqa: E402
+from modules import _records as records  # noqa: E402
+from modules import proyectos, formularios  # noqa: E402,F401  (registran sus colecciones)
+
+ESTADOS = ["pendiente", "en_proceso", "completada"]
+ASIGNADOS = ["Analista", "Desarrollador Backend", "Desarrollador Frontend", "Diseñador UX", ""]
+USUARIOS = ["Anónimo", "agus", "maria", "jose"]
+
+
+def generar_tarea(rnd, i):
+    tarea = {
+        "id": i + 1,
+        "proyecto_id": rnd.randint(1, 500),
+        "titulo": f"Tarea {i + 1} de revisión",
+        "descripcion": "Preparar la documentación y validar con el cliente",
+        "estado": rnd.choice(ESTADOS),
+        "prioridad": rnd.choice(["baja", "media", "alta"]),
+        "asignado_a": rnd.choice(ASIGNADOS),
+        "fecha_creacion": f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T10:00:00",
+        "fecha_vencimiento": None,
+        "tiempo_estimado": rnd.randint(1, 40),
+        "tiempo_real": rnd.randint(0, 60)
+    }
+    if tarea["estado"] == "completada":
+        tarea["fecha_completada"] = tarea["fecha_creacion"]
+    return tarea
+
+
+def generar_respuesta(rnd, i):
+    return {
+        "id": i + 1,
+        "formulario_id": rnd.randint(1, 50),
+        "respuestas": {"nombre": f"Persona {i}", "valoracion": rnd.randint(1, 5)},
+        "fecha": f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T10:00:00",
+        "ip": f"10.0.{rnd.randint(0, 255)}.{rnd.randint(0, 255)}",
+        "usuario": rnd.choice(USUARIOS)
+    }
+
+
+def cargar(contenido, compactar):
+    data = serializer.loads(contenido)
+    if compactar:
+        records.compact_document(data)
+    return data
+
+
+def medir_memoria(contenido, compactar):
+    """Bytes que ocupa el documento cargado (los dicts intermedios ya liberados)"""
+    gc.collect()
+    tracemalloc.start()
+    data = cargar(contenido, compactar)
+    gc.collect()
+    ocupado, _ = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return ocupado, data
+
+
+def medir_tiempo(funcion, *args):
+    inicio = time.perf_counter()
+    funcion(*args)
+    return time.perf_counter() - inicio
+
+
+def leer_campo(data, coleccion, campo):
+    return sum(1 for r in data[coleccion] if r.get(campo))
+
+
+def comparar(coleccion, generar, campo, total):
+    rnd = random.Random(42)
+    contenido = serializer.dumps({coleccion: [generar(rnd, i) for i in range(total)]})
+
+    bytes_antes, antes = medir_memoria(contenido, compactar=False)
+    bytes_compactos, compactos = medir_memoria(contenido, compactar=True)
+    assert compactos == antes
+    assert serializer.loads(serializer.dumps(compactos)) == antes
+
+    print(f"{coleccion} ({total} registros, {type(compactos[coleccion][0]).__name__})")
+    print(f"  Memoria:        {bytes_antes / total:7.0f} B/registro -> {bytes_compactos / total:.0f} B/registro "
+          f"({(1 - bytes_compactos / bytes_antes) * 100:.0f}% menos, "
+          f"{bytes_antes / 1024 / 1024:.1f} MB -> {bytes_compactos / 1024 / 1024:.1f} MB)")
+    tiempos = (
+        ("Cargar", medir_tiempo(cargar, contenido, False), medir_tiempo(cargar, contenido, True)),
+        (f"Leer {campo}", medir_tiempo(leer_campo, antes, coleccion, campo),
+         medir_tiempo(leer_campo, compactos, coleccion, campo)),
+        ("Serializar", medir_tiempo(serializer.dumps, antes), medir_tiempo(serializer.dumps, compactos))
+    )
+    for nombre, t_antes, t_nuevo in tiempos:
+        print(f"  {nombre + ':':15s} {t_antes * 1000:7.1f} ms -> {t_nuevo * 1000:.1f} ms")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de memoria de los registros compactos")
+    parser.add_argument("--registros", type=int, default=200000)
+    args = parser.parse_args()
+
+    print(f"Serializador: {serializer.BACKEND}")
+    comparar("tareas", generar_tarea, "estado", args.registros)
+    comparar("respuestas", generar_respuesta, "usuario", args.registros)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,140 @@
+"""
+Benchmark del serializador JSON (modules/_serializer.py)
+Genera un documento sintético (por defecto de unos 100 MB con el formato
+anterior) y compara guardarlo, cargarlo y responderlo por la API:
+
+- antes: json con sangría en disco y el codificador por defecto de Flask
+  (claves ordenadas y caracteres no ASCII escapados)
+- serializador: JSON compacto con orjson si está instalado (si no, json)
+- respuesta ya codificada: acierto en la caché de respuestas por versión
+
+Uso:
+    python benchmarks/serializer.py [--mb 100] [--repeticiones 1]
+"""
+
+import os
+import sys
+import json
+import time
+import random
+import argparse
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules import _serializer as serializer  # noqa: E402
+from modules._results import ResultCache  # noqa: E402
+
+ESTADOS = ["pendiente", "en_progreso", "completada"]
+ASIGNADOS = ["Analista", "Desarrollador Backend", "Desarrollador Frontend", "Diseñador UX", ""]
+
+
+def generar_tarea(rnd, i):
+    return {
+        "id": i + 1,
+        "proyecto_id": rnd.randint(1, 500),
+        "titulo": f"Tarea {i + 1} de revisión y diseño",
+        "descripcion": "Preparar la documentación, revisar el código y validar con el cliente " * rnd.randint(1, 3),
+        "asignado_a": rnd.choice(ASIGNADOS),
+        "estado": rnd.choice(ESTADOS),
+        "prioridad": rnd.choice(["baja", "media", "alta"]),
+        "tiempo_estimado": rnd.randint(1, 40),
+        "tiempo_real": round(rnd.uniform(0, 60), 2),
+        "fecha_creacion": f"2026-{rnd.randint(1, 12):02d}-{rnd.randint(1, 28):02d}T10:00:00"
+    }
+
+
+def generar_documento(mb):
+    """Documento con tareas suficientes para ocupar unos mb megas con el formato anterior"""
+    rnd = random.Random(42)
+    muestra = [generar_tarea(rnd, i) for i in range(1000)]
+    por_tarea = len(json.dumps(muestra, indent=2, ensure_ascii=False).encode("utf-8")) / len(muestra)
+    total = int(mb * 1024 * 1024 / por_tarea)
+    return {"proyectos": [], "tareas": muestra + [generar_tarea(rnd, i) for i in range(len(muestra), total)]}
+
+
+def guardar_antes(path, data):
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f, indent=2, ensure_ascii=False)
+
+
+def cargar_antes(path):
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def guardar_serializador(path, data):
+    with open(path, "wb") as f:
+        f.write(serializer.dump_document(data))
+
+
+def cargar_serializador(path):
+    with open(path, "rb") as f:
+        return serializer.loads(f.read())
+
+
+def responder_antes(data):
+    # Lo que hacía jsonify con el proveedor JSON por defecto de Flask
+    return json.dumps({"ok": True, "data": data}, sort_keys=True, separators=(",", ":")).encode("utf-8")
+
+
+def responder_serializador(data):
+    return serializer.dumps({"ok": True, "data": data}, sort_keys=True)
+
+
+def medir(funcion, *args, repeticiones=1):
+    """Mejor tiempo (en segundos) de varias ejecuciones"""
+    mejor = None
+    for _ in range(repeticiones):
+        inicio = time.perf_counter()
+        resultado = funcion(*args)
+        transcurrido = time.perf_counter() - inicio
+        mejor = transcurrido if mejor is None else min(mejor, transcurrido)
+    return mejor, resultado
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark del serializador JSON")
+    parser.add_argument("--mb", type=float, default=100)
+    parser.add_argument("--repeticiones", type=int, default=1)
+    args = parser.parse_args()
+    repeticiones = args.repeticiones
+
+    print(f"Serializador: {serializer.BACKEND}")
+    data = generar_documento(args.mb)
+    print(f"Documento: {len(data['tareas'])} tareas")
+
+    with tempfile.TemporaryDirectory() as directorio:
+        antes = os.path.join(directorio, "antes.json")
+        nuevo = os.path.join(directorio, "nuevo.json")
+
+        t_guardar_antes, _ = medir(guardar_antes, antes, data, repeticiones=repeticiones)
+        t_guardar, _ = medir(guardar_serializador, nuevo, data, repeticiones=repeticiones)
+        t_cargar_antes, cargado_antes = medir(cargar_antes, antes, repeticiones=repeticiones)
+        t_cargar, cargado = medir(cargar_serializador, nuevo, repeticiones=repeticiones)
+        assert cargado == cargado_antes == data
+        mb_antes = os.path.getsize(antes) / 1024 / 1024
+        mb_nuevo = os.path.getsize(nuevo) / 1024 / 1024
+
+    t_responder_antes, cuerpo_antes = medir(responder_antes, data, repeticiones=repeticiones)
+    t_responder, cuerpo = medir(responder_serializador, data, repeticiones=repeticiones)
+    assert serializer.loads(cuerpo) == json.loads(cuerpo_antes)
+
+    # Respuesta ya codificada: mientras la versión no cambia es un acierto de la caché
+    cache = ResultCache(max_bytes=len(cuerpo) * 2)
+    cache.get_or_compute("tareas", (1,), lambda: cuerpo)
+    t_cache, _ = medir(lambda: cache.get_or_compute("tareas", (1,), lambda: responder_serializador(data)),
+                       repeticiones=max(repeticiones, 3))
+
+    print(f"Tamaño en disco:  {mb_antes:9.1f} MB -> {mb_nuevo:.1f} MB ({(1 - mb_nuevo / mb_antes) * 100:.0f}% menos)")
+    print(f"Guardar:          {t_guardar_antes * 1000:9.1f} ms -> {t_guardar * 1000:.1f} ms "
+          f"({t_guardar_antes / t_guardar:.1f}x)")
+    print(f"Cargar:           {t_cargar_antes * 1000:9.1f} ms -> {t_cargar * 1000:.1f} ms "
+          f"({t_cargar_antes / t_cargar:.1f}x)")
+    print(f"Responder:        {t_responder_antes * 1000:9.1f} ms -> {t_responder * 1000:.1f} ms "
+          f"({t_responder_antes / t_responder:.1f}x)")
+    print(f"Respuesta ya codificada: {t_cache * 1000:.3f} ms")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,79 @@
+"""
+Benchmark de arranque de Jocarsa Suite
+Mide en procesos nuevos (arranque en frío) cuánto tarda en importarse app.py
+con el registro de módulos bajo demanda y cuánto tardaría importando todos
+los módulos al arrancar, además del tiempo de importación de cada módulo.
+
+Uso:
+    python benchmarks/startup.py [--repeticiones 5] [--max-ms 1500]
+
+Con --max-ms termina con código 1 si el arranque (mediana) supera ese
+presupuesto, para detectar regresiones.
+"""
+
+import os
+import sys
+import json
+import statistics
+import subprocess
+import argparse
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Se ejecuta en un proceso nuevo: importa app y mide
+_PROBE = """
+import json, sys, time
+started = time.perf_counter()
+import app
+registered = time.perf_counter()
+if sys.argv[1] == "eager":
+    app.BACKEND_MODULES.load_all()
+loaded = time.perf_counter()
+print(json.dumps({
+    "startup_ms": (loaded - started) * 1000,
+    "register_ms": (registered - started) * 1000,
+    "modules": app.BACKEND_MODULES.stats()
+}))
+"""
+
+
+def medir(modo, repeticiones):
+    """Resultados de repeticiones arranques en frío en el modo indicado"""
+    resultados = []
+    for _ in range(repeticiones):
+        salida = subprocess.run(
+            [sys.executable, "-c", _PROBE, modo],
+            cwd=BASE_DIR, capture_output=True, text=True, check=True
+        ).stdout
+        # La última línea es el JSON (antes van los mensajes del registro)
+        resultados.append(json.loads(salida.strip().splitlines()[-1]))
+    return resultados
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark de arranque de Jocarsa Suite")
+    parser.add_argument("--repeticiones", type=int, default=5)
+    parser.add_argument("--max-ms", type=float, default=None,
+                        help="Presupuesto de arranque bajo demanda (mediana, ms)")
+    args = parser.parse_args()
+
+    bajo_demanda = medir("lazy", args.repeticiones)
+    todos = medir("eager", args.repeticiones)
+
+    mediana_lazy = statistics.median(r["startup_ms"] for r in bajo_demanda)
+    mediana_eager = statistics.median(r["startup_ms"] for r in todos)
+    print(f"Arranque con módulos bajo demanda: {mediana_lazy:8.1f} ms (mediana de {args.repeticiones})")
+    print(f"Arranque importando todos:         {mediana_eager:8.1f} ms")
+
+    print("Importación de cada módulo (mediana):")
+    for module_type in todos[0]["modules"]:
+        tiempos = [r["modules"][module_type]["import_ms"] for r in todos]
+        print(f"  {module_type:<15} {statistics.median(tiempos):8.1f} ms")
+
+    if args.max_ms is not None and mediana_lazy > args.max_ms:
+        print(f"❌ El arranque supera el presupuesto de {args.max_ms} ms")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
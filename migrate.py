@@ -0,0 +1,31 @@
+"""
+Migración de datos de Jocarsa Suite
+Copia de una sola vez los archivos data/*.json al almacenamiento SQLite.
+
+Uso:
+    python migrate.py [--data-dir data] [--db data/jocarsa.db]
+
+Después se puede arrancar la suite con JOCARSA_STORAGE=sqlite.
+"""
+
+import os
+import argparse
+from modules._storage import migrate_json_to_sqlite
+
+BASE_DIR = os.path.dirname(__file__)
+
+def main():
+    parser = argparse.ArgumentParser(description="Migra los datos JSON a SQLite")
+    parser.add_argument("--data-dir", default=os.path.join(BASE_DIR, "data"))
+    parser.add_argument("--db", default=None, help="Ruta de la base de datos (por defecto data/jocarsa.db)")
+    args = parser.parse_args()
+    
+    migrated = migrate_json_to_sqlite(args.data_dir, args.db)
+    
+    for document, collections in migrated.items():
+        print(f"✅ {document}")
+        for collection, count in collections.items():
+            print(f"   {collection}: {count} registros")
+
+if __name__ == "__main__":
+    main()
@@ -1,11 +1,29 @@
 """
 Sistema de carga dinámica de módulos para Jocarsa Suite
-Busca y carga automáticamente todos los módulos desde la carpeta modules/
+Busca todos los módulos de la carpeta modules/ y los registra sin importarlos:
+MODULE_INFO se lee analizando el código fuente (ast), así que /api/modules no
+ejecuta ningún módulo. El código de cada módulo se importa la primera vez que
+se usa una de sus funciones, y se anota cuánto ha tardado la importación.
 """
 
+import ast
 import importlib.util
+import inspect
 import os
-from typing import Dict, Any
+import threading
+import time
+from collections.abc import MutableMapping
+from typing import Dict, Any, Optional, Tuple
+
+from . import _aggregates
+from . import _records
+
+# Campos de MODULE_INFO que se ofrecen sin importar el módulo
+INFO_KEYS = ("name", "description", "icon", "category")
+
+# Funciones del módulo: acceder a cualquiera de ellas lo importa
+FUNCTION_KEYS = ("get_data", "execute", "get_summary", "export", "start",
+                 "get_data_async", "execute_async", "get_summary_async")
 
 def _import_module_from_path(module_name: str, file_path: str):
     """Importa un módulo Python desde una ruta específica"""
@@ -17,71 +35,422 @@ def _import_module_from_path(module_name: str, file_path: str):
     spec.loader.exec_module(mod)
     return mod
 
-def load_backend_modules() -> Dict[str, Dict[str, Any]]:
+# Resultado del análisis de cada archivo: {ruta: (firma del archivo, datos)}
+_discovery_cache: Dict[str, Tuple[Tuple[int, int], Optional[Dict[str, Any]]]] = {}
+_discovery_lock = threading.Lock()
+
+def _parse_module(path: str) -> Optional[Dict[str, Any]]:
     """
-    Escanea la carpeta modules/ y carga todos los módulos que cumplan
-    con la interfaz esperada:
+    Lee sin ejecutarlo lo que el registro necesita de un módulo:
+    MODULE_INFO, DOCUMENT y los nombres definidos en el nivel superior.
     
-    - MODULE_INFO: dict con {name, description, icon, category}
-    - get_data(context): función para obtener datos del módulo
-    - execute(context): función para ejecutar acciones
-    - get_summary(context): función opcional para el dashboard
+    Devuelve None si MODULE_INFO no es un literal (hay que importarlo).
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        tree = ast.parse(f.read(), filename=path)
     
-    Returns:
-        dict: {module_type: {MODULE_INFO, get_data, execute, get_summary}}
+    constants: Dict[str, Any] = {}
+    names = set()
+    for node in tree.body:
+        if isinstance(node, (ast.FunctionDef, ast.AsyncFunctionDef)):
+            names.add(node.name)
+        elif isinstance(node, ast.Assign):
+            for target in node.targets:
+                if isinstance(target, ast.Name):
+                    names.add(target.id)
+                    if target.id in ("MODULE_INFO", "DOCUMENT"):
+                        try:
+                            constants[target.id] = ast.literal_eval(node.value)
+                        except ValueError:
+                            constants.pop(target.id, None)
+        elif isinstance(node, (ast.Import, ast.ImportFrom)):
+            names.update((alias.asname or alias.name).split(".")[0] for alias in node.names)
+    
+    if not isinstance(constants.get("MODULE_INFO"), dict):
+        return None
+    return {"info": constants["MODULE_INFO"], "document": constants.get("DOCUMENT"), "names": names}
+
+def _discover(path: str) -> Optional[Dict[str, Any]]:
+    """Análisis de un módulo, reutilizado mientras el archivo no cambie"""
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    with _discovery_lock:
+        entry = _discovery_cache.get(path)
+        if entry is not None and entry[0] == signature:
+            return entry[1]
+    
+    parsed = _parse_module(path)
+    with _discovery_lock:
+        _discovery_cache[path] = (signature, parsed)
+    return parsed
+
+def _module_functions(mod, filename: str) -> Dict[str, Any]:
+    """Funciones de un módulo importado, validando la interfaz"""
+    get_data = getattr(mod, "get_data", None)
+    execute = getattr(mod, "execute", None)
+    
+    if not callable(get_data):
+        raise ImportError(f"Módulo {filename}: no tiene función get_data()")
+    
+    if not callable(execute):
+        raise ImportError(f"Módulo {filename}: no tiene función execute()")
+    
+    # Función opcional para el dashboard
+    get_summary = getattr(mod, "get_summary", None)
+    
+    # Función opcional para la exportación
+    export = getattr(mod, "export", None)
+    
+    # Función opcional de arranque del proceso (tareas en segundo plano)
+    start = getattr(mod, "start", None)
+    
+    # Versiones async opcionales (None si el módulo no las tiene)
+    async_functions = {}
+    for function_name in ("get_data", "execute", "get_summary"):
+        function = getattr(mod, f"{function_name}_async", None)
+        async_functions[f"{function_name}_async"] = function if inspect.iscoroutinefunction(function) else None
+    
+    return {
+        "get_data": get_data,
+        "execute": execute,
+        "get_summary": get_summary if callable(get_summary) else lambda x: {},
+        "export": export if callable(export) else None,
+        "start": start if callable(start) else None,
+        **async_functions
+    }
+
+class ModuleEntry(MutableMapping):
     """
+    Entrada del registro de un módulo.
     
-    registry: Dict[str, Dict[str, Any]] = {}
-    base_dir = os.path.dirname(__file__)
+    Se usa como el dict de siempre ({name, description, icon, category,
+    get_data, execute, ...}): los campos de MODULE_INFO están disponibles
+    desde el principio y el módulo se importa al pedir una de sus funciones.
     
-    for filename in os.listdir(base_dir):
-        # Solo archivos Python (excepto __init__.py y archivos privados)
-        if not filename.endswith(".py"):
-            continue
-        if filename.startswith("__") or filename.startswith("_"):
-            continue
-        
-        path = os.path.join(base_dir, filename)
-        mod_name = f"modules.{filename[:-3]}"
+    reload() importa de nuevo el archivo y sustituye las funciones de una
+    sola vez: quien ya tenía una función de la versión anterior termina con
+    ella y las llamadas siguientes usan la nueva.
+    """
+    
+    def __init__(self, module_type: str, path: str, info: Dict[str, Any], document: Optional[str] = None,
+                 signature: Optional[Tuple[int, int]] = None, startup: bool = False):
+        self.module_type = module_type
+        self.path = path
+        self.signature = signature
+        self.import_ms: Optional[float] = None
+        self.reloads = 0
+        self.reload_error: Optional[str] = None
+        self._functions: Optional[Dict[str, Any]] = None
+        self._lock = threading.Lock()
+        self.describe(info, document, startup)
+    
+    def describe(self, info: Dict[str, Any], document: Optional[str], startup: bool = False):
+        """Fija los datos de MODULE_INFO, el documento del módulo y si define start()"""
+        self.document = document
+        self.startup = startup
+        self.info = {
+            "name": info.get("name", self.module_type),
+            "description": info.get("description", "Sin descripción"),
+            "icon": info.get("icon", "📦"),
+            "category": info.get("category", "general")
+        }
+    
+    @property
+    def loaded(self) -> bool:
+        return self._functions is not None
+    
+    def install(self, mod, started: float):
+        """Registra las funciones de un módulo ya importado (importación iniciada en started)"""
+        functions = _module_functions(mod, os.path.basename(self.path))
+        self.import_ms = round((time.perf_counter() - started) * 1000, 2)
+        self._functions = functions
+        return functions
+    
+    def _import(self):
+        started = time.perf_counter()
+        mod = _import_module_from_path(f"modules.{self.module_type}", self.path)
+        return self.install(mod, started)
+    
+    def load(self) -> Dict[str, Any]:
+        """Importa el módulo (solo la primera vez) y devuelve sus funciones"""
+        functions = self._functions
+        if functions is not None:
+            return functions
         
-        try:
-            mod = _import_module_from_path(mod_name, path)
-            
-            # Validar que el módulo tiene la estructura correcta
-            module_info = getattr(mod, "MODULE_INFO", None)
-            get_data = getattr(mod, "get_data", None)
-            execute = getattr(mod, "execute", None)
-            
-            if not isinstance(module_info, dict):
-                print(f"⚠️  Módulo {filename}: no tiene MODULE_INFO válido")
-                continue
-            
-            if not callable(get_data):
-                print(f"⚠️  Módulo {filename}: no tiene función get_data()")
+        with self._lock:
+            if self._functions is None:
+                self._import()
+                print(f"📦 Módulo importado: {self.info['name']} ({self.import_ms} ms)")
+            return self._functions
+    
+    def reload(self):
+        """
+        Importa de nuevo el módulo si ya estaba importado. Si la nueva versión
+        falla al importarse se sigue usando la anterior.
+        """
+        with self._lock:
+            if self._functions is None:
+                return
+            try:
+                self._import()
+            except Exception as e:
+                self.reload_error = str(e)
+                raise
+            self.reloads += 1
+            self.reload_error = None
+            print(f"🔄 Módulo recargado: {self.info['name']} ({self.import_ms} ms)")
+    
+    def __getitem__(self, key):
+        if key in self.info:
+            return self.info[key]
+        if key in FUNCTION_KEYS:
+            return self.load()[key]
+        raise KeyError(key)
+    
+    def __setitem__(self, key, value):
+        if key in INFO_KEYS:
+            self.info[key] = value
+        elif key in FUNCTION_KEYS:
+            self.load()[key] = value
+        else:
+            raise KeyError(key)
+    
+    def __delitem__(self, key):
+        raise TypeError("Las entradas del registro tienen un conjunto fijo de claves")
+    
+    def __iter__(self):
+        yield from INFO_KEYS
+        yield from FUNCTION_KEYS
+    
+    def __len__(self):
+        return len(INFO_KEYS) + len(FUNCTION_KEYS)
+
+def _register_file(path: str, lazy: bool = True) -> Optional[ModuleEntry]:
+    """Entrada del registro para un archivo de módulo, o None si no es válido"""
+    filename = os.path.basename(path)
+    module_type = filename[:-3]  # nombre del archivo sin .py
+    
+    st = os.stat(path)
+    signature = (st.st_mtime_ns, st.st_size)
+    parsed = _discover(path)
+    mod = None
+    
+    if parsed is None:
+        # MODULE_INFO calculado: hay que ejecutar el módulo para leerlo
+        started = time.perf_counter()
+        mod = _import_module_from_path(f"modules.{module_type}", path)
+        module_info = getattr(mod, "MODULE_INFO", None)
+        if not isinstance(module_info, dict):
+            print(f"⚠️  Módulo {filename}: no tiene MODULE_INFO válido")
+            return None
+        parsed = {"info": module_info, "document": getattr(mod, "DOCUMENT", None),
+                  "names": set(dir(mod))}
+    
+    # Validar que el módulo tiene la estructura correcta
+    if "get_data" not in parsed["names"]:
+        print(f"⚠️  Módulo {filename}: no tiene función get_data()")
+        return None
+    
+    if "execute" not in parsed["names"]:
+        print(f"⚠️  Módulo {filename}: no tiene función execute()")
+        return None
+    
+    entry = ModuleEntry(module_type, path, parsed["info"], parsed["document"], signature,
+                        "start" in parsed["names"])
+    if mod is not None:
+        entry.install(mod, started)
+    elif not lazy:
+        entry.load()
+    return entry
+
+class ModuleRegistry(dict):
+    """
+    {module_type: ModuleEntry} con métricas de importación.
+    
+    items(), values(), keys() y la iteración devuelven una copia: el
+    vigilante de archivos puede añadir o quitar módulos mientras se recorren.
+    """
+    
+    def __init__(self, base_dir: str, lazy: bool = True):
+        super().__init__()
+        self.base_dir = base_dir
+        self.lazy = lazy
+        self._refresh_lock = threading.Lock()
+        self._watcher: Optional[Tuple[int, threading.Thread]] = None
+    
+    def __iter__(self):
+        return iter(list(super().keys()))
+    
+    def keys(self):
+        return list(super().keys())
+    
+    def values(self):
+        return list(super().values())
+    
+    def items(self):
+        return list(super().items())
+    
+    def _module_files(self) -> Dict[str, str]:
+        """{module_type: ruta} de los archivos de módulo de base_dir"""
+        files = {}
+        for filename in sorted(os.listdir(self.base_dir)):
+            # Solo archivos Python (excepto __init__.py y archivos privados)
+            if not filename.endswith(".py"):
                 continue
-            
-            if not callable(execute):
-                print(f"⚠️  Módulo {filename}: no tiene función execute()")
+            if filename.startswith("__") or filename.startswith("_"):
                 continue
+            files[filename[:-3]] = os.path.join(self.base_dir, filename)
+        return files
+    
+    def scan(self):
+        """Registra todos los módulos de base_dir"""
+        for module_type, path in self._module_files().items():
+            try:
+                entry = _register_file(path, self.lazy)
+                if entry is not None:
+                    self[module_type] = entry
+                    print(f"✅ Módulo registrado: {entry.info['name']}")
+            except Exception as e:
+                print(f"❌ Error cargando {os.path.basename(path)}: {e}")
+    
+    def refresh(self) -> Dict[str, list]:
+        """
+        Aplica los cambios de los archivos de módulo: recarga solo los que han
+        cambiado, registra los nuevos y quita los borrados. Los demás módulos
+        (y sus cachés) no se tocan.
+        """
+        changes: Dict[str, list] = {"reloaded": [], "added": [], "removed": [], "failed": []}
+        with self._refresh_lock:
+            files = self._module_files()
             
-            # Función opcional para el dashboard
-            get_summary = getattr(mod, "get_summary", None)
+            for module_type in self.keys():
+                if module_type not in files:
+                    self.pop(module_type, None)
+                    changes["removed"].append(module_type)
+                    print(f"🗑️  Módulo retirado: {module_type}")
             
-            # Registrar el módulo
-            module_type = filename[:-3]  # nombre del archivo sin .py
-            registry[module_type] = {
-                "name": module_info.get("name", module_type),
-                "description": module_info.get("description", "Sin descripción"),
-                "icon": module_info.get("icon", "📦"),
-                "category": module_info.get("category", "general"),
-                "get_data": get_data,
-                "execute": execute,
-                "get_summary": get_summary if callable(get_summary) else lambda x: {}
+            for module_type, path in files.items():
+                entry = self.get(module_type)
+                try:
+                    st = os.stat(path)
+                    signature = (st.st_mtime_ns, st.st_size)
+                    if entry is not None and entry.signature == signature:
+                        continue
+                    
+                    if entry is None:
+                        entry = _register_file(path, self.lazy)
+                        if entry is not None:
+                            self[module_type] = entry
+                            changes["added"].append(module_type)
+                            print(f"✅ Módulo registrado: {entry.info['name']}")
+                        continue
+                    
+                    # Una versión que no se puede importar se intenta de nuevo
+                    # cuando vuelva a cambiar el archivo, no en cada vuelta
+                    entry.signature = signature
+                    parsed = _discover(path)
+                    if parsed is not None:
+                        entry.describe(parsed["info"], parsed["document"], "start" in parsed["names"])
+                    if entry.loaded:
+                        entry.reload()
+                        changes["reloaded"].append(module_type)
+                except Exception as e:
+                    if entry is not None:
+                        entry.reload_error = str(e)
+                    changes["failed"].append(module_type)
+                    print(f"❌ Error recargando {os.path.basename(path)}: {e}")
+        return changes
+    
+    def watch(self, interval: float = 1.0):
+        """
+        Vigila los archivos de módulo en un hilo y aplica refresh() cada
+        interval segundos. Se puede llamar varias veces: hay un solo hilo por
+        proceso (tras un fork se crea otro).
+        """
+        if self._watcher is not None and self._watcher[0] == os.getpid():
+            return
+        
+        def loop():
+            while True:
+                time.sleep(interval)
+                try:
+                    self.refresh()
+                except Exception as e:
+                    print(f"❌ Error vigilando los módulos: {e}")
+        
+        thread = threading.Thread(target=loop, name="modules-watcher", daemon=True)
+        self._watcher = (os.getpid(), thread)
+        thread.start()
+    
+    def load_all(self):
+        """Importa todos los módulos (por ejemplo antes de crear workers con fork)"""
+        for entry in self.values():
+            entry.load()
+    
+    def start(self, context: Dict[str, Any]):
+        """
+        Llama a start(context) de los módulos que la definen (solo importa
+        esos). El servidor lo llama una vez al arrancar cada proceso.
+        """
+        for module_type, entry in self.items():
+            if not entry.startup:
+                continue
+            try:
+                start = entry["start"]
+                if start is not None:
+                    start(context)
+            except Exception as e:
+                print(f"❌ Error arrancando {module_type}: {e}")
+    
+    def load_document(self, document: str):
+        """Importa el módulo que gestiona un documento (agregados pedidos por otro módulo o registros compactos)"""
+        for entry in self.values():
+            if entry.document == document:
+                entry.load()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Módulos importados, tiempo de importación y recargas de cada uno"""
+        return {
+            module_type: {
+                "loaded": entry.loaded,
+                "import_ms": entry.import_ms,
+                "reloads": entry.reloads,
+                "reload_error": entry.reload_error
             }
-            
-            print(f"✅ Módulo cargado: {module_info.get('name', module_type)}")
-            
-        except Exception as e:
-            print(f"❌ Error cargando {filename}: {e}")
+            for module_type, entry in self.items()
+        }
+
+def load_backend_modules(lazy: bool = True) -> Dict[str, Dict[str, Any]]:
+    """
+    Escanea la carpeta modules/ y registra todos los módulos que cumplan
+    con la interfaz esperada:
+    
+    - MODULE_INFO: dict con {name, description, icon, category}
+    - get_data(context): función para obtener datos del módulo
+    - execute(context): función para ejecutar acciones
+    - get_summary(context): función opcional para el dashboard
+    - export(context): función opcional que recorre una colección registro
+      a registro (exportación NDJSON)
+    - start(context): función opcional que arranca las tareas en segundo
+      plano del módulo en el proceso (ver registry.start)
+    - get_data_async / execute_async / get_summary_async: versiones
+      "async def" opcionales que usa el servidor ASGI (asgi.py)
+    
+    Con lazy=False (o si MODULE_INFO no es un literal) los módulos se
+    importan al registrarlos, como antes. registry.watch() activa la recarga
+    en caliente de los módulos que cambian.
+    
+    Returns:
+        dict: {module_type: {MODULE_INFO, get_data, execute, get_summary, export, start,
+                             get_data_async, execute_async, get_summary_async}}
+    """
+    
+    registry = ModuleRegistry(os.path.dirname(__file__), lazy)
+    registry.scan()
+    
+    # Un módulo puede pedir los agregados de otro que aún no se ha importado
+    _aggregates.set_loader(registry.load_document)
+    # y cada documento se carga con los registros compactos que declara su módulo
+    _records.set_loader(registry.load_document)
     
     return registry
@@ -0,0 +1,147 @@
+"""
+Agregados incrementales para los resúmenes del dashboard
+Cada módulo define qué aporta un registro a sus contadores (función de deltas)
+y los mantiene al día en cada acción de execute(), de modo que get_summary
+no tiene que recorrer las colecciones.
+
+Si se edita a mano el archivo de un documento con la suite en marcha
+(almacenamiento JSON), sus agregados se descartan al releerlo y se recalculan.
+Los cambios hechos con la suite parada, en los shards, con el log de
+operaciones o en la base de datos SQLite no se detectan: después hay que
+llamar a la acción rebuild_aggregates del módulo.
+"""
+
+from typing import Any, Callable, Dict, Optional
+
+# deltas_fn(coleccion, registro, signo) -> {clave: incremento}
+DeltasFn = Callable[[str, dict, int], Dict[str, Any]]
+
+# Diferencia máxima admitida al comparar sumas con decimales
+_TOLERANCE = 1e-6
+
+# Cálculo desde cero de los agregados de cada documento, para poder leerlos
+# desde otros módulos: {documento: compute_fn(storage)}
+_REGISTRY: Dict[str, Callable[[Any], Dict[str, Any]]] = {}
+
+# Importa el módulo dueño de un documento que aún no ha registrado sus
+# agregados (los módulos se importan bajo demanda, ver modules/__init__.py)
+_loader: Optional[Callable[[str], None]] = None
+
+
+def set_loader(loader: Callable[[str], None]):
+    """Fija la función que importa el módulo de un documento"""
+    global _loader
+    _loader = loader
+
+
+def register(document: str, compute_fn: Callable[[Any], Dict[str, Any]]):
+    """Registra cómo calcular desde cero los agregados de un documento"""
+    _REGISTRY[document] = compute_fn
+
+
+def current(storage, document: str) -> Dict[str, Any]:
+    """Agregados de un documento de cualquier módulo (registrado con register)"""
+    compute_fn = _REGISTRY.get(document)
+    if compute_fn is None and _loader is not None:
+        _loader(document)
+        compute_fn = _REGISTRY.get(document)
+    if compute_fn is None:
+        raise KeyError(f"No hay agregados registrados para {document}")
+    return ensure(storage, document, lambda: compute_fn(storage))
+
+
+def combine(*deltas: Dict[str, Any]) -> Dict[str, Any]:
+    """Suma varios diccionarios de deltas descartando los que se anulan"""
+    total: Dict[str, Any] = {}
+    for d in deltas:
+        for key, value in d.items():
+            total[key] = total.get(key, 0) + value
+    return {key: value for key, value in total.items() if value}
+
+
+def changed(deltas_fn: DeltasFn, collection: str, before: Optional[dict], after: Optional[dict]) -> Dict[str, Any]:
+    """Deltas de un registro que pasa de before a after (None = no existe)"""
+    parts = []
+    if before is not None:
+        parts.append(deltas_fn(collection, before, -1))
+    if after is not None:
+        parts.append(deltas_fn(collection, after, 1))
+    return combine(*parts)
+
+
+def compute(deltas_fn: DeltasFn, data: Dict[str, list]) -> Dict[str, Any]:
+    """Agregados calculados desde cero recorriendo todo el documento"""
+    # Los contadores base se guardan aunque sean 0 para distinguir
+    # "sin registros" de "agregados sin calcular"
+    aggregates: Dict[str, Any] = {collection: 0 for collection in data}
+    for collection, records in data.items():
+        for record in records:
+            for key, value in deltas_fn(collection, record, 1).items():
+                aggregates[key] = aggregates.get(key, 0) + value
+    return aggregates
+
+
+def ensure(storage, document: str, compute_fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Agregados del documento, calculándolos la primera vez que se piden"""
+    aggregates = storage.aggregates(document)
+    if aggregates is not None:
+        return aggregates
+
+    with storage.transaction():
+        aggregates = storage.aggregates(document)
+        if aggregates is None:
+            aggregates = compute_fn()
+            storage.set_aggregates(document, aggregates, replace=True)
+    return aggregates
+
+
+def track(storage, document: str, compute_fn: Callable[[], Dict[str, Any]], deltas: Dict[str, Any]):
+    """
+    Aplica deltas a los agregados.
+
+    Se llama dentro de la misma transacción que el cambio y después de
+    aplicarlo: si los agregados aún no existían se calculan desde cero y ya
+    incluyen ese cambio.
+    """
+    with storage.transaction():
+        if storage.aggregates(document) is None:
+            ensure(storage, document, compute_fn)
+        elif deltas:
+            storage.add_aggregates(document, deltas)
+
+
+def drift(stored: Dict[str, Any], computed: Dict[str, Any]) -> Dict[str, Dict[str, Any]]:
+    """Claves cuyo valor guardado no coincide con el recalculado"""
+    differences = {}
+    for key in set(stored) | set(computed):
+        a, b = stored.get(key, 0), computed.get(key, 0)
+        if isinstance(a, (int, float)) and isinstance(b, (int, float)):
+            if abs(a - b) <= _TOLERANCE:
+                continue
+        elif a == b:
+            continue
+        differences[key] = {"guardado": a, "calculado": b}
+    return differences
+
+
+def rebuild(storage, document: str, compute_fn: Callable[[], Dict[str, Any]]) -> Dict[str, Any]:
+    """Recalcula los agregados desde cero, los guarda e informa de las desviaciones"""
+    with storage.transaction():
+        stored = storage.aggregates(document)
+        computed = compute_fn()
+        storage.set_aggregates(document, computed, replace=True)
+
+    # Si nunca se habían calculado no hay nada con qué comparar
+    if stored is None:
+        return {
+            "aggregates": computed,
+            "drift": {},
+            "message": "Agregados calculados (no estaban inicializados)"
+        }
+
+    differences = drift(stored, computed)
+    return {
+        "aggregates": computed,
+        "drift": differences,
+        "message": f"Agregados recalculados ({len(differences)} desviaciones)"
+    }
@@ -0,0 +1,92 @@
+"""
+Archivo histórico de registros antiguos
+Los registros que salen de una colección por la política de retención se
+guardan en segmentos NDJSON comprimidos con gzip, uno por mes:
+
+    data_dir/archive/<nombre>/<AAAA-MM>.ndjson.gz
+
+Cada archivado añade un miembro gzip nuevo al final del segmento (gzip lee
+varios miembros seguidos como un solo flujo), así que nunca se reescribe lo
+ya archivado. Los segmentos se leen bajo demanda y solo los de los meses
+pedidos.
+"""
+
+import os
+import gzip
+from typing import Any, Dict, Iterable, Iterator, List, Optional
+
+from . import _serializer as serializer
+
+SEGMENT_SUFFIX = ".ndjson.gz"
+
+
+def archive_dir(data_dir: str, name: str) -> str:
+    return os.path.join(data_dir, "archive", name)
+
+
+def _partition(record: dict, date_field: str) -> str:
+    """Mes del registro ("AAAA-MM"), o "sin_fecha" """
+    value = record.get(date_field)
+    if isinstance(value, str) and len(value) >= 7:
+        return value[:7]
+    return "sin_fecha"
+
+
+def append(data_dir: str, name: str, records: Iterable[dict], date_field: str) -> Dict[str, int]:
+    """
+    Añade registros a los segmentos de su mes y devuelve {segmento: registros}.
+
+    Los datos se sincronizan en disco antes de volver: quien archiva puede
+    borrar después los registros de su colección.
+    """
+    partitions: Dict[str, List[dict]] = {}
+    for record in records:
+        partitions.setdefault(_partition(record, date_field), []).append(record)
+
+    directory = archive_dir(data_dir, name)
+    os.makedirs(directory, exist_ok=True)
+    for partition, items in partitions.items():
+        lines = b"".join(serializer.dumps(r) + b"\n" for r in items)
+        with open(os.path.join(directory, partition + SEGMENT_SUFFIX), "ab") as f:
+            f.write(gzip.compress(lines))
+            f.flush()
+            os.fsync(f.fileno())
+    return {partition: len(items) for partition, items in partitions.items()}
+
+
+def segments(data_dir: str, name: str) -> List[Dict[str, Any]]:
+    """Segmentos del archivo ordenados por mes, con su tamaño en disco"""
+    directory = archive_dir(data_dir, name)
+    if not os.path.isdir(directory):
+        return []
+    return [
+        {"segmento": entry[:-len(SEGMENT_SUFFIX)], "bytes": os.path.getsize(os.path.join(directory, entry))}
+        for entry in sorted(os.listdir(directory)) if entry.endswith(SEGMENT_SUFFIX)
+    ]
+
+
+def read(data_dir: str, name: str, desde: Optional[str] = None, hasta: Optional[str] = None,
+         filters: Optional[Dict[str, Any]] = None) -> Iterator[dict]:
+    """
+    Recorre los registros archivados de los meses desde..hasta ("AAAA-MM",
+    ambos incluidos) que cumplen filters.
+
+    Un archivado interrumpido después de escribir el segmento y antes de
+    borrar los registros puede repetirlos al reintentarse: se devuelve solo
+    la primera copia de cada id.
+    """
+    directory = archive_dir(data_dir, name)
+    seen = set()
+    for segment in segments(data_dir, name):
+        partition = segment["segmento"]
+        if (desde and partition < desde) or (hasta and partition > hasta):
+            continue
+        with gzip.open(os.path.join(directory, partition + SEGMENT_SUFFIX), "rb") as f:
+            for line in f:
+                record = serializer.loads(line)
+                if record.get("id") in seen:
+                    continue
+                seen.add(record.get("id"))
+                if filters and any(record.get(k) != v for k, v in filters.items()):
+                    continue
+                yield record
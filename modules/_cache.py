@@ -0,0 +1,155 @@
+"""
+Caché compartida de documentos para los módulos de Jocarsa Suite
+Mantiene en memoria los archivos JSON ya parseados y solo los vuelve a leer
+cuando cambian en disco (mtime, tamaño o inodo)
+"""
+
+import os
+import threading
+from typing import Any, Callable, Dict, Optional, Tuple
+
+from . import _serializer as serializer
+
+
+def _file_signature(file_path: str) -> Tuple[int, int, int]:
+    """Firma de un archivo en disco: (mtime_ns, tamaño, inodo)"""
+    st = os.stat(file_path)
+    return (st.st_mtime_ns, st.st_size, st.st_ino)
+
+
+class DocumentCache:
+    """
+    Caché de documentos JSON parseados, indexada por ruta de archivo.
+
+    Es segura entre hilos: el acceso al diccionario de entradas está protegido
+    por un lock global y el parseo de cada archivo por un lock propio, de modo
+    que varias peticiones simultáneas sobre el mismo archivo solo lo parsean
+    una vez.
+
+    El documento devuelto es compartido: quien lo modifique debe guardarlo
+    después y llamar a store() (o a invalidate() si el guardado falla).
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._file_locks: Dict[str, threading.Lock] = {}
+        self._entries: Dict[str, Tuple[Tuple[int, int, int], Any]] = {}
+        self.hits = 0
+        self.misses = 0
+
+    def _file_lock(self, file_path: str) -> threading.Lock:
+        with self._lock:
+            lock = self._file_locks.get(file_path)
+            if lock is None:
+                lock = self._file_locks[file_path] = threading.Lock()
+            return lock
+
+    def _lookup(self, file_path: str, signature) -> Optional[Any]:
+        with self._lock:
+            entry = self._entries.get(file_path)
+            if entry is not None and entry[0] == signature:
+                self.hits += 1
+                return entry
+            return None
+
+    def load(self, file_path: str, default_factory: Callable[[], Any],
+             prepare: Optional[Callable[[Any], Any]] = None) -> Any:
+        """
+        Devuelve el documento parseado de file_path.
+
+        Si el archivo no existe se devuelve default_factory() sin cachearlo.
+        prepare, si se indica, transforma el documento recién leído (una vez
+        por lectura del archivo, antes de cachearlo).
+        """
+        try:
+            signature = _file_signature(file_path)
+        except FileNotFoundError:
+            return default_factory()
+
+        entry = self._lookup(file_path, signature)
+        if entry is not None:
+            return entry[1]
+
+        with self._file_lock(file_path):
+            # Otro hilo puede haberlo cargado mientras esperábamos
+            entry = self._lookup(file_path, signature)
+            if entry is not None:
+                return entry[1]
+
+            with open(file_path, "rb") as f:
+                data = serializer.loads(f.read())
+            if prepare is not None:
+                data = prepare(data)
+            # La firma se toma de nuevo por si el archivo cambió durante la lectura
+            signature = _file_signature(file_path)
+
+            with self._lock:
+                self.misses += 1
+                self._entries[file_path] = (signature, data)
+
+        return data
+
+    def store(self, file_path: str, data: Any):
+        """Registra data como contenido actual de file_path (tras escribirlo)"""
+        try:
+            signature = _file_signature(file_path)
+        except FileNotFoundError:
+            self.invalidate(file_path)
+            return
+
+        with self._lock:
+            self._entries[file_path] = (signature, data)
+
+    def invalidate(self, file_path: Optional[str] = None):
+        """Descarta la entrada de file_path, o todas si no se indica ruta"""
+        with self._lock:
+            if file_path is None:
+                self._entries.clear()
+            else:
+                self._entries.pop(file_path, None)
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos y fallos de la caché"""
+        with self._lock:
+            total = self.hits + self.misses
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": round(self.hits / total, 4) if total else 0,
+                "entries": len(self._entries)
+            }
+
+
+# Instancia compartida por todos los módulos
+DOCUMENT_CACHE = DocumentCache()
+
+
+def load_json(file_path: str, default_factory: Callable[[], Any],
+              prepare: Optional[Callable[[Any], Any]] = None) -> Any:
+    """Carga un archivo JSON a través de la caché compartida"""
+    return DOCUMENT_CACHE.load(file_path, default_factory, prepare)
+
+
+def save_json(file_path: str, data: Any):
+    """
+    Guarda un documento JSON y actualiza la caché compartida.
+
+    Se escribe en un archivo temporal que sustituye al original con un
+    renombrado atómico: quien lea el archivo ve la versión anterior o la
+    nueva completa, nunca una a medias.
+    """
+    tmp_path = f"{file_path}.{os.getpid()}.{threading.get_ident()}.tmp"
+    try:
+        with open(tmp_path, "wb") as f:
+            f.write(serializer.dump_document(data))
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, file_path)
+    except Exception:
+        # El documento en memoria puede no coincidir con lo que hay en disco
+        DOCUMENT_CACHE.invalidate(file_path)
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+
+    DOCUMENT_CACHE.store(file_path, data)
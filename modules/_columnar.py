@@ -0,0 +1,148 @@
+"""
+Analítica en columnas para los informes de Jocarsa Suite
+Convierte una colección (lista de registros) en columnas compactas: los
+campos numéricos como arrays de float64 y los categóricos (estado,
+asignado_a, proyecto_id, mes de una fecha...) como códigos enteros más la
+lista de categorías. Las agrupaciones se resuelven con operaciones
+vectorizadas (bincount) en lugar de recorrer diccionarios.
+
+NumPy es opcional: si no está instalado se usa una implementación en Python
+puro con los mismos resultados.
+
+Las tablas se guardan en memoria por documento y colección y se reconstruyen
+solo cuando cambia la versión del documento en el almacenamiento (o la firma
+de sus archivos). Construir la tabla cuesta más que una agrupación con
+diccionarios: las consultas son mucho más rápidas mientras el documento no
+cambie, pero el primer informe tras cada escritura es más lento que antes
+(ver benchmarks/columnar_tareas.py).
+"""
+
+import threading
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+try:
+    import numpy as np
+except ImportError:  # Sin NumPy: implementación en Python puro
+    np = None
+
+AVAILABLE = np is not None
+
+
+def _number(value) -> float:
+    if isinstance(value, bool) or not isinstance(value, (int, float)):
+        return 0.0
+    return float(value)
+
+
+def _month(value) -> Optional[str]:
+    """Mes ("AAAA-MM") de una fecha ISO, o None"""
+    if isinstance(value, str) and len(value) >= 7:
+        return value[:7]
+    return None
+
+
+class ColumnTable:
+    """
+    Colección en columnas.
+
+    numeric: campos numéricos (lo que no es número cuenta como 0)
+    categorical: campos cuyos valores se agrupan tal cual
+    months: campos de fecha ISO que se agrupan por mes ("<campo>.mes")
+    """
+
+    def __init__(self, records: Sequence[dict], numeric: Iterable[str] = (),
+                 categorical: Iterable[str] = (), months: Iterable[str] = ()):
+        self.size = len(records)
+        self.numeric: Dict[str, Any] = {}
+        self.codes: Dict[str, Any] = {}
+        self.categories: Dict[str, List[Any]] = {}
+
+        for field in numeric:
+            self._numeric(field, [r.get(field) for r in records])
+        for field in categorical:
+            self._encode(field, [r.get(field) for r in records])
+        for field in months:
+            self._encode(f"{field}.mes", [_month(r.get(field)) for r in records])
+
+    def _numeric(self, name: str, values: List[Any]):
+        """Guarda una columna numérica"""
+        # Si todo son números (lo normal) NumPy convierte la lista de una vez
+        if np is not None and set(map(type, values)) <= {int, float}:
+            self.numeric[name] = np.array(values, dtype=np.float64)
+        elif np is not None:
+            self.numeric[name] = np.fromiter(map(_number, values), dtype=np.float64, count=self.size)
+        else:
+            self.numeric[name] = list(map(_number, values))
+
+    def _encode(self, name: str, values: List[Any]):
+        """Guarda una columna categórica como códigos enteros"""
+        # Categorías en orden de aparición
+        positions = {value: i for i, value in enumerate(dict.fromkeys(values))}
+        codes = map(positions.__getitem__, values)
+        self.codes[name] = np.fromiter(codes, dtype=np.int32, count=self.size) if np is not None else list(codes)
+        self.categories[name] = list(positions)
+
+    def mask(self, field: str, allowed: Iterable[Any]):
+        """Filas cuyo valor de field está en allowed"""
+        allowed = set(allowed)
+        wanted = {i for i, value in enumerate(self.categories[field]) if value in allowed}
+        codes = self.codes[field]
+        if np is not None:
+            return np.isin(codes, list(wanted))
+        return [c in wanted for c in codes]
+
+    def sum(self, field: str, mask=None) -> float:
+        """Suma de una columna numérica (opcionalmente solo las filas de mask)"""
+        values = self.numeric[field]
+        if np is not None:
+            return float(values[mask].sum() if mask is not None else values.sum())
+        return sum(v for i, v in enumerate(values) if mask is None or mask[i])
+
+    def group_sum(self, by: str, field: Optional[str] = None, mask=None) -> Dict[Any, float]:
+        """
+        Suma de field por cada valor de la columna categórica by (número de
+        filas si no se indica field). Solo aparecen los grupos con filas.
+        """
+        codes = self.codes[by]
+        categories = self.categories[by]
+
+        if np is not None:
+            selected = codes[mask] if mask is not None else codes
+            counts = np.bincount(selected, minlength=len(categories))
+            totals = counts
+            if field is not None:
+                weights = self.numeric[field]
+                totals = np.bincount(selected, weights=weights[mask] if mask is not None else weights,
+                                     minlength=len(categories))
+            return {categories[i]: totals[i].item() for i in np.flatnonzero(counts)}
+
+        totals: Dict[int, float] = {}
+        for i, c in enumerate(codes):
+            if mask is not None and not mask[i]:
+                continue
+            totals[c] = totals.get(c, 0) + (self.numeric[field][i] if field is not None else 1)
+        return {categories[c]: total for c, total in sorted(totals.items())}
+
+
+# Tablas ya construidas: {(documento, colección, especificación): ((versión, firma), tabla)}
+_TABLES: Dict[Tuple, Tuple[Tuple, ColumnTable]] = {}
+_TABLES_LOCK = threading.Lock()
+
+
+def table(storage, document: str, collection: str, numeric: Tuple[str, ...] = (),
+          categorical: Tuple[str, ...] = (), months: Tuple[str, ...] = ()) -> ColumnTable:
+    """Tabla en columnas de una colección, reconstruida solo si el documento ha cambiado"""
+    key = (id(storage), document, collection, numeric, categorical, months)
+    # La firma de los archivos detecta también los cambios hechos fuera de la suite
+    version = (storage.version(document), storage.signature(document))
+
+    with _TABLES_LOCK:
+        entry = _TABLES.get(key)
+    if entry is not None and entry[0] == version:
+        return entry[1]
+
+    records = storage.load(document).get(collection, [])
+    built = ColumnTable(records, numeric=numeric, categorical=categorical, months=months)
+    with _TABLES_LOCK:
+        _TABLES[key] = (version, built)
+    return built
@@ -0,0 +1,221 @@
+"""
+Eventos de cambio para la interfaz de Jocarsa Suite
+Cada acción de execute() que modifica un documento publica un evento pequeño
+(registro nuevo, campos cambiados, ids borrados y deltas de los agregados) y,
+una vez por transacción y módulo, el resumen actualizado del dashboard. La
+API los reenvía a los navegadores por /api/events (Server-Sent Events) y la
+interfaz los aplica sobre lo que ya tiene en lugar de volver a pedirlo todo.
+
+Los eventos se publican al confirmar la transacción (nunca los de una
+transacción deshecha) añadiéndolos como líneas JSON a data/.jocarsa.events.
+Cada proceso lee ese archivo desde el final con un hilo, así que los eventos
+de un worker llegan también a los navegadores conectados a los demás. El
+archivo se rota a .jocarsa.events.1 cuando supera MAX_BYTES.
+"""
+
+import os
+import time
+import threading
+from typing import Any, Callable, Dict, Iterable, Optional, Tuple
+
+from . import _serializer as serializer
+
+try:
+    import fcntl
+except ImportError:  # Sin fcntl (Windows): sin exclusión entre procesos
+    fcntl = None
+
+# Tamaño a partir del cual se rota el archivo de eventos
+MAX_BYTES = 1024 * 1024
+
+# Segundos entre lecturas del archivo de eventos
+POLL_INTERVAL = 0.2
+
+EVENTS_FILE = ".jocarsa.events"
+
+
+def _encode(event: Dict[str, Any]) -> bytes:
+    return serializer.dumps(event, default=str) + b"\n"
+
+
+class EventBus:
+    """
+    Eventos compartidos entre procesos a través de un archivo.
+
+    publish() añade un evento al archivo; subscribe(deliver) hace que
+    deliver(evento) se llame (desde el hilo lector) con cada evento publicado
+    a partir de ese momento por cualquier proceso.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._subscribers: Dict[int, Callable[[Dict[str, Any]], None]] = {}
+        self._next_token = 0
+        self._thread: Optional[threading.Thread] = None
+        self.published = 0
+        self.delivered = 0
+
+    def publish(self, event: Dict[str, Any]):
+        """Añade un evento al archivo (con el archivo bloqueado, una línea entera cada vez)"""
+        line = _encode(event)
+        while True:
+            fd = os.open(self.path, os.O_WRONLY | os.O_APPEND | os.O_CREAT, 0o644)
+            try:
+                if fcntl is not None:
+                    fcntl.flock(fd, fcntl.LOCK_EX)
+                size = os.fstat(fd).st_size
+                try:
+                    rotated = os.stat(self.path).st_ino != os.fstat(fd).st_ino
+                except FileNotFoundError:
+                    rotated = True
+                if rotated:
+                    # Otro proceso lo rotó entre el open y el bloqueo
+                    continue
+                if size and size + len(line) > MAX_BYTES:
+                    os.replace(self.path, self.path + ".1")
+                    continue
+                os.write(fd, line)
+                self.published += 1
+                return
+            finally:
+                os.close(fd)
+
+    def subscribe(self, deliver: Callable[[Dict[str, Any]], None]) -> int:
+        """Registra deliver para los eventos siguientes; devuelve el token para unsubscribe"""
+        with self._lock:
+            self._next_token += 1
+            self._subscribers[self._next_token] = deliver
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._follow, name="events", daemon=True)
+                self._thread.start()
+            return self._next_token
+
+    def unsubscribe(self, token: int):
+        with self._lock:
+            self._subscribers.pop(token, None)
+
+    def _dispatch(self, lines: Iterable[bytes]):
+        with self._lock:
+            subscribers = list(self._subscribers.values())
+        for line in lines:
+            try:
+                event = serializer.loads(line)
+            except ValueError:
+                continue
+            for deliver in subscribers:
+                try:
+                    deliver(event)
+                    self.delivered += 1
+                except Exception as e:
+                    print(f"❌ Error entregando un evento: {e}")
+
+    def _open(self, at_end: bool) -> Tuple[Any, int]:
+        handle = open(self.path, "ab+")
+        handle.seek(0, os.SEEK_END if at_end else os.SEEK_SET)
+        return handle, os.fstat(handle.fileno()).st_ino
+
+    def _follow(self):
+        """Hilo lector: sigue el archivo como tail -F y reparte cada línea completa"""
+        handle, inode = self._open(at_end=True)
+        pending = b""
+        while True:
+            chunk = handle.read()
+            if chunk:
+                lines = (pending + chunk).split(b"\n")
+                pending = lines.pop()
+                self._dispatch(lines)
+                continue
+
+            try:
+                rotated = os.stat(self.path).st_ino != inode
+            except FileNotFoundError:
+                rotated = True
+            if rotated:
+                # Lo último escrito antes de rotar sigue en el archivo viejo
+                rest = handle.read()
+                handle.close()
+                self._dispatch((pending + rest).split(b"\n"))
+                pending = b""
+                handle, inode = self._open(at_end=False)
+                continue
+            time.sleep(POLL_INTERVAL)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            subscribers = len(self._subscribers)
+        return {"subscribers": subscribers, "published": self.published, "delivered": self.delivered}
+
+
+# Bus de cada directorio de datos en este proceso: {data_dir: (pid, bus)}
+_buses: Dict[str, Tuple[int, EventBus]] = {}
+_buses_lock = threading.Lock()
+
+
+def bus_for(data_dir: str) -> EventBus:
+    """Bus de eventos del directorio de datos (uno por proceso: el hilo lector no sobrevive a un fork)"""
+    pid = os.getpid()
+    with _buses_lock:
+        entry = _buses.get(data_dir)
+        if entry is None or entry[0] != pid:
+            entry = _buses[data_dir] = (pid, EventBus(os.path.join(data_dir, EVENTS_FILE)))
+        return entry[1]
+
+
+def _module(name: str) -> str:
+    """Tipo de módulo ("crm") a partir de su __name__ ("modules.crm")"""
+    return name.rsplit(".", 1)[-1]
+
+
+def _publish(storage, event: Dict[str, Any]):
+    try:
+        bus_for(storage.data_dir).publish(event)
+    except OSError as e:
+        print(f"❌ Error publicando un evento: {e}")
+
+
+def _summary(storage, module: str, summary_fn: Optional[Callable[[], Dict[str, Any]]]):
+    """Publica el resumen del módulo al confirmar, una vez por transacción"""
+    if summary_fn is None:
+        return
+    storage.after_commit(
+        lambda: _publish(storage, {"type": "summary", "module": module, "summary": summary_fn()}),
+        key=("summary", module)
+    )
+
+
+def changed(storage, module: str, collection: str, before: Optional[dict], after: Optional[dict],
+            deltas: Optional[Dict[str, Any]] = None, summary_fn: Optional[Callable[[], Dict[str, Any]]] = None):
+    """
+    Publica (al confirmar) el cambio de un registro: el registro entero si es
+    nuevo, su id y los campos que cambian si se modifica, o su id si se borra
+    (ver removed).
+    summary_fn, si se indica, da el resumen del módulo para el dashboard.
+    """
+    if after is None:
+        return removed(storage, module, collection, [before.get("id")], deltas, summary_fn)
+    if before is None:
+        op, record = "insert", after
+    else:
+        op = "update"
+        record = {key: value for key, value in after.items() if before.get(key) != value}
+        record["id"] = after.get("id")
+
+    event = {"type": "change", "module": _module(module), "collection": collection, "op": op, "record": record}
+    if deltas:
+        event["deltas"] = deltas
+    storage.after_commit(lambda: _publish(storage, event))
+    _summary(storage, _module(module), summary_fn)
+
+
+def removed(storage, module: str, collection: str, ids: Iterable[Any],
+            deltas: Optional[Dict[str, Any]] = None, summary_fn: Optional[Callable[[], Dict[str, Any]]] = None):
+    """Publica (al confirmar) el borrado de varios registros en un solo evento"""
+    ids = list(ids)
+    if not ids:
+        return
+    event = {"type": "change", "module": _module(module), "collection": collection, "op": "delete", "ids": ids}
+    if deltas:
+        event["deltas"] = deltas
+    storage.after_commit(lambda: _publish(storage, event))
+    _summary(storage, _module(module), summary_fn)
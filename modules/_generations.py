@@ -0,0 +1,55 @@
+"""
+Contadores de versión compartidos entre procesos
+Cada documento tiene un contador en un archivo pequeño mapeado en memoria
+(data/.jocarsa.gen). Quien guarda un documento incrementa su contador y el
+resto de procesos lo comparan con el de su copia en memoria: así saben si
+siguen al día sin volver a mirar el archivo del documento.
+"""
+
+import os
+import mmap
+import struct
+import zlib
+
+# Número de contadores del archivo; dos documentos que caigan en el mismo
+# solo provocan alguna recarga de más
+SLOTS = 64
+_SLOT = struct.Struct("<Q")
+
+
+class SharedGenerations:
+    """
+    Contadores de 64 bits por documento en un archivo mapeado en memoria.
+
+    bump() debe llamarse con el bloqueo entre procesos del almacenamiento
+    tomado (las escrituras ya están serializadas); get() se puede llamar en
+    cualquier momento.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        fd = os.open(path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            if os.fstat(fd).st_size < SLOTS * _SLOT.size:
+                os.ftruncate(fd, SLOTS * _SLOT.size)
+            self._map = mmap.mmap(fd, SLOTS * _SLOT.size)
+        finally:
+            os.close(fd)
+
+    def _offset(self, document: str) -> int:
+        # crc32 y no hash(): tiene que dar lo mismo en todos los procesos
+        return (zlib.crc32(document.encode("utf-8")) % SLOTS) * _SLOT.size
+
+    def get(self, document: str) -> int:
+        """Versión actual del documento"""
+        return _SLOT.unpack_from(self._map, self._offset(document))[0]
+
+    def bump(self, document: str) -> int:
+        """Marca el documento como modificado y devuelve su nueva versión"""
+        offset = self._offset(document)
+        value = _SLOT.unpack_from(self._map, offset)[0] + 1
+        _SLOT.pack_into(self._map, offset, value)
+        return value
+
+    def close(self):
+        self._map.close()
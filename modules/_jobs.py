@@ -0,0 +1,191 @@
+"""
+Trabajos en segundo plano para los módulos de Jocarsa Suite
+Un pool de hilos que ejecuta trabajos fuera de la petición HTTP y un
+planificador con expresiones tipo cron ("minuto hora día mes día_semana")
+que lanza trabajos periódicos.
+
+El estado de cada trabajo lo guarda quien lo encola (en su almacenamiento),
+así que sobrevive a reinicios y cualquier proceso puede consultarlo. Los
+hilos no sobreviven a un fork: la cola se crea en cada proceso la primera
+vez que se usa (ver for_process).
+"""
+
+import os
+import threading
+from datetime import datetime, timedelta
+from concurrent.futures import Future, ThreadPoolExecutor
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple
+
+# Rango de cada campo de una expresión cron
+_CRON_FIELDS = [(0, 59), (0, 23), (1, 31), (1, 12), (0, 6)]
+
+
+def _parse_field(text: str, low: int, high: int) -> Set[int]:
+    """Valores de un campo cron: *, n, a-b, listas con comas y pasos /n"""
+    values: Set[int] = set()
+    for part in text.split(","):
+        step = 1
+        if "/" in part:
+            part, step_text = part.split("/", 1)
+            step = int(step_text)
+            if step < 1:
+                raise ValueError(f"Paso no válido en la expresión cron: {text}")
+        if part == "*":
+            start, end = low, high
+        elif "-" in part:
+            start, end = (int(v) for v in part.split("-", 1))
+        else:
+            start = end = int(part)
+        if start < low or end > high or start > end:
+            raise ValueError(f"Valor fuera de rango en la expresión cron: {text}")
+        values.update(range(start, end + 1, step))
+    return values
+
+
+class CronSchedule:
+    """
+    Expresión cron de cinco campos: minuto, hora, día del mes, mes y día de
+    la semana (0 = domingo). Por ejemplo "0 2 * * *" es todas las noches a
+    las 2:00.
+    """
+
+    def __init__(self, expression: str):
+        parts = expression.split()
+        if len(parts) != 5:
+            raise ValueError(f"La expresión cron debe tener 5 campos: {expression}")
+        self.expression = expression
+        self.minutes, self.hours, self.days, self.months, self.weekdays = (
+            _parse_field(part, low, high) for part, (low, high) in zip(parts, _CRON_FIELDS)
+        )
+
+    def matches(self, moment: datetime) -> bool:
+        # isoweekday(): lunes = 1 ... domingo = 7 (7 % 7 = 0, domingo en cron)
+        return (moment.minute in self.minutes and moment.hour in self.hours
+                and moment.day in self.days and moment.month in self.months
+                and moment.isoweekday() % 7 in self.weekdays)
+
+
+class JobQueue:
+    """
+    Pool de hilos para trabajos más planificador de trabajos periódicos.
+
+    submit() encola una función; schedule() registra una función que se
+    llama con el minuto programado (datetime) cada vez que la expresión cron
+    coincide. El planificador arranca con el primer schedule().
+    """
+
+    def __init__(self, workers: int = 2, name: str = "jobs"):
+        self.name = name
+        self._pool = ThreadPoolExecutor(max_workers=workers, thread_name_prefix=name)
+        self._lock = threading.Lock()
+        self._schedules: List[Tuple[str, CronSchedule, Callable[[datetime], Any]]] = []
+        self._scheduler: Optional[threading.Thread] = None
+        self._stop = threading.Event()
+        self._running = 0
+        self.submitted = 0
+        self.completed = 0
+        self.failed = 0
+
+    def submit(self, function: Callable, *args) -> Future:
+        """Encola function(*args) en el pool"""
+        with self._lock:
+            self.submitted += 1
+        return self._pool.submit(self._run, function, *args)
+
+    def _run(self, function: Callable, *args):
+        with self._lock:
+            self._running += 1
+        try:
+            result = function(*args)
+        except BaseException:
+            with self._lock:
+                self.failed += 1
+            raise
+        else:
+            with self._lock:
+                self.completed += 1
+            return result
+        finally:
+            with self._lock:
+                self._running -= 1
+
+    def schedule(self, name: str, expression: str, function: Callable[[datetime], Any]):
+        """Ejecuta function(minuto) en el pool cada vez que coincide la expresión cron"""
+        with self._lock:
+            self._schedules.append((name, CronSchedule(expression), function))
+            if self._scheduler is None:
+                self._scheduler = threading.Thread(target=self._scheduler_loop, name=f"{self.name}-cron", daemon=True)
+                self._scheduler.start()
+
+    def _scheduler_loop(self):
+        minute = datetime.now().replace(second=0, microsecond=0)
+        while not self._stop.is_set():
+            # Espera al siguiente minuto; si el proceso se ha dormido, los
+            # minutos perdidos no se recuperan
+            minute += timedelta(minutes=1)
+            if self._stop.wait(max(0.0, (minute - datetime.now()).total_seconds())):
+                return
+            now = datetime.now().replace(second=0, microsecond=0)
+            if now > minute:
+                minute = now
+            with self._lock:
+                schedules = list(self._schedules)
+            for name, cron, function in schedules:
+                if cron.matches(minute):
+                    self.submit(function, minute)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                "submitted": self.submitted,
+                "running": self._running,
+                "completed": self.completed,
+                "failed": self.failed,
+                "schedules": {name: cron.expression for name, cron, _ in self._schedules}
+            }
+
+    def shutdown(self, wait: bool = True):
+        """Para el planificador y espera (si wait) a los trabajos en curso"""
+        self._stop.set()
+        self._pool.shutdown(wait=wait)
+
+
+_queues: Dict[str, Tuple[int, JobQueue]] = {}
+_queues_lock = threading.Lock()
+
+
+def for_process(name: str, factory: Callable[[], JobQueue]) -> Tuple[JobQueue, bool]:
+    """
+    Cola name de este proceso, creada con factory() la primera vez.
+
+    Tras un fork la cola heredada no tiene hilos y se crea otra. Devuelve
+    (cola, creada) para que quien la pide pueda configurarla al crearla.
+    """
+    pid = os.getpid()
+    with _queues_lock:
+        entry = _queues.get(name)
+        if entry is not None and entry[0] == pid:
+            return entry[1], False
+        queue = factory()
+        _queues[name] = (pid, queue)
+        return queue, True
+
+
+def pid_alive(pid) -> bool:
+    """Si existe un proceso con ese pid"""
+    if not isinstance(pid, int) or pid <= 0:
+        return False
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def stats() -> Dict[str, Any]:
+    """Estado de las colas de este proceso"""
+    with _queues_lock:
+        queues = {name: queue for name, (pid, queue) in _queues.items() if pid == os.getpid()}
+    return {name: queue.stats() for name, queue in queues.items()}
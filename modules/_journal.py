@@ -0,0 +1,295 @@
+"""
+Almacenamiento JSON con log de operaciones (write-ahead log)
+Para instalaciones que deben seguir usando archivos planos.
+
+En lugar de reescribir el archivo completo en cada acción, cada transacción
+añade una línea JSON compacta al log del documento (<documento>.log) y hace
+fsync. Un hilo en segundo plano compacta el log en el archivo JSON
+(<documento>.json) cada N registros o cada T segundos.
+
+Al arrancar, cada documento se reconstruye como archivo + log. Cada línea
+lleva un número de secuencia y el archivo guarda el último incluido en
+"_journal", así que una compactación interrumpida nunca aplica dos veces
+la misma operación.
+"""
+
+import os
+import glob
+import time
+import threading
+from typing import Any, Dict, List
+
+from . import _serializer as serializer
+from . import _records
+from ._storage import JsonStorage, DocumentIndex, empty_document, build_index, document_path, _apply, _shard_parents
+
+
+def _fsync_dir(path: str):
+    """Sincroniza el directorio para que los renombrados sean persistentes"""
+    try:
+        fd = os.open(path, os.O_RDONLY)
+    except OSError:
+        return
+    try:
+        os.fsync(fd)
+    except OSError:
+        pass
+    finally:
+        os.close(fd)
+
+
+class _DocumentState:
+    """Estado en memoria de un documento: contenido y posición en el log"""
+
+    def __init__(self, data: Dict[str, list], index: DocumentIndex, seq: int, pending: int):
+        self.data = data
+        self.index = index
+        self.seq = seq
+        self.pending = pending
+        self.last_compaction = time.monotonic()
+        self.log_file = None
+
+
+class JournaledJsonStorage(JsonStorage):
+    """
+    JsonStorage que persiste cada transacción como una línea de log.
+
+    compact_every: número de líneas de log que disparan una compactación
+    compact_interval: segundos máximos que una línea espera a ser compactada
+
+    El estado en memoria de cada documento es la fuente de verdad del proceso,
+    por lo que solo debe haber un proceso escribiendo en cada data_dir.
+    """
+
+    def __init__(self, data_dir: str, compact_every: int = 1000, compact_interval: float = 30.0):
+        super().__init__(data_dir)
+        self.compact_every = compact_every
+        self.compact_interval = compact_interval
+        self._states: Dict[str, _DocumentState] = {}
+        self._stop = threading.Event()
+        self._wake = threading.Event()
+        self._compactor = None
+        self._compact_lock = threading.Lock()
+        self._states_lock = threading.Lock()
+
+    def _log_path(self, document: str) -> str:
+        return document_path(self.data_dir, document) + ".log"
+
+    def _rotated_logs(self, document: str) -> List[str]:
+        """Logs rotados por compactaciones no terminadas, ordenados por secuencia"""
+        paths = glob.glob(self._log_path(document) + ".*")
+        return sorted(paths, key=lambda p: int(p.rsplit(".", 1)[1]) if p.rsplit(".", 1)[1].isdigit() else -1)
+
+    # ----- Recuperación -----
+
+    def _replay(self, path: str, data: Dict[str, list], index: DocumentIndex, seq: int, truncate: bool):
+        """
+        Aplica sobre data las líneas de un log posteriores a seq.
+
+        Devuelve (seq, líneas aplicadas). Una última línea incompleta (escritura
+        interrumpida) se ignora y, si truncate, se elimina del archivo.
+        """
+        applied = 0
+        good_offset = 0
+
+        with open(path, "rb") as f:
+            for raw in f:
+                try:
+                    if not raw.endswith(b"\n"):
+                        raise ValueError("línea incompleta")
+                    entry = serializer.loads(raw)
+                except ValueError:
+                    break
+
+                good_offset += len(raw)
+                if entry["seq"] <= seq:
+                    continue
+                for op in entry["ops"]:
+                    _apply(data, op, index)
+                seq = entry["seq"]
+                applied += 1
+
+        if truncate and good_offset < os.path.getsize(path):
+            print(f"⚠️  Log {os.path.basename(path)}: descartada una escritura incompleta")
+            os.truncate(path, good_offset)
+
+        return seq, applied
+
+    def _recover(self, document: str) -> _DocumentState:
+        """Reconstruye un documento a partir del archivo y sus logs"""
+        path = self._path(document)
+        if os.path.exists(path):
+            with open(path, "rb") as f:
+                data = serializer.loads(f.read())
+        else:
+            data = empty_document(document)
+        _records.compact_document(data, document)
+
+        seq = data.pop("_journal", {}).get("seq", 0)
+        index = build_index(data)
+        pending = 0
+
+        for log_path in self._rotated_logs(document):
+            seq, applied = self._replay(log_path, data, index, seq, truncate=False)
+            pending += applied
+
+        log_path = self._log_path(document)
+        if os.path.exists(log_path):
+            seq, applied = self._replay(log_path, data, index, seq, truncate=True)
+            pending += applied
+
+        return _DocumentState(data, index, seq, pending)
+
+    def _state(self, document: str) -> _DocumentState:
+        state = self._states.get(document)
+        if state is None:
+            # Lock propio: un lector puede llegar aquí mientras una transacción
+            # tiene _lock y espera a que termine de leer
+            with self._states_lock:
+                state = self._states.get(document)
+                if state is None:
+                    state = self._states[document] = self._recover(document)
+        return state
+
+    # ----- Hooks de JsonStorage -----
+
+    def _read(self, document):
+        return self._state(document).data
+
+    def _index(self, document):
+        return self._state(document).index
+
+    def _record(self, tx, document, op):
+        # Se serializa en el momento: operaciones posteriores de la misma
+        # transacción pueden modificar los objetos referenciados por op
+        tx["ops"].setdefault(document, []).append(
+            serializer.dumps_str(op)
+        )
+
+    def _commit(self, tx):
+        for document, ops in tx["ops"].items():
+            state = self._state(document)
+            line = '{"seq":%d,"ops":[%s]}\n' % (state.seq + 1, ",".join(ops))
+
+            if state.log_file is None:
+                log_path = self._log_path(document)
+                os.makedirs(os.path.dirname(log_path), exist_ok=True)
+                state.log_file = open(log_path, "ab")
+            state.log_file.write(line.encode("utf-8"))
+            state.log_file.flush()
+            os.fsync(state.log_file.fileno())
+
+            state.seq += 1
+            state.pending += 1
+            if state.pending >= self.compact_every:
+                self._wake.set()
+
+        # Los shards cambian también la versión de su documento principal
+        for parent in _shard_parents(tx["ops"]):
+            self._generations.bump(parent)
+
+        if tx["ops"]:
+            self._start_compactor()
+
+    def _rollback(self, tx):
+        # Los cambios ya se aplicaron en memoria: se vuelve a leer de disco
+        for document in tx["ops"]:
+            state = self._states.pop(document, None)
+            if state is not None and state.log_file is not None:
+                state.log_file.close()
+
+    # ----- Compactación -----
+
+    def compact(self, document: str):
+        """Vuelca el estado del documento al archivo JSON y vacía su log"""
+        with self._compact_lock:
+            self._compact(document)
+
+    def _compact(self, document: str):
+        with self._lock:
+            state = self._states.get(document)
+            if state is None or state.pending == 0:
+                return
+
+            snapshot = dict(state.data, _journal={"seq": state.seq})
+            content = serializer.dump_document(snapshot)
+
+            # Las nuevas escrituras irán a un log nuevo; el actual queda rotado
+            # hasta que el archivo compactado esté en disco
+            if state.log_file is not None:
+                state.log_file.close()
+                state.log_file = None
+            log_path = self._log_path(document)
+            rotated = f"{log_path}.{state.seq}"
+            if os.path.exists(log_path):
+                os.replace(log_path, rotated)
+
+            state.pending = 0
+            state.last_compaction = time.monotonic()
+
+        path = self._path(document)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(content)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(tmp_path, path)
+        _fsync_dir(os.path.dirname(path))
+
+        for old_log in self._rotated_logs(document):
+            suffix = old_log.rsplit(".", 1)[1]
+            if suffix.isdigit() and int(suffix) <= snapshot["_journal"]["seq"]:
+                os.remove(old_log)
+
+    def _due(self, state: _DocumentState) -> bool:
+        if state.pending >= self.compact_every:
+            return True
+        return state.pending > 0 and time.monotonic() - state.last_compaction >= self.compact_interval
+
+    def _compactor_loop(self):
+        tick = min(1.0, self.compact_interval)
+        while not self._stop.is_set():
+            self._wake.wait(tick)
+            self._wake.clear()
+            for document, state in list(self._states.items()):
+                if self._due(state):
+                    try:
+                        self.compact(document)
+                    except Exception as e:
+                        print(f"❌ Error compactando {document}: {e}")
+
+    def _start_compactor(self):
+        # Se arranca con la primera escritura y no al crear el almacenamiento,
+        # para no tener hilos vivos si el proceso hace fork después
+        if self._compactor is None:
+            self._compactor = threading.Thread(target=self._compactor_loop, name="journal-compactor", daemon=True)
+            self._compactor.start()
+
+    def close(self):
+        self._stop.set()
+        self._wake.set()
+        if self._compactor is not None:
+            self._compactor.join()
+            self._compactor = None
+
+        for document in list(self._states):
+            self.compact(document)
+        for state in self._states.values():
+            if state.log_file is not None:
+                state.log_file.close()
+                state.log_file = None
+
+    def version(self, document):
+        # Número de secuencia de la última línea de log del documento, más
+        # las transacciones que han modificado alguno de sus shards
+        return self._state(document).seq + self._generations.get(document)
+
+    def _signature_paths(self, document):
+        # El archivo solo cambia al compactar: cada transacción va al log
+        return super()._signature_paths(document) + [self._log_path(document)]
+
+    def stats(self) -> Dict[str, Any]:
+        """Bloqueos y líneas de log pendientes de compactar por documento"""
+        return dict(super().stats(), journal={
+            document: {"seq": state.seq, "pending": state.pending} for document, state in self._states.items()
+        })
@@ -0,0 +1,158 @@
+"""
+Bloqueos del almacenamiento de Jocarsa Suite
+Lecturas compartidas y escrituras exclusivas por documento dentro del
+proceso, un bloqueo de archivo entre procesos (varios workers sobre el
+mismo data_dir) y métricas del tiempo de espera en cada bloqueo.
+"""
+
+import os
+import time
+import threading
+from contextlib import contextmanager
+from typing import Any, Dict
+
+try:
+    import fcntl
+except ImportError:  # Windows: sin bloqueo entre procesos
+    fcntl = None
+
+
+class LockStats:
+    """Esperas acumuladas por tipo de bloqueo ("read", "write", "process")"""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._kinds: Dict[str, Dict[str, float]] = {}
+
+    def record(self, kind: str, waited: float):
+        """Anota una adquisición que ha esperado waited segundos"""
+        with self._lock:
+            entry = self._kinds.setdefault(kind, {"acquired": 0, "contended": 0, "wait_ms": 0.0, "max_wait_ms": 0.0})
+            entry["acquired"] += 1
+            if waited > 0.001:
+                entry["contended"] += 1
+            entry["wait_ms"] += waited * 1000
+            entry["max_wait_ms"] = max(entry["max_wait_ms"], waited * 1000)
+
+    def snapshot(self) -> Dict[str, Any]:
+        with self._lock:
+            return {
+                kind: {
+                    "acquired": int(entry["acquired"]),
+                    "contended": int(entry["contended"]),
+                    "wait_ms": round(entry["wait_ms"], 2),
+                    "avg_wait_ms": round(entry["wait_ms"] / entry["acquired"], 4) if entry["acquired"] else 0,
+                    "max_wait_ms": round(entry["max_wait_ms"], 2)
+                }
+                for kind, entry in self._kinds.items()
+            }
+
+
+class RWLock:
+    """
+    Bloqueo de lectores y escritor.
+
+    Varios hilos pueden leer a la vez; el escritor espera a que terminen y
+    mientras tanto no entran lectores nuevos (prioridad de escritura). Es
+    reentrante: el hilo escritor puede volver a leer o escribir, y un hilo
+    que ya está leyendo puede volver a leer.
+    """
+
+    def __init__(self, stats: LockStats = None):
+        self._cond = threading.Condition(threading.Lock())
+        self._readers: Dict[int, int] = {}
+        self._writer = None
+        self._writer_depth = 0
+        self._writers_waiting = 0
+        self._stats = stats
+
+    def _record(self, kind: str, started: float):
+        if self._stats is not None:
+            self._stats.record(kind, time.perf_counter() - started)
+
+    @contextmanager
+    def read(self):
+        me = threading.get_ident()
+        started = time.perf_counter()
+        with self._cond:
+            if self._writer != me and me not in self._readers:
+                while self._writer is not None or self._writers_waiting:
+                    self._cond.wait()
+            self._readers[me] = self._readers.get(me, 0) + 1
+        self._record("read", started)
+        try:
+            yield
+        finally:
+            with self._cond:
+                self._readers[me] -= 1
+                if not self._readers[me]:
+                    del self._readers[me]
+                    self._cond.notify_all()
+
+    def acquire_write(self):
+        me = threading.get_ident()
+        started = time.perf_counter()
+        with self._cond:
+            if self._writer == me:
+                self._writer_depth += 1
+                return
+            self._writers_waiting += 1
+            try:
+                while self._writer is not None or any(tid != me for tid in self._readers):
+                    self._cond.wait()
+            finally:
+                self._writers_waiting -= 1
+            self._writer = me
+            self._writer_depth = 1
+        self._record("write", started)
+
+    def release_write(self):
+        with self._cond:
+            self._writer_depth -= 1
+            if not self._writer_depth:
+                self._writer = None
+                self._cond.notify_all()
+
+    @contextmanager
+    def write(self):
+        self.acquire_write()
+        try:
+            yield
+        finally:
+            self.release_write()
+
+
+class InterProcessLock:
+    """
+    Bloqueo exclusivo entre procesos sobre un archivo (flock).
+
+    En sistemas sin fcntl no bloquea: solo hay exclusión dentro del proceso.
+    """
+
+    def __init__(self, path: str, stats: LockStats = None):
+        self.path = path
+        self._fd = None
+        self._stats = stats
+
+    def acquire(self):
+        if fcntl is None:
+            return
+        started = time.perf_counter()
+        fd = os.open(self.path, os.O_RDWR | os.O_CREAT, 0o644)
+        try:
+            fcntl.flock(fd, fcntl.LOCK_EX)
+        except BaseException:
+            os.close(fd)
+            raise
+        self._fd = fd
+        if self._stats is not None:
+            self._stats.record("process", time.perf_counter() - started)
+
+    def release(self):
+        if self._fd is None:
+            return
+        fd, self._fd = self._fd, None
+        try:
+            fcntl.flock(fd, fcntl.LOCK_UN)
+        finally:
+            os.close(fd)
@@ -0,0 +1,166 @@
+"""
+Registros compactos para las colecciones grandes
+Un registro normal es un dict con sus claves repetidas en cada registro. Las
+colecciones que un módulo registra aquí (tareas, respuestas...) se guardan
+en memoria como objetos con __slots__: un hueco por campo conocido, sin
+diccionario por registro, y los campos tipo enumerado (estado, prioridad...)
+con la cadena internada, compartida por todos los registros.
+
+Se comportan como un Mapping de solo lectura (get, [], in, items, dict(r)),
+así que el código que lee registros no cambia. El almacenamiento nunca los
+modifica en su sitio: una actualización crea otro registro (ver updated).
+Se convierten en dict solo al serializarlos (ver _serializer.py).
+
+Los campos que no estén declarados se guardan en un dict aparte solo en
+los registros que los tengan. Al recorrer un registro los campos salen en
+el orden declarado y después los no declarados.
+"""
+
+import sys
+from collections.abc import Mapping
+from typing import Any, Callable, Dict, FrozenSet, Iterable, Iterator, Optional, Tuple
+
+# Campo sin valor (ausente, no None)
+_MISSING = object()
+
+
+class CompactRecord(Mapping):
+    """Base de los registros compactos; cada colección tiene su subclase (ver register)"""
+
+    __slots__ = ("_extra",)
+
+    _fields: Tuple[str, ...] = ()
+    _field_set: FrozenSet[str] = frozenset()
+    _enums: FrozenSet[str] = frozenset()
+
+    def __init__(self, values: Mapping):
+        extra = None
+        fields, enums = self._field_set, self._enums
+        for key, value in values.items():
+            if key in fields:
+                if key in enums and type(value) is str:
+                    value = sys.intern(value)
+                setattr(self, key, value)
+            else:
+                if extra is None:
+                    extra = {}
+                extra[key] = value
+        self._extra = extra
+
+    def __getitem__(self, key):
+        if key in self._field_set:
+            value = getattr(self, key, _MISSING)
+            if value is _MISSING:
+                raise KeyError(key)
+            return value
+        if self._extra is None:
+            raise KeyError(key)
+        return self._extra[key]
+
+    def get(self, key, default=None):
+        if key in self._field_set:
+            return getattr(self, key, default)
+        return self._extra.get(key, default) if self._extra is not None else default
+
+    def __contains__(self, key):
+        if key in self._field_set:
+            return hasattr(self, key)
+        return self._extra is not None and key in self._extra
+
+    def __iter__(self) -> Iterator[str]:
+        for field in self._fields:
+            if hasattr(self, field):
+                yield field
+        if self._extra is not None:
+            yield from self._extra
+
+    def __len__(self) -> int:
+        return sum(1 for _ in self)
+
+    def to_dict(self) -> Dict[str, Any]:
+        """Copia como dict (para serializar)"""
+        values = {}
+        for field in self._fields:
+            value = getattr(self, field, _MISSING)
+            if value is not _MISSING:
+                values[field] = value
+        if self._extra is not None:
+            values.update(self._extra)
+        return values
+
+    def __repr__(self):
+        return f"{type(self).__name__}({self.to_dict()!r})"
+
+
+# Clase de registro de cada colección: {coleccion: clase}
+_LAYOUTS: Dict[str, type] = {}
+
+# Documentos cuyo módulo ya se ha importado (o intentado importar)
+_documents_seen = set()
+
+# Importa el módulo dueño de un documento para que registre sus colecciones
+# (los módulos se importan bajo demanda, ver modules/__init__.py)
+_loader: Optional[Callable[[str], None]] = None
+
+
+def set_loader(loader: Callable[[str], None]):
+    """Fija la función que importa el módulo de un documento"""
+    global _loader
+    _loader = loader
+
+
+def register(document: str, collection: str, fields: Iterable[str], enums: Iterable[str] = ()) -> type:
+    """
+    Guarda los registros de collection en forma compacta con los campos
+    fields; los de enums (valores de una lista corta) se internan.
+    """
+    fields = tuple(fields)
+    clashes = [field for field in fields if hasattr(CompactRecord, field)]
+    if clashes:
+        raise ValueError(f"Campos con el nombre de un método del registro: {', '.join(clashes)}")
+
+    layout = type(f"{collection.capitalize()}Record", (CompactRecord,), {
+        "__module__": __name__,
+        "__slots__": fields,
+        "_fields": fields,
+        "_field_set": frozenset(fields),
+        "_enums": frozenset(enums)
+    })
+    _LAYOUTS[collection] = layout
+    _documents_seen.add(document)
+    return layout
+
+
+def compact(collection: str, record: Any) -> Any:
+    """Registro en forma compacta si su colección está registrada (si no, tal cual)"""
+    layout = _LAYOUTS.get(collection)
+    if layout is None or type(record) is layout or not isinstance(record, Mapping):
+        return record
+    return layout(record)
+
+
+def updated(collection: str, record: Mapping, changes: Dict[str, Any]) -> Any:
+    """Copia de record con changes aplicados (el original no se modifica)"""
+    values = record.to_dict() if isinstance(record, CompactRecord) else dict(record)
+    values.update(changes)
+    return compact(collection, values)
+
+
+def compact_document(data: Dict[str, Any], document: Optional[str] = None) -> Dict[str, Any]:
+    """
+    Pasa a forma compacta, en su sitio, las colecciones registradas de un
+    documento. Con document se importa antes su módulo si aún no se ha hecho.
+    """
+    if document is not None and document not in _documents_seen:
+        _documents_seen.add(document)
+        if _loader is not None:
+            try:
+                _loader(document)
+            except Exception as e:
+                print(f"❌ Error cargando el módulo del documento {document}: {e}")
+
+    for collection, records in data.items():
+        layout = _LAYOUTS.get(collection)
+        if layout is not None and isinstance(records, list):
+            data[collection] = [r if type(r) is layout else layout(r) for r in records]
+    return data
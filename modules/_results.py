@@ -0,0 +1,104 @@
+"""
+Caché de resultados de informes
+Guarda el contenido de cada informe calculado junto con las versiones de los
+documentos de los que depende. Mientras esas versiones no cambian se sirve el
+resultado guardado sin recalcularlo; las entradas menos usadas se descartan
+al superar el número máximo de entradas o el tamaño total.
+"""
+
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Callable, Dict, Hashable, Tuple
+
+from . import _serializer as serializer
+
+# Límites por defecto de la caché
+MAX_ENTRIES = 256
+MAX_BYTES = 8 * 1024 * 1024
+
+
+def _size(value: Any) -> int:
+    """Tamaño aproximado de un resultado (su JSON en bytes, o su longitud si ya son bytes)"""
+    if isinstance(value, (bytes, bytearray)):
+        return len(value)
+    return len(serializer.dumps(value, default=str))
+
+
+class ResultCache:
+    """
+    Caché LRU de resultados con invalidación por versiones de sus dependencias.
+
+    Cada entrada es (versiones, resultado, tamaño, compute_ms). Las versiones
+    se leen antes de calcular: si los datos cambian durante el cálculo la
+    entrada ya nace desfasada y se recalcula en la siguiente petición.
+    """
+
+    def __init__(self, max_entries: int = MAX_ENTRIES, max_bytes: int = MAX_BYTES):
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+        self._entries: "OrderedDict[Hashable, Tuple[tuple, Any, int, float]]" = OrderedDict()
+        self._bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _hit_ratio(self) -> float:
+        total = self.hits + self.misses
+        return round(self.hits / total, 4) if total else 0
+
+    def get_or_compute(self, key: Hashable, versions: tuple, compute: Callable[[], Any]) -> Tuple[Any, Dict[str, Any]]:
+        """
+        Resultado de key para las versiones dadas, calculándolo con compute()
+        si no está en la caché o sus dependencias han cambiado.
+
+        Devuelve (resultado, metadatos) con hit, compute_ms y hit_ratio.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] == versions:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1], {"hit": True, "compute_ms": entry[3], "hit_ratio": self._hit_ratio()}
+            self.misses += 1
+
+        started = time.perf_counter()
+        value = compute()
+        compute_ms = round((time.perf_counter() - started) * 1000, 2)
+        size = _size(value)
+
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            if size <= self.max_bytes:
+                self._entries[key] = (versions, value, size, compute_ms)
+                self._bytes += size
+                while len(self._entries) > self.max_entries or self._bytes > self.max_bytes:
+                    _, evicted = self._entries.popitem(last=False)
+                    self._bytes -= evicted[2]
+                    self.evictions += 1
+            meta = {"hit": False, "compute_ms": compute_ms, "hit_ratio": self._hit_ratio()}
+        return value, meta
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._bytes = 0
+
+    def stats(self) -> Dict[str, Any]:
+        """Contadores de aciertos, fallos y ocupación de la caché"""
+        with self._lock:
+            return {
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_ratio": self._hit_ratio(),
+                "evictions": self.evictions,
+                "entries": len(self._entries),
+                "bytes": self._bytes
+            }
+
+
+# Instancia compartida para los informes
+REPORT_CACHE = ResultCache()
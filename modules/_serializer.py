@@ -0,0 +1,85 @@
+"""
+Serialización JSON de Jocarsa Suite
+Punto único por el que pasan los documentos guardados en disco, los logs de
+operaciones, los registros de SQLite y las respuestas de la API.
+
+Si está instalado orjson se usa para codificar y decodificar (varias veces
+más rápido que el módulo json); si no, se usa json con el mismo resultado:
+JSON compacto en UTF-8 sin escapar los caracteres no ASCII.
+
+Los registros compactos (ver _records.py) y cualquier otro Mapping se
+codifican como objetos JSON: es el único punto donde pasan a ser dicts.
+
+Los documentos se guardan compactos (sin sangría, un 30% más pequeños). Con
+JOCARSA_JSON_PRETTY=1 se guardan con sangría, para editarlos a mano.
+"""
+
+import os
+import json
+from collections.abc import Mapping
+from typing import Any, Callable, Optional, Union
+
+try:
+    import orjson
+except ImportError:  # Sin orjson: módulo json de la biblioteca estándar
+    orjson = None
+
+BACKEND = "orjson" if orjson is not None else "json"
+
+PRETTY = os.environ.get("JOCARSA_JSON_PRETTY") == "1"
+
+if orjson is not None:
+    # Claves no str (ids numéricos en un dict) como hace json
+    _OPTIONS = orjson.OPT_NON_STR_KEYS
+
+
+def _mapping_default(value: Any) -> Any:
+    """Convierte los registros compactos (o cualquier Mapping) en dict"""
+    if isinstance(value, Mapping):
+        to_dict = getattr(value, "to_dict", None)
+        return to_dict() if to_dict is not None else dict(value)
+    raise TypeError(f"Object of type {type(value).__name__} is not JSON serializable")
+
+
+def _with_mappings(default: Optional[Callable[[Any], Any]]) -> Callable[[Any], Any]:
+    """default que antes de nada convierte los Mapping en dict"""
+    if default is None:
+        return _mapping_default
+
+    def _default(value: Any) -> Any:
+        if isinstance(value, Mapping):
+            return _mapping_default(value)
+        return default(value)
+
+    return _default
+
+
+def dumps(value: Any, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> bytes:
+    """JSON compacto en UTF-8"""
+    default = _with_mappings(default)
+    if orjson is not None:
+        options = _OPTIONS | orjson.OPT_SORT_KEYS if sort_keys else _OPTIONS
+        return orjson.dumps(value, option=options, default=default)
+    return json.dumps(value, ensure_ascii=False, separators=(",", ":"),
+                      sort_keys=sort_keys, default=default).encode("utf-8")
+
+
+def dumps_str(value: Any, sort_keys: bool = False, default: Optional[Callable[[Any], Any]] = None) -> str:
+    """Como dumps, pero devuelve texto"""
+    return dumps(value, sort_keys=sort_keys, default=default).decode("utf-8")
+
+
+def loads(data: Union[bytes, bytearray, memoryview, str]) -> Any:
+    """Decodifica un JSON (texto o bytes en UTF-8)"""
+    if orjson is not None:
+        return orjson.loads(data)
+    return json.loads(data)
+
+
+def dump_document(value: Any) -> bytes:
+    """Contenido de un documento en disco: compacto, o con sangría si PRETTY"""
+    if PRETTY:
+        if orjson is not None:
+            return orjson.dumps(value, option=_OPTIONS | orjson.OPT_INDENT_2, default=_mapping_default)
+        return json.dumps(value, indent=2, ensure_ascii=False, default=_mapping_default).encode("utf-8")
+    return dumps(value)
@@ -0,0 +1,1363 @@
+"""
+Capa de almacenamiento de Jocarsa Suite
+Abstrae dónde y cómo se guardan las colecciones de cada módulo.
+
+Cada módulo trabaja con un "documento" (crm_clientes, proyectos, ...) formado
+por varias colecciones de registros con campo "id". Implementaciones:
+
+- JsonStorage: un archivo JSON por documento en DATA_DIR (comportamiento original)
+- JournaledJsonStorage (_journal.py): archivos JSON más un log de operaciones
+  que se compacta periódicamente en el archivo
+- SqliteStorage: una tabla por colección en una base de datos SQLite en modo WAL,
+  indexada por id y por claves foráneas, donde una inserción cuesta O(1)
+
+Las colecciones de SHARDS se reparten en documentos aparte (shards), uno por
+valor de un campo: las respuestas de cada formulario van en su propio
+documento y escribir o leer las de uno no toca las de los demás.
+
+app.py crea el almacenamiento y lo pasa a los módulos en context["storage"].
+"""
+
+import os
+import re
+import bisect
+import heapq
+import time
+import sqlite3
+import threading
+from contextlib import contextmanager
+from itertools import islice
+from typing import Any, Callable, Dict, Iterator, List, Optional, Tuple
+
+from . import _serializer as serializer
+from . import _records
+from ._cache import DOCUMENT_CACHE, load_json, save_json
+from ._locks import LockStats, RWLock, InterProcessLock
+from ._generations import SharedGenerations
+
+# Colecciones de cada documento y campos indexados (claves foráneas)
+SCHEMA: Dict[str, Dict[str, List[str]]] = {
+    "crm_clientes": {
+        "clientes": [],
+        "contactos": ["cliente_id"],
+        "oportunidades": ["cliente_id"]
+    },
+    "proyectos": {
+        "proyectos": ["cliente_id"],
+        "tareas": ["proyecto_id"]
+    },
+    "formularios": {
+        "formularios": ["cliente_id", "proyecto_id"]
+    },
+    "informes": {
+        "informes_generados": [],
+        "trabajos": []
+    }
+}
+
+# Colecciones repartidas en shards: {documento: {coleccion: campo de reparto}}.
+# Los registros con campo == valor van en el documento
+# shard_document(documento, coleccion, valor), indexado por ese campo.
+SHARDS: Dict[str, Dict[str, str]] = {
+    "formularios": {
+        "respuestas": "formulario_id"
+    }
+}
+
+_IDENTIFIER = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
+
+# Clave de un shard: el valor del campo de reparto si es un nombre seguro
+# (ids numéricos); el resto de valores comparten el shard OTHER_SHARD
+_SHARD_KEY = re.compile(r"^[A-Za-z0-9_]{1,64}$")
+OTHER_SHARD = "_otros"
+
+# Segundos durante los que JsonStorage da por buena su copia de un documento
+# sin mirar el archivo si ningún proceso lo ha guardado (versión compartida)
+REVALIDATE_INTERVAL = 1.0
+
+
+def _run_after_commit(callbacks: Dict[Any, Callable[[], None]]):
+    """Ejecuta las funciones registradas con after_commit; sus errores no deshacen nada"""
+    for callback in callbacks.values():
+        try:
+            callback()
+        except Exception as e:
+            print(f"❌ Error tras confirmar una transacción: {e}")
+
+
+def shard_document(document: str, collection: str, value) -> str:
+    """Shard de document que guarda los registros de collection cuyo campo de reparto vale value"""
+    key = str(value)
+    if not _SHARD_KEY.match(key):
+        key = OTHER_SHARD
+    return f"{document}.{collection}.{key}"
+
+
+def shard_of(document: str) -> Optional[Tuple[str, str, str]]:
+    """(documento, coleccion, clave) si document es un shard, o None"""
+    parts = document.split(".")
+    if len(parts) == 3 and parts[1] in SHARDS.get(parts[0], {}):
+        return parts[0], parts[1], parts[2]
+    return None
+
+
+def schema_of(document: str) -> Dict[str, List[str]]:
+    """Colecciones de un documento (o de un shard) y sus campos indexados"""
+    shard = shard_of(document)
+    if shard is not None:
+        parent, collection, _ = shard
+        return {collection: [SHARDS[parent][collection]]}
+    return SCHEMA.get(document, {})
+
+
+def shard_dir(data_dir: str, document: str, collection: str) -> str:
+    """Directorio con los archivos de los shards de una colección"""
+    return os.path.join(data_dir, f"{document}.{collection}")
+
+
+def document_path(data_dir: str, document: str) -> str:
+    """
+    Ruta sin extensión de los archivos de un documento: data_dir/documento,
+    o data_dir/documento.coleccion/clave si es un shard.
+    """
+    shard = shard_of(document)
+    if shard is not None:
+        parent, collection, key = shard
+        return os.path.join(shard_dir(data_dir, parent, collection), key)
+    return os.path.join(data_dir, document)
+
+
+def file_signatures(*paths: str) -> Tuple[Optional[Tuple[int, int, int]], ...]:
+    """(mtime_ns, tamaño, inodo) de cada archivo (None si no existe)"""
+    signatures = []
+    for path in paths:
+        try:
+            st = os.stat(path)
+        except FileNotFoundError:
+            signatures.append(None)
+        else:
+            signatures.append((st.st_mtime_ns, st.st_size, st.st_ino))
+    return tuple(signatures)
+
+
+def empty_document(document: str) -> Dict[str, list]:
+    """Documento vacío con todas las colecciones declaradas en SCHEMA"""
+    return {collection: [] for collection in schema_of(document)}
+
+
+def collections_of(data: Dict[str, Any]) -> Dict[str, list]:
+    """Colecciones de un documento, sin las claves internas (las que empiezan por _)"""
+    return {key: value for key, value in data.items() if not key.startswith("_")}
+
+
+def indexed_fields(collection: str) -> List[str]:
+    """Campos indexados de una colección según SCHEMA (en los shards, el campo de reparto)"""
+    for collections in SCHEMA.values():
+        if collection in collections:
+            return collections[collection]
+    for collections in SHARDS.values():
+        if collection in collections:
+            return [collections[collection]]
+    return []
+
+
+class Storage:
+    """
+    Interfaz común de almacenamiento.
+
+    Los registros devueltos por load/get/find son de solo lectura: para
+    modificarlos hay que usar insert/update, preferiblemente dentro de
+    transaction() cuando se hacen varias operaciones relacionadas.
+
+    data_dir es el directorio de datos, donde los módulos pueden guardar
+    archivos auxiliares (por ejemplo el archivo histórico de informes).
+    """
+
+    data_dir: str
+
+    def load(self, document: str) -> Dict[str, list]:
+        """Documento completo: {coleccion: [registros]}"""
+        raise NotImplementedError
+
+    def get(self, document: str, collection: str, record_id) -> Optional[dict]:
+        """Registro con el id indicado o None"""
+        raise NotImplementedError
+
+    def find(self, document: str, collection: str, field: str, value) -> List[dict]:
+        """
+        Registros cuyo campo field es igual a value.
+
+        Para los campos indexados en SCHEMA el coste es proporcional al número
+        de registros encontrados, no al tamaño de la colección.
+        """
+        raise NotImplementedError
+
+    def count(self, document: str, collection: str) -> int:
+        """Número de registros de la colección"""
+        raise NotImplementedError
+
+    def query(self, document: str, collection: str, filters: Optional[Dict[str, Any]] = None,
+              fields: Optional[List[str]] = None, limit: Optional[int] = None,
+              after_id=None) -> Tuple[List[dict], Any]:
+        """
+        Página de registros de una colección ordenados por id.
+
+        filters: igualdades campo -> valor que deben cumplir los registros
+        fields: campos a devolver (el id se incluye siempre)
+        limit / after_id: tamaño de página y último id de la página anterior
+
+        Devuelve (registros, cursor); el cursor es el id a pasar como after_id
+        para la página siguiente, o None si no hay más.
+        """
+        raise NotImplementedError
+
+    def iter_records(self, document: str, collection: str, filters: Optional[Dict[str, Any]] = None,
+                     fields: Optional[List[str]] = None, after_id=None,
+                     batch_size: int = 500) -> Iterator[dict]:
+        """
+        Recorre los registros de una colección ordenados por id.
+
+        Se leen por páginas de batch_size con query(), así que nunca se
+        materializa la colección completa; after_id permite reanudar un
+        recorrido interrumpido desde el último id recibido.
+        """
+        while True:
+            records, cursor = self.query(document, collection, filters=filters, fields=fields,
+                                         limit=batch_size, after_id=after_id)
+            yield from records
+            if cursor is None:
+                return
+            after_id = cursor
+
+    def count_by(self, document: str, collection: str, field: str) -> Dict[Any, int]:
+        """Número de registros por cada valor de field"""
+        raise NotImplementedError
+
+    def next_id(self, document: str, collection: str) -> int:
+        """
+        Reserva el siguiente id de la colección.
+
+        Los ids salen de un contador persistente por colección: no se repiten
+        aunque se borren registros, y dentro de una transacción la reserva y la
+        inserción son atómicas frente a otras peticiones.
+        """
+        raise NotImplementedError
+
+    def insert(self, document: str, collection: str, record: dict) -> dict:
+        """Inserta un registro y lo devuelve"""
+        raise NotImplementedError
+
+    def update(self, document: str, collection: str, record_id, changes: dict) -> Optional[dict]:
+        """Aplica changes al registro y lo devuelve (None si no existe)"""
+        raise NotImplementedError
+
+    def delete(self, document: str, collection: str, record_ids: List[Any]) -> List[dict]:
+        """Elimina los registros con los ids indicados y los devuelve"""
+        raise NotImplementedError
+
+    def replace(self, document: str, data: Dict[str, list]):
+        """Sustituye el documento completo"""
+        raise NotImplementedError
+
+    def shards(self, document: str, collection: str) -> List[str]:
+        """Shards existentes de una colección repartida (ver SHARDS)"""
+        raise NotImplementedError
+
+    def aggregates(self, document: str) -> Optional[Dict[str, Any]]:
+        """Contadores agregados del documento ({clave: número}), None si no existen"""
+        raise NotImplementedError
+
+    def add_aggregates(self, document: str, deltas: Dict[str, Any]):
+        """Suma deltas a los contadores agregados"""
+        raise NotImplementedError
+
+    def set_aggregates(self, document: str, values: Dict[str, Any], replace: bool = False):
+        """Fija contadores agregados (todos si replace)"""
+        raise NotImplementedError
+
+    @contextmanager
+    def transaction(self):
+        """Agrupa varias escrituras: se aplican todas o ninguna"""
+        raise NotImplementedError
+        yield
+
+    def after_commit(self, callback: Callable[[], None], key: Any = None):
+        """
+        Ejecuta callback cuando se confirme la transacción activa (enseguida
+        si no hay ninguna); si la transacción se deshace no se ejecuta. Con
+        key solo cuenta la primera llamada con esa clave en la transacción.
+        """
+        raise NotImplementedError
+
+    def version(self, document: str) -> int:
+        """
+        Versión del documento: cambia cada vez que se confirma una transacción
+        que lo modifica a él o a alguno de sus shards. Sirve para invalidar
+        datos derivados (cachés).
+        """
+        raise NotImplementedError
+
+    def signature(self, document: str) -> Tuple:
+        """
+        Firma de los archivos del documento en disco. Junto con version()
+        identifica su contenido aunque el contador de versiones se pierda o
+        se reinicie, o el archivo se modifique fuera de la suite.
+        """
+        return ()
+
+    def close(self):
+        """Libera los recursos del almacenamiento"""
+
+    def stats(self) -> Dict[str, Any]:
+        """Métricas propias del almacenamiento"""
+        return {}
+
+
+class JsonStorage(Storage):
+    """
+    Almacenamiento en archivos JSON (uno por documento) en data_dir.
+
+    Las escrituras de una transacción se aplican sobre el documento en memoria
+    y se persisten una sola vez al cerrar la transacción más externa.
+
+    Cada documento en memoria lleva un índice por id de sus colecciones, y los
+    ids se asignan con un contador por colección guardado en "_meta".
+
+    Bloqueos: las transacciones se ejecutan de una en una (dentro del proceso
+    con _lock y entre procesos con un flock sobre data_dir/.jocarsa.lock) y
+    cada documento tiene un bloqueo de lectores/escritor: las lecturas son
+    concurrentes y esperan mientras una transacción modifica el documento.
+    Los registros no se modifican nunca en su sitio (las actualizaciones
+    crean una copia), así que lo ya leído no cambia mientras se serializa.
+    """
+
+    def __init__(self, data_dir: str):
+        self.data_dir = data_dir
+        self._lock = threading.RLock()
+        self._local = threading.local()
+        self._indexes: Dict[str, Tuple[dict, DocumentIndex]] = {}
+        self._index_lock = threading.Lock()
+        self._lock_stats = LockStats()
+        self._doc_locks: Dict[str, RWLock] = {}
+        self._process_lock = InterProcessLock(os.path.join(data_dir, ".jocarsa.lock"), self._lock_stats)
+        self._generations = SharedGenerations(os.path.join(data_dir, ".jocarsa.gen"))
+        self._loaded: Dict[str, Tuple[int, float, dict]] = {}
+
+    def _path(self, document: str) -> str:
+        return document_path(self.data_dir, document) + ".json"
+
+    def _tx(self) -> Optional[Dict[str, Any]]:
+        return getattr(self._local, "tx", None)
+
+    def _document(self, document: str) -> Dict[str, list]:
+        """Documento en memoria, el de la transacción activa si lo hay"""
+        tx = self._tx()
+        if tx is not None and document in tx["docs"]:
+            return tx["docs"][document]
+
+        data = self._read(document)
+        if tx is not None:
+            tx["docs"][document] = data
+        return data
+
+    def _read(self, document: str) -> Dict[str, list]:
+        """
+        Lee el documento a través de la caché compartida.
+
+        Mientras la versión compartida del documento no cambie (nadie lo ha
+        guardado, en este proceso o en otro) se reutiliza la última lectura;
+        cada REVALIDATE_INTERVAL segundos se vuelve a comprobar el archivo
+        por si se ha editado a mano.
+        """
+        generation = self._generations.get(document)
+        now = time.monotonic()
+        loaded = self._loaded.get(document)
+        if loaded is not None and loaded[0] == generation and now - loaded[1] < REVALIDATE_INTERVAL:
+            return loaded[2]
+
+        # Si el archivo cambia sin que lo haya guardado la suite (misma
+        # versión que en la lectura anterior) se ha editado a mano: sus
+        # agregados ya no valen y se descartan para que se recalculen
+        edited = loaded is not None and loaded[0] == generation
+
+        def prepare(parsed):
+            if edited:
+                parsed.get("_meta", {}).pop("aggregates", None)
+            return _records.compact_document(parsed, document)
+
+        data = load_json(self._path(document), lambda: empty_document(document), prepare)
+        self._loaded[document] = (generation, now, data)
+        return data
+
+    def _index(self, document: str) -> "DocumentIndex":
+        """Índices del documento en memoria, reconstruidos si cambia"""
+        data = self._document(document)
+        entry = self._indexes.get(document)
+        if entry is None or entry[0] is not data:
+            with self._index_lock:
+                entry = self._indexes.get(document)
+                if entry is None or entry[0] is not data:
+                    entry = self._indexes[document] = (data, build_index(data))
+        return entry[1]
+
+    def _doc_lock(self, document: str) -> RWLock:
+        with self._index_lock:
+            lock = self._doc_locks.get(document)
+            if lock is None:
+                lock = self._doc_locks[document] = RWLock(self._lock_stats)
+            return lock
+
+    @contextmanager
+    def _reading(self, document: str):
+        """Bloqueo compartido para leer un documento fuera de una transacción"""
+        if self._tx() is not None:
+            # Dentro de una transacción ninguna otra puede estar escribiendo
+            yield
+            return
+        with self._doc_lock(document).read():
+            yield
+
+    def _write(self, document: str, op: Dict[str, Any]):
+        """Aplica una operación de escritura dentro de una transacción"""
+        with self.transaction():
+            tx = self._tx()
+            if document not in tx["locked"]:
+                # Exclusivo hasta el final de la transacción
+                lock = self._doc_lock(document)
+                lock.acquire_write()
+                tx["locked"][document] = lock
+            data = self._document(document)
+            index = self._index(document)
+            self._record(tx, document, op)
+            return _apply(data, op, index)
+
+    def _record(self, tx: Dict[str, Any], document: str, op: Dict[str, Any]):
+        """Anota una operación en la transacción activa"""
+        tx["ops"].setdefault(document, []).append(op)
+
+    def _commit(self, tx: Dict[str, Any]):
+        """Persiste los documentos modificados en la transacción"""
+        for document in tx["ops"]:
+            path = self._path(document)
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            save_json(path, tx["docs"][document])
+            self._generations.bump(document)
+        for parent in _shard_parents(tx["ops"]):
+            self._generations.bump(parent)
+
+    def _rollback(self, tx: Dict[str, Any]):
+        """Descarta los cambios en memoria de la transacción"""
+        for document in tx["ops"]:
+            DOCUMENT_CACHE.invalidate(self._path(document))
+            self._loaded.pop(document, None)
+
+    @contextmanager
+    def transaction(self):
+        tx = self._tx()
+        if tx is not None:
+            # Transacción anidada: se integra en la externa
+            tx["depth"] += 1
+            try:
+                yield
+            finally:
+                tx["depth"] -= 1
+            return
+
+        started = time.perf_counter()
+        with self._lock:
+            self._lock_stats.record("transaction", time.perf_counter() - started)
+            self._process_lock.acquire()
+            tx = self._local.tx = {"depth": 1, "docs": {}, "ops": {}, "locked": {}, "after": {}}
+            try:
+                yield
+                self._commit(tx)
+            except BaseException:
+                self._rollback(tx)
+                raise
+            finally:
+                self._local.tx = None
+                for lock in tx["locked"].values():
+                    lock.release_write()
+                self._process_lock.release()
+        # Ya sin bloqueos: las funciones pueden leer o abrir otra transacción
+        _run_after_commit(tx["after"])
+
+    def after_commit(self, callback, key=None):
+        tx = self._tx()
+        if tx is None:
+            callback()
+            return
+        tx["after"].setdefault(object() if key is None else key, callback)
+
+    def load(self, document):
+        with self._reading(document):
+            return collections_of(self._document(document))
+
+    def get(self, document, collection, record_id):
+        with self._reading(document):
+            return self._index(document).by_id.get(collection, {}).get(record_id)
+
+    def find(self, document, collection, field, value):
+        with self._reading(document):
+            records = self._index(document).lookup(collection, field, value)
+            if records is not None:
+                return records
+            return [r for r in self._document(document).get(collection, []) if r.get(field) == value]
+
+    def count(self, document, collection):
+        with self._reading(document):
+            return len(self._index(document).by_id.get(collection, {}))
+
+    def query(self, document, collection, filters=None, fields=None, limit=None, after_id=None):
+        with self._reading(document):
+            return self._query(document, collection, filters, fields, limit, after_id)
+
+    def _query(self, document, collection, filters, fields, limit, after_id):
+        filters = filters or {}
+        index = self._index(document)
+
+        # Si algún filtro va por un campo indexado se parte de su cubeta más
+        # pequeña, que se recorre por id desde el cursor
+        smallest = None
+        for field, value in filters.items():
+            bucket = index.bucket(collection, field, value)
+            if bucket is not None and (smallest is None or len(bucket) < len(smallest)):
+                smallest = bucket
+
+        if smallest is not None:
+            candidates = smallest.iter_from(after_id)
+        else:
+            rows = self._document(document).get(collection, [])
+            start = 0
+            if after_id is not None:
+                # Los ids se asignan en orden creciente: se salta directamente al cursor
+                start = bisect.bisect_right(rows, _id_order(after_id), key=lambda r: _id_order(r.get("id")))
+            candidates = map(rows.__getitem__, range(start, len(rows)))
+
+        records = []
+        for record in candidates:
+            if after_id is not None and _id_order(record.get("id")) <= _id_order(after_id):
+                continue
+            if any(record.get(field) != value for field, value in filters.items()):
+                continue
+            records.append(project(record, fields))
+            if limit is not None and len(records) >= limit:
+                return records, record.get("id")
+
+        return records, None
+
+    def count_by(self, document, collection, field):
+        with self._reading(document):
+            counts = self._index(document).counts(collection, field)
+            if counts is not None:
+                return counts
+            counts = {}
+            for record in self._document(document).get(collection, []):
+                value = record.get(field)
+                if _hashable(value):
+                    counts[value] = counts.get(value, 0) + 1
+            return counts
+
+    def next_id(self, document, collection):
+        with self.transaction():
+            data = self._document(document)
+            last = data.get("_meta", {}).get("sequences", {}).get(collection)
+            if last is None:
+                # Documentos anteriores a los contadores: se parte del id máximo
+                last = max(map(_id_order, self._index(document).by_id.get(collection, {})), default=0)
+            return self._write(document, {"op": "sequence", "collection": collection, "value": last + 1})
+
+    def insert(self, document, collection, record):
+        return self._write(document, {"op": "insert", "collection": collection, "record": record})
+
+    def update(self, document, collection, record_id, changes):
+        return self._write(document, {"op": "update", "collection": collection, "id": record_id, "changes": changes})
+
+    def delete(self, document, collection, record_ids):
+        return self._write(document, {"op": "delete", "collection": collection, "ids": list(record_ids)})
+
+    def replace(self, document, data):
+        return self._write(document, {"op": "replace", "data": data})
+
+    def shards(self, document, collection):
+        # Un archivo (o log) por shard: data_dir/documento.coleccion/clave.*
+        try:
+            names = os.listdir(shard_dir(self.data_dir, document, collection))
+        except FileNotFoundError:
+            names = []
+        keys = {name.split(".", 1)[0] for name in names if not name.startswith(".")}
+        # y los creados en la transacción activa, que aún no están en disco
+        tx = self._tx()
+        if tx is not None:
+            keys.update(shard[2] for shard in map(shard_of, tx["ops"])
+                        if shard is not None and shard[:2] == (document, collection))
+        return [f"{document}.{collection}.{key}" for key in sorted(keys) if _SHARD_KEY.match(key)]
+
+    def aggregates(self, document):
+        with self._reading(document):
+            values = self._document(document).get("_meta", {}).get("aggregates")
+            return dict(values) if values is not None else None
+
+    def add_aggregates(self, document, deltas):
+        self._write(document, {"op": "aggregate", "deltas": deltas})
+
+    def set_aggregates(self, document, values, replace=False):
+        self._write(document, {"op": "aggregate", "values": values, "replace": replace})
+
+    def version(self, document):
+        # Contador compartido entre procesos, incrementado en cada guardado
+        return self._generations.get(document)
+
+    def _signature_paths(self, document: str) -> List[str]:
+        # Los guardados son atómicos (archivo nuevo renombrado): el directorio
+        # de los shards cambia cada vez que se guarda uno de ellos
+        return [self._path(document)] + [shard_dir(self.data_dir, document, collection)
+                                         for collection in SHARDS.get(document, {})]
+
+    def signature(self, document):
+        return file_signatures(*self._signature_paths(document))
+
+    def stats(self):
+        """Esperas en los bloqueos (transacciones, lecturas, escrituras y entre procesos)"""
+        return {"locks": self._lock_stats.snapshot()}
+
+
+def _shard_parents(documents) -> List[str]:
+    """Documentos principales de los shards de documents que no están ya en documents"""
+    parents = {shard[0] for shard in map(shard_of, documents) if shard is not None}
+    return sorted(parents.difference(documents))
+
+
+def project(record: dict, fields: Optional[List[str]]) -> dict:
+    """Copia del registro con solo los campos pedidos (y siempre el id)"""
+    if not fields:
+        return record
+    projected = {"id": record.get("id")}
+    for field in fields:
+        if field in record:
+            projected[field] = record[field]
+    return projected
+
+
+def query_document(storage: Storage, document: str, query: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Datos de un documento según la consulta de GET /api/module/<name>.
+
+    query puede traer:
+    - collections: colecciones a devolver (por defecto todas)
+    - filters: {campo: valor}; se aplica a cada colección pedida
+    - fields: campos a devolver; "coleccion.campo" limita el campo a esa colección
+    - limit / cursor: paginación por id
+
+    Sin consulta se devuelve el documento completo. Con limit se añade
+    "_page": {coleccion: {"next_cursor": ...}}.
+
+    Las colecciones repartidas en shards se devuelven como una sola, con
+    los registros de todos sus shards ordenados por id (o solo los del
+    shard del valor pedido si se filtra por el campo de reparto).
+    """
+    if not query:
+        data = storage.load(document)
+        for collection in SHARDS.get(document, {}):
+            shards = [storage.load(shard).get(collection, []) for shard in storage.shards(document, collection)]
+            data[collection] = list(heapq.merge(*shards, key=lambda r: _id_order(r.get("id"))))
+        return data
+
+    known = list(SCHEMA.get(document, {})) + list(SHARDS.get(document, {}))
+    collections = query.get("collections") or known
+    for collection in collections:
+        if collection not in known:
+            raise ValueError(f"Colección desconocida: {collection}")
+
+    result: Dict[str, Any] = {}
+    pages = {}
+    for collection in collections:
+        records, cursor = _query_collection(
+            storage, document, collection,
+            filters=query.get("filters"),
+            fields=_fields_for(query.get("fields"), collection),
+            limit=query.get("limit"),
+            after_id=query.get("cursor")
+        )
+        result[collection] = records
+        if query.get("limit") is not None:
+            pages[collection] = {"next_cursor": cursor}
+
+    if pages:
+        result["_page"] = pages
+    return result
+
+
+def export_document(storage: Storage, document: str, query: Optional[Dict[str, Any]]) -> Iterator[dict]:
+    """
+    Registros de una colección para GET /api/module/<name>/export.
+
+    query es la misma que en query_document, pero debe indicar una sola
+    colección; cursor es el último id ya exportado.
+    """
+    query = query or {}
+    collections = query.get("collections") or []
+    if len(collections) != 1:
+        raise ValueError("Indica una colección a exportar (?collection=...)")
+    collection = collections[0]
+    field = SHARDS.get(document, {}).get(collection)
+    if field is not None:
+        return _iter_shards(storage, document, collection, field, query.get("filters"),
+                            _fields_for(query.get("fields"), collection), query.get("cursor"))
+    if collection not in SCHEMA.get(document, {}):
+        raise ValueError(f"Colección desconocida: {collection}")
+
+    return storage.iter_records(
+        document, collection,
+        filters=query.get("filters"),
+        fields=_fields_for(query.get("fields"), collection),
+        after_id=query.get("cursor")
+    )
+
+
+def _query_collection(storage: Storage, document: str, collection: str, filters: Optional[Dict[str, Any]],
+                      fields: Optional[List[str]], limit: Optional[int], after_id) -> Tuple[List[dict], Any]:
+    """Como storage.query, pero juntando los shards si la colección está repartida"""
+    field = SHARDS.get(document, {}).get(collection)
+    if field is None:
+        return storage.query(document, collection, filters=filters, fields=fields, limit=limit, after_id=after_id)
+
+    records = _iter_shards(storage, document, collection, field, filters, fields, after_id,
+                           batch_size=min(limit, 500) if limit is not None else 500)
+    if limit is None:
+        return list(records), None
+    page = list(islice(records, limit))
+    return page, page[-1].get("id") if len(page) >= limit else None
+
+
+def _iter_shards(storage: Storage, document: str, collection: str, field: str, filters: Optional[Dict[str, Any]],
+                 fields: Optional[List[str]], after_id, batch_size: int = 500) -> Iterator[dict]:
+    """
+    Registros de una colección repartida ordenados por id: los de todos sus
+    shards, o solo los del shard de filters[field] si se filtra por él.
+    """
+    if filters and field in filters:
+        shards = [shard_document(document, collection, filters[field])]
+    else:
+        shards = storage.shards(document, collection)
+    return heapq.merge(*(
+        storage.iter_records(shard, collection, filters=filters, fields=fields,
+                             after_id=after_id, batch_size=batch_size)
+        for shard in shards
+    ), key=lambda r: _id_order(r.get("id")))
+
+
+def _fields_for(fields: Optional[List[str]], collection: str) -> Optional[List[str]]:
+    """Campos pedidos para una colección ("campo" o "coleccion.campo")"""
+    if not fields:
+        return None
+    selected = []
+    for field in fields:
+        owner, _, name = field.rpartition(".")
+        if not owner:
+            selected.append(name)
+        elif owner == collection:
+            selected.append(name)
+    return selected or None
+
+
+def _id_order(record_id) -> int:
+    """Clave para calcular el id máximo ignorando ids no numéricos"""
+    return record_id if isinstance(record_id, int) else 0
+
+
+def _position(records: List[dict], record: dict) -> int:
+    """Posición de record (el mismo objeto) en una colección ordenada por id"""
+    start = bisect.bisect_left(records, _id_order(record.get("id")), key=lambda r: _id_order(r.get("id")))
+    for position in range(start, len(records)):
+        if records[position] is record:
+            return position
+    # Colección con ids desordenados
+    return next(position for position, r in enumerate(records) if r is record)
+
+
+def _hashable(value) -> bool:
+    try:
+        hash(value)
+    except TypeError:
+        return False
+    return True
+
+
+class _Bucket:
+    """
+    Registros de una cubeta del índice: {id: registro} en orden de llegada
+    más sus ids ordenados, para recorrerla por id desde un cursor sin
+    copiarla ni ordenarla en cada página.
+    """
+
+    __slots__ = ("records", "_keys", "_ids")
+
+    def __init__(self):
+        self.records: Dict[Any, dict] = {}
+        self._keys: List[int] = []
+        self._ids: List[Any] = []
+
+    def __len__(self) -> int:
+        return len(self.records)
+
+    def put(self, record_id, record: dict):
+        if record_id not in self.records:
+            # Los ids llegan casi siempre en orden creciente: se añade al final
+            key = _id_order(record_id)
+            if not self._keys or self._keys[-1] <= key:
+                self._keys.append(key)
+                self._ids.append(record_id)
+            else:
+                position = bisect.bisect_right(self._keys, key)
+                self._keys.insert(position, key)
+                self._ids.insert(position, record_id)
+        self.records[record_id] = record
+
+    def discard(self, record_id):
+        if record_id not in self.records:
+            return
+        del self.records[record_id]
+        position = bisect.bisect_left(self._keys, _id_order(record_id))
+        while self._ids[position] != record_id:
+            position += 1
+        del self._keys[position]
+        del self._ids[position]
+
+    def iter_from(self, after_id=None) -> Iterator[dict]:
+        """Registros por id creciente, los de id mayor que after_id si se indica"""
+        start = 0 if after_id is None else bisect.bisect_right(self._keys, _id_order(after_id))
+        records, ids = self.records, self._ids
+        return (records[ids[position]] for position in range(start, len(ids)))
+
+
+class DocumentIndex:
+    """
+    Índices en memoria de un documento.
+
+    by_id: {coleccion: {id: registro}}
+    by_field: {coleccion: {campo: {valor: _Bucket}}} para los campos
+    indexados de SCHEMA (claves foráneas)
+    """
+
+    def __init__(self, data: Dict[str, Any]):
+        self.rebuild(data)
+
+    def rebuild(self, data: Dict[str, Any]):
+        """Reconstruye todos los índices recorriendo el documento"""
+        self.by_id: Dict[str, Dict[Any, dict]] = {}
+        self.by_field: Dict[str, Dict[str, Dict[Any, _Bucket]]] = {}
+        for collection, records in collections_of(data).items():
+            for record in records:
+                self.add(collection, record)
+
+    def add(self, collection: str, record: dict):
+        record_id = record.get("id")
+        self.by_id.setdefault(collection, {})[record_id] = record
+
+        fields = self.by_field.setdefault(collection, {field: {} for field in indexed_fields(collection)})
+        for field, buckets in fields.items():
+            value = record.get(field)
+            if _hashable(value):
+                _bucket(buckets, value).put(record_id, record)
+
+    def change(self, collection: str, record: dict, changes: dict) -> dict:
+        """
+        Sustituye el registro por una copia con changes aplicados y la
+        devuelve, moviéndola de cubeta si cambia un campo indexado.
+        """
+        record_id = record.get("id")
+        updated = _records.updated(collection, record, changes)
+
+        self.by_id.setdefault(collection, {})[record_id] = updated
+        for field, buckets in self.by_field.get(collection, {}).items():
+            old = record.get(field)
+            if old == updated.get(field) and _hashable(old) and old in buckets and record_id in buckets[old].records:
+                # Mismo valor: se sustituye sin perder la posición en la cubeta
+                buckets[old].put(record_id, updated)
+                continue
+            if _hashable(old) and old in buckets:
+                buckets[old].discard(record_id)
+                if not buckets[old]:
+                    del buckets[old]
+            if _hashable(updated.get(field)):
+                _bucket(buckets, updated.get(field)).put(record_id, updated)
+
+        return updated
+
+    def remove(self, collection: str, record: dict):
+        record_id = record.get("id")
+        self.by_id.get(collection, {}).pop(record_id, None)
+        for field, buckets in self.by_field.get(collection, {}).items():
+            value = record.get(field)
+            if _hashable(value) and value in buckets:
+                buckets[value].discard(record_id)
+                if not buckets[value]:
+                    del buckets[value]
+
+    def bucket(self, collection: str, field: str, value) -> Optional[_Bucket]:
+        """Cubeta de field == value (vacía si no hay registros), o None si el campo no está indexado"""
+        buckets = self.by_field.get(collection, {}).get(field)
+        if buckets is None or not _hashable(value):
+            return None
+        return buckets.get(value, _EMPTY_BUCKET)
+
+    def lookup(self, collection: str, field: str, value) -> Optional[List[dict]]:
+        """Registros con field == value, o None si el campo no está indexado"""
+        bucket = self.bucket(collection, field, value)
+        if bucket is None:
+            return None
+        return list(bucket.records.values())
+
+    def counts(self, collection: str, field: str) -> Optional[Dict[Any, int]]:
+        """Número de registros por valor de field, o None si no está indexado"""
+        buckets = self.by_field.get(collection, {}).get(field)
+        if buckets is None:
+            return None
+        return {value: len(records) for value, records in buckets.items()}
+
+
+def _bucket(buckets: Dict[Any, _Bucket], value) -> _Bucket:
+    """Cubeta de value, creándola si no existe"""
+    bucket = buckets.get(value)
+    if bucket is None:
+        bucket = buckets[value] = _Bucket()
+    return bucket
+
+
+# Cubeta de los valores sin registros (nunca se modifica)
+_EMPTY_BUCKET = _Bucket()
+
+
+def build_index(data: Dict[str, Any]) -> DocumentIndex:
+    """Construye los índices de un documento"""
+    return DocumentIndex(data)
+
+
+def _apply(data: Dict[str, Any], op: Dict[str, Any], index: DocumentIndex):
+    """Aplica una operación de escritura sobre un documento en memoria y sus índices"""
+    kind = op["op"]
+
+    if kind == "insert":
+        # Copia compacta si la colección está registrada (ver _records.py)
+        record = _records.compact(op["collection"], op["record"])
+        data.setdefault(op["collection"], []).append(record)
+        index.add(op["collection"], record)
+        return record
+
+    if kind == "update":
+        record = index.by_id.get(op["collection"], {}).get(op["id"])
+        if record is None:
+            return None
+        records = data.get(op["collection"], [])
+        updated = index.change(op["collection"], record, op["changes"])
+        records[_position(records, record)] = updated
+        return updated
+
+    if kind == "delete":
+        by_id = index.by_id.get(op["collection"], {})
+        removed = [by_id[record_id] for record_id in op["ids"] if record_id in by_id]
+        if removed:
+            gone = {id(record) for record in removed}
+            records = data.get(op["collection"], [])
+            records[:] = [r for r in records if id(r) not in gone]
+            for record in removed:
+                index.remove(op["collection"], record)
+        return removed
+
+    if kind == "sequence":
+        sequences = data.setdefault("_meta", {}).setdefault("sequences", {})
+        sequences[op["collection"]] = max(sequences.get(op["collection"], 0), op["value"])
+        return sequences[op["collection"]]
+
+    if kind == "aggregate":
+        meta = data.setdefault("_meta", {})
+        if op.get("replace") or "aggregates" not in meta:
+            meta["aggregates"] = {}
+        aggregates = meta["aggregates"]
+        for key, value in op.get("values", {}).items():
+            aggregates[key] = value
+        for key, delta in op.get("deltas", {}).items():
+            aggregates[key] = aggregates.get(key, 0) + delta
+        return aggregates
+
+    if kind == "replace":
+        data.clear()
+        data.update(op["data"])
+        _records.compact_document(data)
+        index.rebuild(data)
+        return data
+
+    raise ValueError(f"Operación desconocida: {kind}")
+
+
+class SqliteStorage(Storage):
+    """
+    Almacenamiento en SQLite (modo WAL) con una tabla por colección.
+
+    Cada tabla guarda el registro completo serializado en la columna "datos",
+    con el id como clave primaria y una columna indexada por cada clave
+    foránea declarada en SCHEMA. Cada shard tiene su propia tabla
+    (coleccion__clave). Se usa una conexión por hilo.
+    """
+
+    def __init__(self, db_path: str):
+        self.db_path = db_path
+        self.data_dir = os.path.dirname(os.path.abspath(db_path))
+        self._local = threading.local()
+        self._tables_lock = threading.Lock()
+        self._tables = set()
+        self._lock_stats = LockStats()
+
+    def _conn(self) -> sqlite3.Connection:
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = sqlite3.connect(self.db_path, timeout=30, isolation_level=None, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.execute("CREATE TABLE IF NOT EXISTS _sequences (name TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS _aggregates "
+                "(document TEXT NOT NULL, key TEXT NOT NULL, value NUMERIC, PRIMARY KEY (document, key))"
+            )
+            conn.execute("CREATE TABLE IF NOT EXISTS _versions (document TEXT PRIMARY KEY, value INTEGER NOT NULL)")
+            self._local.conn = conn
+            self._local.depth = 0
+            self._local.touched = set()
+            self._local.created = set()
+        return conn
+
+    def _table(self, document: str, collection: str) -> str:
+        """Nombre de tabla de la colección (o de su shard), creándola si no existe"""
+        if not _IDENTIFIER.match(collection):
+            raise ValueError(f"Nombre de colección no válido: {collection}")
+        shard = shard_of(document)
+        table = f"{collection}__{shard[2]}" if shard is not None else collection
+
+        conn = self._conn()
+        if table not in self._tables and table not in self._local.created:
+            with self._tables_lock:
+                fields = indexed_fields(collection)
+                columns = "".join(f", {field}" for field in fields)
+                conn.execute(f"CREATE TABLE IF NOT EXISTS {table} (id INTEGER PRIMARY KEY{columns}, datos TEXT NOT NULL)")
+                for field in fields:
+                    conn.execute(f"CREATE INDEX IF NOT EXISTS idx_{table}_{field} ON {table} ({field})")
+                # Dentro de una transacción la tabla solo existe si se confirma:
+                # hasta entonces no la ven los demás hilos y un ROLLBACK la deshace
+                if self._local.depth:
+                    self._local.created.add(table)
+                else:
+                    self._tables.add(table)
+        return table
+
+    def _touch(self, document: str):
+        """Marca el documento (y el principal, si es un shard) como modificado en la transacción"""
+        self._local.touched.add(document)
+        shard = shard_of(document)
+        if shard is not None:
+            self._local.touched.add(shard[0])
+
+    @contextmanager
+    def transaction(self):
+        conn = self._conn()
+        if self._local.depth:
+            self._local.depth += 1
+            try:
+                yield
+            finally:
+                self._local.depth -= 1
+            return
+
+        # SQLite admite un solo escritor: BEGIN IMMEDIATE espera a que termine el actual
+        started = time.perf_counter()
+        conn.execute("BEGIN IMMEDIATE")
+        self._lock_stats.record("transaction", time.perf_counter() - started)
+        self._local.depth = 1
+        self._local.touched = set()
+        created = self._local.created = set()
+        after = self._local.after = {}
+        try:
+            yield
+            if self._local.touched:
+                conn.executemany(
+                    "INSERT INTO _versions (document, value) VALUES (?, 1) "
+                    "ON CONFLICT(document) DO UPDATE SET value = value + 1",
+                    [(document,) for document in self._local.touched]
+                )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+        finally:
+            self._local.depth = 0
+            self._local.created = set()
+        with self._tables_lock:
+            self._tables.update(created)
+        _run_after_commit(after)
+
+    def after_commit(self, callback, key=None):
+        self._conn()
+        if not self._local.depth:
+            callback()
+            return
+        self._local.after.setdefault(object() if key is None else key, callback)
+
+    def _row_values(self, collection: str, record: dict) -> list:
+        values = [record.get("id")]
+        values.extend(record.get(field) for field in indexed_fields(collection))
+        values.append(serializer.dumps_str(record))
+        return values
+
+    def _insert_rows(self, document: str, collection: str, records: List[dict]):
+        table = self._table(document, collection)
+        placeholders = ", ".join("?" * (len(indexed_fields(collection)) + 2))
+        self._conn().executemany(
+            f"INSERT INTO {table} VALUES ({placeholders})",
+            (self._row_values(collection, r) for r in records)
+        )
+
+    def load(self, document):
+        data = {}
+        for collection in schema_of(document):
+            rows = self._conn().execute(f"SELECT datos FROM {self._table(document, collection)} ORDER BY id")
+            data[collection] = [serializer.loads(row[0]) for row in rows]
+        return data
+
+    def get(self, document, collection, record_id):
+        row = self._conn().execute(
+            f"SELECT datos FROM {self._table(document, collection)} WHERE id = ?", (record_id,)
+        ).fetchone()
+        return serializer.loads(row[0]) if row else None
+
+    def find(self, document, collection, field, value):
+        table = self._table(document, collection)
+        if field in indexed_fields(collection):
+            rows = self._conn().execute(f"SELECT datos FROM {table} WHERE {field} IS ? ORDER BY id", (value,))
+            return [serializer.loads(row[0]) for row in rows]
+
+        rows = self._conn().execute(f"SELECT datos FROM {table} ORDER BY id")
+        return [r for r in (serializer.loads(row[0]) for row in rows) if r.get(field) == value]
+
+    def count(self, document, collection):
+        return self._conn().execute(f"SELECT COUNT(*) FROM {self._table(document, collection)}").fetchone()[0]
+
+    def query(self, document, collection, filters=None, fields=None, limit=None, after_id=None):
+        table = self._table(document, collection)
+        where, params = [], []
+
+        if after_id is not None:
+            where.append("id > ?")
+            params.append(after_id)
+        for field, value in (filters or {}).items():
+            if not _IDENTIFIER.match(field):
+                raise ValueError(f"Campo no válido: {field}")
+            column = field if field in indexed_fields(collection) else f"json_extract(datos, '$.{field}')"
+            where.append(f"{column} IS ?")
+            params.append(value)
+
+        sql = f"SELECT datos FROM {table}"
+        if where:
+            sql += " WHERE " + " AND ".join(where)
+        sql += " ORDER BY id"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        records = [project(serializer.loads(row[0]), fields) for row in self._conn().execute(sql, params)]
+        cursor = records[-1].get("id") if limit is not None and len(records) >= limit else None
+        return records, cursor
+
+    def count_by(self, document, collection, field):
+        table = self._table(document, collection)
+        if field in indexed_fields(collection):
+            rows = self._conn().execute(f"SELECT {field}, COUNT(*) FROM {table} GROUP BY {field}")
+            return {value: n for value, n in rows}
+
+        counts = {}
+        for row in self._conn().execute(f"SELECT datos FROM {table}"):
+            value = serializer.loads(row[0]).get(field)
+            if _hashable(value):
+                counts[value] = counts.get(value, 0) + 1
+        return counts
+
+    def next_id(self, document, collection):
+        table = self._table(document, collection)
+        with self.transaction():
+            conn = self._conn()
+            conn.execute(
+                f"INSERT OR IGNORE INTO _sequences (name, value) SELECT ?, COALESCE(MAX(id), 0) FROM {table}",
+                (collection,)
+            )
+            row = conn.execute(
+                "UPDATE _sequences SET value = value + 1 WHERE name = ? RETURNING value", (collection,)
+            ).fetchone()
+        return row[0]
+
+    def aggregates(self, document):
+        rows = self._conn().execute("SELECT key, value FROM _aggregates WHERE document = ?", (document,)).fetchall()
+        return {key: value for key, value in rows} if rows else None
+
+    def add_aggregates(self, document, deltas):
+        with self.transaction():
+            self._conn().executemany(
+                "INSERT INTO _aggregates (document, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(document, key) DO UPDATE SET value = value + excluded.value",
+                [(document, key, delta) for key, delta in deltas.items()]
+            )
+
+    def set_aggregates(self, document, values, replace=False):
+        with self.transaction():
+            conn = self._conn()
+            if replace:
+                conn.execute("DELETE FROM _aggregates WHERE document = ?", (document,))
+            conn.executemany(
+                "INSERT INTO _aggregates (document, key, value) VALUES (?, ?, ?) "
+                "ON CONFLICT(document, key) DO UPDATE SET value = excluded.value",
+                [(document, key, value) for key, value in values.items()]
+            )
+
+    def _set_sequence(self, collection: str, value: int):
+        """Fija el contador de ids de una colección (migraciones)"""
+        self._conn().execute(
+            "INSERT INTO _sequences (name, value) VALUES (?, ?) "
+            "ON CONFLICT(name) DO UPDATE SET value = MAX(value, excluded.value)",
+            (collection, value)
+        )
+
+    def version(self, document):
+        row = self._conn().execute("SELECT value FROM _versions WHERE document = ?", (document,)).fetchone()
+        return row[0] if row else 0
+
+    def signature(self, document):
+        # Las escrituras van al WAL y pasan a la base de datos en cada checkpoint
+        return file_signatures(self.db_path, self.db_path + "-wal")
+
+    def insert(self, document, collection, record):
+        with self.transaction():
+            self._touch(document)
+            self._insert_rows(document, collection, [record])
+        return record
+
+    def update(self, document, collection, record_id, changes):
+        with self.transaction():
+            record = self.get(document, collection, record_id)
+            if record is None:
+                return None
+            self._touch(document)
+            record.update(changes)
+            values = self._row_values(collection, record)
+            fields = indexed_fields(collection)
+            assignments = "".join(f"{field} = ?, " for field in fields)
+            self._conn().execute(
+                f"UPDATE {self._table(document, collection)} SET {assignments}datos = ? WHERE id = ?",
+                values[1:] + [record_id]
+            )
+        return record
+
+    def delete(self, document, collection, record_ids):
+        table = self._table(document, collection)
+        removed = []
+        with self.transaction():
+            conn = self._conn()
+            ids = list(record_ids)
+            # Por tandas: SQLite limita el número de parámetros de una consulta
+            for start in range(0, len(ids), 500):
+                chunk = ids[start:start + 500]
+                marks = ", ".join("?" * len(chunk))
+                rows = conn.execute(f"DELETE FROM {table} WHERE id IN ({marks}) RETURNING datos", chunk)
+                removed.extend(serializer.loads(row[0]) for row in rows)
+            if removed:
+                self._touch(document)
+        return removed
+
+    def replace(self, document, data):
+        with self.transaction():
+            self._touch(document)
+            for collection, records in data.items():
+                self._conn().execute(f"DELETE FROM {self._table(document, collection)}")
+                self._insert_rows(document, collection, records)
+
+    def shards(self, document, collection):
+        prefix = f"{collection}__"
+        rows = self._conn().execute(
+            "SELECT name FROM sqlite_master WHERE type = 'table' AND substr(name, 1, ?) = ?", (len(prefix), prefix)
+        )
+        return sorted(f"{document}.{collection}.{row[0][len(prefix):]}" for row in rows)
+
+    def close(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is not None:
+            conn.close()
+            self._local.conn = None
+
+    def stats(self):
+        """Esperas para obtener el bloqueo de escritura de SQLite"""
+        return {"locks": self._lock_stats.snapshot()}
+
+
+def create_storage(backend: str, data_dir: str, **options) -> Storage:
+    """Crea el almacenamiento indicado ("json", "jsonlog" o "sqlite") sobre data_dir"""
+    if backend == "json":
+        return JsonStorage(data_dir)
+    if backend == "jsonlog":
+        from ._journal import JournaledJsonStorage
+        return JournaledJsonStorage(data_dir, **options)
+    if backend == "sqlite":
+        return SqliteStorage(os.path.join(data_dir, "jocarsa.db"))
+    raise ValueError(f"Almacenamiento desconocido: {backend}")
+
+
+_default_storages: Dict[str, Storage] = {}
+_default_lock = threading.Lock()
+
+
+def get_storage(context) -> Storage:
+    """
+    Almacenamiento del contexto de la petición.
+
+    Si el contexto no trae uno (llamadas directas a los módulos) se usa un
+    JsonStorage sobre context["DATA_DIR"].
+    """
+    storage = context.get("storage")
+    if storage is not None:
+        return storage
+
+    data_dir = context["DATA_DIR"]
+    with _default_lock:
+        storage = _default_storages.get(data_dir)
+        if storage is None:
+            storage = _default_storages[data_dir] = JsonStorage(data_dir)
+        return storage
+
+
+def migrate_json_to_sqlite(data_dir: str, db_path: Optional[str] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Migra de una sola vez los archivos data/*.json a SQLite.
+
+    Sustituye en la base de datos el contenido de cada documento de SCHEMA que
+    tenga archivo JSON, y de cada shard, y devuelve el número de registros
+    migrados por colección.
+    """
+    db_path = db_path or os.path.join(data_dir, "jocarsa.db")
+    source = JsonStorage(data_dir)
+    target = SqliteStorage(db_path)
+    migrated = {}
+
+    try:
+        with target.transaction():
+            shards = [shard for document, collections in SHARDS.items()
+                      for collection in collections for shard in source.shards(document, collection)]
+            for document in list(SCHEMA) + shards:
+                if not os.path.exists(source._path(document)):
+                    continue
+                data = empty_document(document)
+                data.update(source.load(document))
+                target.replace(document, data)
+                sequences = source._document(document).get("_meta", {}).get("sequences", {})
+                for collection, value in sequences.items():
+                    target._set_sequence(collection, value)
+                migrated[document] = {collection: len(records) for collection, records in data.items()}
+    finally:
+        target.close()
+
+    return migrated
@@ -3,10 +3,12 @@ Módulo CRM - Gestión de Clientes
 Originalmente un programa independiente para gestionar contactos y clientes
 """
 
-import os
-import json
 from datetime import datetime
 
+from ._storage import get_storage, query_document, export_document
+from . import _aggregates as aggregates
+from . import _events as events
+
 MODULE_INFO = {
     "name": "CRM - Gestión de Clientes",
     "description": "Gestiona clientes, contactos y oportunidades de venta",
@@ -14,84 +16,95 @@ MODULE_INFO = {
     "category": "marketing"
 }
 
-def _get_data_file(context):
-    """Ruta del archivo de datos"""
-    return os.path.join(context["DATA_DIR"], "crm_clientes.json")
+DOCUMENT = "crm_clientes"
 
 def _load_data(context):
-    """Carga los datos del archivo JSON"""
-    file_path = _get_data_file(context)
-    
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    
-    return {
-        "clientes": [],
-        "contactos": [],
-        "oportunidades": []
-    }
+    """Carga los datos del módulo (con la consulta de la petición, si la hay)"""
+    return query_document(get_storage(context), DOCUMENT, context.get("query"))
 
-def _save_data(context, data):
-    """Guarda los datos en el archivo JSON"""
-    file_path = _get_data_file(context)
-    
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def _deltas(collection, record, sign):
+    """Contribución de un registro a los agregados del resumen"""
+    estado = record.get("estado")
+    deltas = {collection: sign}
+    if collection in ("clientes", "oportunidades"):
+        deltas[f"{collection}.estado.{estado}"] = sign
+    if collection == "oportunidades":
+        deltas[f"oportunidades.valor.{estado}"] = sign * (record.get("valor") or 0)
+    return deltas
+
+def _compute_aggregates(storage):
+    """Agregados calculados desde cero"""
+    return aggregates.compute(_deltas, storage.load(DOCUMENT))
+
+aggregates.register(DOCUMENT, _compute_aggregates)
+
+def _track(storage, collection, before, after):
+    """Actualiza los agregados con el cambio de un registro y lo publica para la interfaz"""
+    deltas = aggregates.changed(_deltas, collection, before, after)
+    aggregates.track(storage, DOCUMENT, lambda: _compute_aggregates(storage), deltas)
+    events.changed(storage, __name__, collection, before, after, deltas,
+                   lambda: get_summary({"storage": storage}))
 
 def get_data(context):
     """Obtiene todos los datos del módulo CRM"""
     return _load_data(context)
 
+def export(context):
+    """Recorre registro a registro una colección del módulo CRM (exportación NDJSON)"""
+    return export_document(get_storage(context), DOCUMENT, context.get("query"))
+
 def execute(context):
     """Ejecuta acciones en el módulo CRM"""
     action = context.get("action", "")
     params = context.get("params", {})
     
-    data = _load_data(context)
+    storage = get_storage(context)
     
     if action == "add_cliente":
         # Añadir un nuevo cliente
-        cliente = {
-            "id": len(data["clientes"]) + 1,
-            "nombre": params.get("nombre", ""),
-            "email": params.get("email", ""),
-            "telefono": params.get("telefono", ""),
-            "empresa": params.get("empresa", ""),
-            "fecha_creacion": datetime.now().isoformat(),
-            "estado": "activo"
-        }
-        data["clientes"].append(cliente)
-        _save_data(context, data)
+        with storage.transaction():
+            cliente = {
+                "id": storage.next_id(DOCUMENT, "clientes"),
+                "nombre": params.get("nombre", ""),
+                "email": params.get("email", ""),
+                "telefono": params.get("telefono", ""),
+                "empresa": params.get("empresa", ""),
+                "fecha_creacion": datetime.now().isoformat(),
+                "estado": "activo"
+            }
+            storage.insert(DOCUMENT, "clientes", cliente)
+            _track(storage, "clientes", None, cliente)
         return {"cliente": cliente, "message": "Cliente creado exitosamente"}
     
     elif action == "add_contacto":
         # Añadir un nuevo contacto relacionado con un cliente
-        contacto = {
-            "id": len(data["contactos"]) + 1,
-            "cliente_id": params.get("cliente_id"),
-            "fecha": datetime.now().isoformat(),
-            "tipo": params.get("tipo", "llamada"),  # llamada, email, reunión
-            "notas": params.get("notas", ""),
-            "usuario": context.get("session", {}).get("usuario", "Sistema")
-        }
-        data["contactos"].append(contacto)
-        _save_data(context, data)
+        with storage.transaction():
+            contacto = {
+                "id": storage.next_id(DOCUMENT, "contactos"),
+                "cliente_id": params.get("cliente_id"),
+                "fecha": datetime.now().isoformat(),
+                "tipo": params.get("tipo", "llamada"),  # llamada, email, reunión
+                "notas": params.get("notas", ""),
+                "usuario": context.get("session", {}).get("usuario", "Sistema")
+            }
+            storage.insert(DOCUMENT, "contactos", contacto)
+            _track(storage, "contactos", None, contacto)
         return {"contacto": contacto, "message": "Contacto registrado"}
     
     elif action == "add_oportunidad":
         # Añadir una oportunidad de venta
-        oportunidad = {
-            "id": len(data["oportunidades"]) + 1,
-            "cliente_id": params.get("cliente_id"),
-            "titulo": params.get("titulo", ""),
-            "valor": params.get("valor", 0),
-            "probabilidad": params.get("probabilidad", 50),
-            "estado": "abierta",  # abierta, en_proceso, ganada, perdida
-            "fecha_creacion": datetime.now().isoformat()
-        }
-        data["oportunidades"].append(oportunidad)
-        _save_data(context, data)
+        with storage.transaction():
+            oportunidad = {
+                "id": storage.next_id(DOCUMENT, "oportunidades"),
+                "cliente_id": params.get("cliente_id"),
+                "titulo": params.get("titulo", ""),
+                "valor": params.get("valor", 0),
+                "probabilidad": params.get("probabilidad", 50),
+                "estado": "abierta",  # abierta, en_proceso, ganada, perdida
+                "fecha_creacion": datetime.now().isoformat()
+            }
+            storage.insert(DOCUMENT, "oportunidades", oportunidad)
+            _track(storage, "oportunidades", None, oportunidad)
         return {"oportunidad": oportunidad, "message": "Oportunidad creada"}
     
     elif action == "update_estado_oportunidad":
@@ -99,29 +112,50 @@ def execute(context):
         oportunidad_id = params.get("id")
         nuevo_estado = params.get("estado")
         
-        for op in data["oportunidades"]:
-            if op["id"] == oportunidad_id:
-                op["estado"] = nuevo_estado
-                _save_data(context, data)
-                return {"oportunidad": op, "message": "Estado actualizado"}
+        with storage.transaction():
+            op = storage.get(DOCUMENT, "oportunidades", oportunidad_id)
+            if op is None:
+                return {"error": "Oportunidad no encontrada"}
+            
+            cambios = {"estado": nuevo_estado}
+            if nuevo_estado in ("ganada", "perdida"):
+                cambios["fecha_cierre"] = datetime.now().isoformat()
+            
+            antes = dict(op)
+            op = storage.update(DOCUMENT, "oportunidades", oportunidad_id, cambios)
+            _track(storage, "oportunidades", antes, op)
         
-        return {"error": "Oportunidad no encontrada"}
+        return {"oportunidad": op, "message": "Estado actualizado"}
+    
+    elif action == "get_by_cliente":
+        # Obtener contactos y oportunidades de un cliente (índice por cliente_id)
+        cliente_id = params.get("cliente_id")
+        return {
+            "cliente": storage.get(DOCUMENT, "clientes", cliente_id),
+            "contactos": storage.find(DOCUMENT, "contactos", "cliente_id", cliente_id),
+            "oportunidades": storage.find(DOCUMENT, "oportunidades", "cliente_id", cliente_id)
+        }
+    
+    elif action == "rebuild_aggregates":
+        # Recalcular los agregados del resumen y comprobar desviaciones
+        return aggregates.rebuild(storage, DOCUMENT, lambda: _compute_aggregates(storage))
     
     else:
         return {"error": f"Acción desconocida: {action}"}
 
 def get_summary(context):
     """Obtiene un resumen para el dashboard"""
-    data = _load_data(context)
+    storage = get_storage(context)
+    agg = aggregates.ensure(storage, DOCUMENT, lambda: _compute_aggregates(storage))
     
-    # Calcular estadísticas
-    total_clientes = len(data["clientes"])
-    clientes_activos = len([c for c in data["clientes"] if c.get("estado") == "activo"])
+    # Estadísticas a partir de los agregados incrementales
+    total_clientes = agg.get("clientes", 0)
+    clientes_activos = agg.get("clientes.estado.activo", 0)
     
-    total_oportunidades = len(data["oportunidades"])
-    oportunidades_abiertas = len([o for o in data["oportunidades"] if o.get("estado") == "abierta"])
+    total_oportunidades = agg.get("oportunidades", 0)
+    oportunidades_abiertas = agg.get("oportunidades.estado.abierta", 0)
     
-    valor_oportunidades = sum(o.get("valor", 0) for o in data["oportunidades"] if o.get("estado") in ["abierta", "en_proceso"])
+    valor_oportunidades = sum(agg.get(f"oportunidades.valor.{estado}", 0) for estado in ["abierta", "en_proceso"])
     
     return {
         "total_clientes": total_clientes,
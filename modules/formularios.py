@@ -1,12 +1,19 @@
 """
 Módulo de Formularios Dinámicos
 Originalmente un programa independiente para crear formularios online
+
+Las respuestas de cada formulario se guardan en su propio shard (ver SHARDS
+en _storage.py): un formulario muy usado no hace más lentos a los demás.
 """
 
-import os
-import json
+import weakref
 from datetime import datetime
 
+from ._storage import get_storage, query_document, export_document, shard_document
+from . import _aggregates as aggregates
+from . import _events as events
+from . import _records as records
+
 MODULE_INFO = {
     "name": "Formularios Online",
     "description": "Crea y gestiona formularios dinámicos para recopilar información",
@@ -14,118 +21,210 @@ MODULE_INFO = {
     "category": "oficina"
 }
 
-def _get_data_file(context):
-    """Ruta del archivo de datos"""
-    return os.path.join(context["DATA_DIR"], "formularios.json")
+DOCUMENT = "formularios"
+
+# Almacenamientos en los que ya se han repartido las respuestas antiguas
+_sharded = weakref.WeakSet()
+
+def _shard(formulario_id):
+    """Documento con las respuestas de un formulario"""
+    return shard_document(DOCUMENT, "respuestas", formulario_id)
+
+def _migrate_respuestas(storage):
+    """
+    Reparte en sus shards las respuestas que versiones anteriores guardaban
+    en el documento principal (una sola vez por almacenamiento)
+    """
+    if storage in _sharded:
+        return
+    if storage.count(DOCUMENT, "respuestas"):
+        with storage.transaction():
+            antiguas = list(storage.iter_records(DOCUMENT, "respuestas"))
+            if antiguas:
+                # El contador de ids sigue en el documento principal: se
+                # reserva uno para que no vuelva a empezar al vaciar la colección
+                storage.next_id(DOCUMENT, "respuestas")
+                for respuesta in antiguas:
+                    storage.insert(_shard(respuesta.get("formulario_id")), "respuestas", respuesta)
+                storage.delete(DOCUMENT, "respuestas", [r.get("id") for r in antiguas])
+                print(f"📦 {len(antiguas)} respuestas repartidas por formulario")
+    _sharded.add(storage)
+
+def _get_storage(context):
+    """Almacenamiento de la petición, con las respuestas ya repartidas por formulario"""
+    storage = get_storage(context)
+    _migrate_respuestas(storage)
+    return storage
 
 def _load_data(context):
-    """Carga los datos del archivo JSON"""
-    file_path = _get_data_file(context)
+    """Carga los datos del módulo (con la consulta de la petición, si la hay)"""
+    return query_document(_get_storage(context), DOCUMENT, context.get("query"))
+
+def _deltas(collection, record, sign):
+    """Contribución de un registro a los agregados del resumen"""
+    deltas = {collection: sign}
+    if collection == "formularios" and record.get("activo", False):
+        deltas["formularios.activos"] = sign
+    return deltas
+
+def _compute_aggregates(storage):
+    """Agregados calculados desde cero, incluido el formulario más popular"""
+    _migrate_respuestas(storage)
+    data = storage.load(DOCUMENT)
+    agg = aggregates.compute(_deltas, {"formularios": data.get("formularios", [])})
+    agg["respuestas"] = sum(storage.count(shard, "respuestas") for shard in storage.shards(DOCUMENT, "respuestas"))
     
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    # El primero con más respuestas (los que no tienen ninguna no cuentan)
+    popular = None
+    for form in data.get("formularios", []):
+        if form.get("respuestas_count", 0) > (popular or {}).get("respuestas_count", 0):
+            popular = form
     
-    return {
-        "formularios": [],
-        "respuestas": []
-    }
+    agg["popular.id"] = popular["id"] if popular else 0
+    agg["popular.count"] = popular.get("respuestas_count", 0) if popular else 0
+    return agg
 
-def _save_data(context, data):
-    """Guarda los datos en el archivo JSON"""
-    file_path = _get_data_file(context)
+aggregates.register(DOCUMENT, _compute_aggregates)
+
+# Las respuestas son la colección grande: registros compactos en memoria
+records.register(DOCUMENT, "respuestas", (
+    "id", "formulario_id", "respuestas", "fecha", "ip", "usuario"
+), enums=("usuario",))
+
+def _track(storage, collection, before, after):
+    """Actualiza los agregados con el cambio de un registro y lo publica para la interfaz"""
+    deltas = aggregates.changed(_deltas, collection, before, after)
+    aggregates.track(storage, DOCUMENT, lambda: _compute_aggregates(storage), deltas)
+    events.changed(storage, __name__, collection, before, after, deltas,
+                   lambda: get_summary({"storage": storage}))
+
+def _track_popular(storage, form):
+    """Marca form como el más popular si ha superado al actual"""
+    agg = aggregates.ensure(storage, DOCUMENT, lambda: _compute_aggregates(storage))
+    count = form.get("respuestas_count", 0)
+    popular_count = agg.get("popular.count", 0)
     
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    # En caso de empate gana el formulario creado antes, como al recorrer la lista
+    if count > popular_count or (count == popular_count and form["id"] < agg.get("popular.id", 0)):
+        storage.set_aggregates(DOCUMENT, {"popular.id": form["id"], "popular.count": count})
 
 def get_data(context):
     """Obtiene todos los datos del módulo de formularios"""
     return _load_data(context)
 
+def export(context):
+    """Recorre registro a registro una colección del módulo Formularios (exportación NDJSON)"""
+    return export_document(_get_storage(context), DOCUMENT, context.get("query"))
+
 def execute(context):
     """Ejecuta acciones en el módulo de formularios"""
     action = context.get("action", "")
     params = context.get("params", {})
     
-    data = _load_data(context)
+    storage = _get_storage(context)
     
     if action == "create_formulario":
         # Crear un nuevo formulario
-        formulario = {
-            "id": len(data["formularios"]) + 1,
-            "titulo": params.get("titulo", ""),
-            "descripcion": params.get("descripcion", ""),
-            "campos": params.get("campos", []),
-            # Los campos son: {name, label, type, required, options}
-            "activo": True,
-            "cliente_id": params.get("cliente_id"),  # Vinculación opcional con CRM
-            "proyecto_id": params.get("proyecto_id"),  # Vinculación opcional con Proyectos
-            "fecha_creacion": datetime.now().isoformat(),
-            "respuestas_count": 0
-        }
-        data["formularios"].append(formulario)
-        _save_data(context, data)
+        with storage.transaction():
+            formulario = {
+                "id": storage.next_id(DOCUMENT, "formularios"),
+                "titulo": params.get("titulo", ""),
+                "descripcion": params.get("descripcion", ""),
+                "campos": params.get("campos", []),
+                # Los campos son: {name, label, type, required, options}
+                "activo": True,
+                "cliente_id": params.get("cliente_id"),  # Vinculación opcional con CRM
+                "proyecto_id": params.get("proyecto_id"),  # Vinculación opcional con Proyectos
+                "fecha_creacion": datetime.now().isoformat(),
+                "respuestas_count": 0
+            }
+            storage.insert(DOCUMENT, "formularios", formulario)
+            _track(storage, "formularios", None, formulario)
         return {"formulario": formulario, "message": "Formulario creado"}
     
     elif action == "submit_respuesta":
         # Enviar respuesta a un formulario
-        respuesta = {
-            "id": len(data["respuestas"]) + 1,
-            "formulario_id": params.get("formulario_id"),
-            "respuestas": params.get("respuestas", {}),  # {campo: valor}
-            "fecha": datetime.now().isoformat(),
-            "ip": params.get("ip", ""),
-            "usuario": params.get("usuario", "Anónimo")
-        }
-        data["respuestas"].append(respuesta)
-        
-        # Actualizar contador de respuestas
-        for form in data["formularios"]:
-            if form["id"] == respuesta["formulario_id"]:
-                form["respuestas_count"] = form.get("respuestas_count", 0) + 1
-                break
+        with storage.transaction():
+            # El id sale del contador del documento principal (único entre
+            # formularios); la respuesta solo se escribe en su shard
+            respuesta = {
+                "id": storage.next_id(DOCUMENT, "respuestas"),
+                "formulario_id": params.get("formulario_id"),
+                "respuestas": params.get("respuestas", {}),  # {campo: valor}
+                "fecha": datetime.now().isoformat(),
+                "ip": params.get("ip", ""),
+                "usuario": params.get("usuario", "Anónimo")
+            }
+            storage.insert(_shard(respuesta["formulario_id"]), "respuestas", respuesta)
+            _track(storage, "respuestas", None, respuesta)
+            
+            # Actualizar contador de respuestas
+            form = storage.get(DOCUMENT, "formularios", respuesta["formulario_id"])
+            if form is not None:
+                antes = dict(form)
+                form = storage.update(DOCUMENT, "formularios", form["id"], {
+                    "respuestas_count": form.get("respuestas_count", 0) + 1
+                })
+                _track_popular(storage, form)
+                events.changed(storage, __name__, "formularios", antes, form)
         
-        _save_data(context, data)
         return {"respuesta": respuesta, "message": "Respuesta guardada"}
     
     elif action == "get_respuestas":
-        # Obtener respuestas de un formulario específico
+        # Obtener respuestas de un formulario específico (solo se lee su shard)
         formulario_id = params.get("formulario_id")
-        respuestas = [r for r in data["respuestas"] if r.get("formulario_id") == formulario_id]
+        respuestas = storage.find(_shard(formulario_id), "respuestas", "formulario_id", formulario_id)
         return {"respuestas": respuestas}
     
     elif action == "toggle_formulario":
         # Activar/desactivar formulario
         formulario_id = params.get("id")
         
-        for form in data["formularios"]:
-            if form["id"] == formulario_id:
-                form["activo"] = not form.get("activo", True)
-                _save_data(context, data)
-                return {"formulario": form, "message": "Estado actualizado"}
-        
-        return {"error": "Formulario no encontrado"}
+        with storage.transaction():
+            form = storage.get(DOCUMENT, "formularios", formulario_id)
+            if form is None:
+                return {"error": "Formulario no encontrado"}
+            
+            antes = dict(form)
+            form = storage.update(DOCUMENT, "formularios", formulario_id, {
+                "activo": not form.get("activo", True)
+            })
+            _track(storage, "formularios", antes, form)
+        return {"formulario": form, "message": "Estado actualizado"}
+    
+    elif action == "get_by_cliente":
+        # Obtener los formularios vinculados a un cliente (índice por cliente_id)
+        cliente_id = params.get("cliente_id")
+        return {"formularios": storage.find(DOCUMENT, "formularios", "cliente_id", cliente_id)}
+    
+    elif action == "get_by_proyecto":
+        # Obtener los formularios vinculados a un proyecto (índice por proyecto_id)
+        proyecto_id = params.get("proyecto_id")
+        return {"formularios": storage.find(DOCUMENT, "formularios", "proyecto_id", proyecto_id)}
+    
+    elif action == "rebuild_aggregates":
+        # Recalcular los agregados del resumen y comprobar desviaciones
+        return aggregates.rebuild(storage, DOCUMENT, lambda: _compute_aggregates(storage))
     
     else:
         return {"error": f"Acción desconocida: {action}"}
 
 def get_summary(context):
     """Obtiene un resumen para el dashboard"""
-    data = _load_data(context)
+    storage = _get_storage(context)
+    agg = aggregates.ensure(storage, DOCUMENT, lambda: _compute_aggregates(storage))
     
-    total_formularios = len(data["formularios"])
-    formularios_activos = len([f for f in data["formularios"] if f.get("activo", False)])
-    total_respuestas = len(data["respuestas"])
+    total_formularios = agg.get("formularios", 0)
+    formularios_activos = agg.get("formularios.activos", 0)
+    total_respuestas = agg.get("respuestas", 0)
     
-    # Formulario más popular
+    # Formulario más popular (mantenido en cada respuesta)
     formulario_popular = None
-    max_respuestas = 0
+    max_respuestas = agg.get("popular.count", 0)
     
-    for form in data["formularios"]:
-        count = form.get("respuestas_count", 0)
-        if count > max_respuestas:
-            max_respuestas = count
-            formulario_popular = form.get("titulo", "")
+    if agg.get("popular.id"):
+        form = storage.get(DOCUMENT, "formularios", agg["popular.id"])
+        formulario_popular = form.get("titulo", "") if form else None
     
     return {
         "total_formularios": total_formularios,
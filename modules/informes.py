@@ -4,9 +4,17 @@ Originalmente un programa independiente para generar reportes
 """
 
 import os
-import json
-from datetime import datetime
-from collections import defaultdict
+from itertools import islice
+from datetime import datetime, timedelta
+
+from ._storage import get_storage, query_document, export_document
+from . import _aggregates as aggregates
+from . import _events as events
+from . import _serializer as serializer
+from . import _columnar as columnar
+from . import _archive as archive
+from . import _jobs as jobs
+from ._results import REPORT_CACHE
 
 MODULE_INFO = {
     "name": "Informes y Análisis",
@@ -15,168 +23,476 @@ MODULE_INFO = {
     "category": "gestión"
 }
 
-def _get_data_file(context):
-    """Ruta del archivo de datos"""
-    return os.path.join(context["DATA_DIR"], "informes.json")
+DOCUMENT = "informes"
+
+# Estados de oportunidad que cuentan como pipeline abierto
+ESTADOS_ABIERTOS = ["abierta", "en_proceso"]
+
+# Retención del historial: informes que se conservan en informes.json y días
+# de antigüedad máxima (0 = sin límite, el valor por defecto: hay que
+# activarla). Los que salen pasan al archivo comprimido
+# (data/archive/informes/AAAA-MM.ndjson.gz) y dejan de verse en get_informes
+RETENCION_MAX = int(os.environ.get("JOCARSA_INFORMES_MAX", "0"))
+RETENCION_DIAS = int(os.environ.get("JOCARSA_INFORMES_DIAS", "0"))
+
+# Trabajos terminados que se conservan (los más antiguos se borran)
+TRABAJOS_MAX = int(os.environ.get("JOCARSA_INFORMES_TRABAJOS_MAX", "500"))
+
+# Trabajos de generación en segundo plano: hilos por proceso y programación
+# ("tipo=expresión cron" separados por ";", por ejemplo "ventas=0 2 * * *";
+# vacía por defecto, sin informes programados)
+TRABAJOS_WORKERS = int(os.environ.get("JOCARSA_INFORMES_WORKERS", "2"))
+PROGRAMACION = os.environ.get("JOCARSA_INFORMES_CRON", "")
+
+# Estados de un trabajo que aún no ha terminado
+TRABAJOS_ABIERTOS = ["pendiente", "en_proceso"]
+
+# Documentos de los que depende cada tipo de informe (invalidan su caché)
+DEPENDENCIAS = {
+    "general": ("crm_clientes", "proyectos", "formularios"),
+    "ventas": ("crm_clientes",),
+    "proyectos": ("proyectos",),
+    "ventas_mensual": ("crm_clientes",),
+    "horas": ("proyectos",),
+    "integracion": ("crm_clientes", "proyectos", "formularios")
+}
 
 def _load_data(context):
-    """Carga los datos del archivo JSON"""
-    file_path = _get_data_file(context)
+    """Carga los datos del módulo (con la consulta de la petición, si la hay)"""
+    return query_document(get_storage(context), DOCUMENT, context.get("query"))
+
+def _deltas(collection, record, sign):
+    """Contribución de un registro a los agregados del resumen"""
+    if collection != "informes_generados":
+        return {collection: sign}
+    return {collection: sign, f"informes.tipo.{record.get('tipo', 'general')}": sign}
+
+def _compute_aggregates(storage):
+    """Agregados calculados desde cero, incluidos el último informe y los archivados"""
+    data = storage.load(DOCUMENT)
+    agg = aggregates.compute(_deltas, data)
+    informes = data.get("informes_generados", [])
+    agg["ultimo.id"] = informes[-1]["id"] if informes else 0
     
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    # Los archivados siguen contando por tipo en el resumen
+    agg["informes_archivados"] = 0
+    for informe in archive.read(storage.data_dir, DOCUMENT):
+        agg["informes_archivados"] += 1
+        clave = f"informes.tipo.{informe.get('tipo', 'general')}"
+        agg[clave] = agg.get(clave, 0) + 1
+    return agg
+
+aggregates.register(DOCUMENT, _compute_aggregates)
+
+def _track(storage, collection, before, after):
+    """Actualiza los agregados con el cambio de un registro y lo publica para la interfaz"""
+    deltas = aggregates.changed(_deltas, collection, before, after)
+    aggregates.track(storage, DOCUMENT, lambda: _compute_aggregates(storage), deltas)
+    events.changed(storage, __name__, collection, before, after, deltas,
+                   lambda: get_summary({"storage": storage}))
+
+def _aplicar_retencion(storage):
+    """Archiva los informes que exceden la retención y devuelve {segmento: informes}"""
+    with storage.transaction():
+        exceso = storage.count(DOCUMENT, "informes_generados") - RETENCION_MAX if RETENCION_MAX else 0
+        limite = (datetime.now() - timedelta(days=RETENCION_DIAS)).isoformat() if RETENCION_DIAS else None
+        
+        # El historial está ordenado por id, que es también el orden de generación
+        antiguos = []
+        for informe in storage.iter_records(DOCUMENT, "informes_generados"):
+            if len(antiguos) < exceso or (limite and informe.get("fecha_generacion", "") < limite):
+                antiguos.append(informe)
+            else:
+                break
+        if not antiguos:
+            return {}
+        
+        # Primero se escribe el archivo: si falla el borrado no se pierde nada
+        segmentos = archive.append(storage.data_dir, DOCUMENT, antiguos, "fecha_generacion")
+        ids = [informe["id"] for informe in antiguos]
+        storage.delete(DOCUMENT, "informes_generados", ids)
+        deltas = {"informes_generados": -len(antiguos), "informes_archivados": len(antiguos)}
+        aggregates.track(storage, DOCUMENT, lambda: _compute_aggregates(storage), deltas)
+        events.removed(storage, __name__, "informes_generados", ids, deltas,
+                       lambda: get_summary({"storage": storage}))
+    return segmentos
+
+def _limpiar_trabajos(storage):
+    """Borra los trabajos terminados más antiguos que exceden TRABAJOS_MAX"""
+    if not TRABAJOS_MAX:
+        return
+    with storage.transaction():
+        exceso = storage.count(DOCUMENT, "trabajos") - TRABAJOS_MAX
+        if exceso <= 0:
+            return
+        terminados = [t["id"] for t in islice(storage.iter_records(DOCUMENT, "trabajos"), exceso)
+                      if t.get("estado") not in TRABAJOS_ABIERTOS]
+        borrados = storage.delete(DOCUMENT, "trabajos", terminados)
+        aggregates.track(storage, DOCUMENT, lambda: _compute_aggregates(storage), {"trabajos": -len(borrados)})
+        events.removed(storage, __name__, "trabajos", [t["id"] for t in borrados])
+
+def _generar_informe(storage, tipo, params, usuario):
+    """Calcula y guarda un informe; devuelve el informe y los datos de caché y archivado"""
+    # Mientras no cambien los documentos de los que depende, el informe
+    # se sirve desde la caché de resultados (la firma de los archivos
+    # detecta también los cambios hechos fuera de la suite)
+    dependencias = DEPENDENCIAS.get(tipo, ())
+    clave = (id(storage), tipo, serializer.dumps(params, sort_keys=True, default=str))
+    versiones = tuple((storage.version(d), storage.signature(d)) for d in dependencias)
+    informe_contenido, cache = REPORT_CACHE.get_or_compute(
+        clave, versiones, lambda: _calcular_contenido(storage, tipo)
+    )
     
-    return {
-        "informes_generados": []
-    }
+    # Guardar el informe generado
+    with storage.transaction():
+        informe = {
+            "id": storage.next_id(DOCUMENT, "informes_generados"),
+            "tipo": tipo,
+            "fecha_generacion": datetime.now().isoformat(),
+            "contenido": informe_contenido,
+            "generado_por": usuario
+        }
+        storage.insert(DOCUMENT, "informes_generados", informe)
+        _track(storage, "informes_generados", None, informe)
+        storage.set_aggregates(DOCUMENT, {"ultimo.id": informe["id"]})
+    
+    # El historial no crece sin límite: lo que sobra pasa al archivo
+    archivados = _aplicar_retencion(storage)
+    
+    return {"informe": informe, "cache": cache, "archivados": sum(archivados.values())}
+
+def _cola(storage):
+    """Cola de trabajos de este proceso (se crea con el primer trabajo)"""
+    cola, _ = jobs.for_process(DOCUMENT, lambda: jobs.JobQueue(TRABAJOS_WORKERS, DOCUMENT))
+    return cola
+
+# Proceso en el que ya se ha llamado a start()
+_arrancado = None
 
-def _save_data(context, data):
-    """Guarda los datos en el archivo JSON"""
-    file_path = _get_data_file(context)
+def start(context):
+    """
+    Arranca en este proceso los informes programados (PROGRAMACION) y retoma
+    los trabajos que dejaron a medias procesos que ya no existen. Lo llama el
+    servidor al arrancar cada proceso (ver ModuleRegistry.start).
+    """
+    global _arrancado
+    if _arrancado == os.getpid():
+        return
+    _arrancado = os.getpid()
     
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+    storage = get_storage(context)
+    cola = _cola(storage)
+    for entrada in filter(None, (e.strip() for e in PROGRAMACION.split(";"))):
+        tipo, expresion = (parte.strip() for parte in entrada.split("=", 1))
+        cola.schedule(f"informe:{tipo}", expresion,
+                      lambda minuto, tipo=tipo: _programado(storage, tipo, minuto))
+    _recuperar_trabajos(storage, cola)
+
+def _encolar(storage, tipo, params, usuario, programado=None):
+    """Registra un trabajo de generación y lo envía a la cola; None si ya existía"""
+    with storage.transaction():
+        if programado is not None and next(storage.iter_records(DOCUMENT, "trabajos", {"programado": programado}), None):
+            # Otro proceso ya ha lanzado esta ejecución programada
+            return None
+        trabajo = {
+            "id": storage.next_id(DOCUMENT, "trabajos"),
+            "tipo": tipo,
+            "params": params,
+            "estado": "pendiente",
+            "fecha_creacion": datetime.now().isoformat(),
+            "generado_por": usuario,
+            "programado": programado,
+            "pid": os.getpid()
+        }
+        storage.insert(DOCUMENT, "trabajos", trabajo)
+        _track(storage, "trabajos", None, trabajo)
+    
+    # El trabajo empieza a ejecutarse después del commit (tomar el trabajo
+    # abre otra transacción, que espera a la de quien lo encola)
+    _cola(storage).submit(_ejecutar_trabajo, storage, trabajo["id"])
+    _limpiar_trabajos(storage)
+    return trabajo
+
+def _programado(storage, tipo, minuto):
+    """Ejecución programada: una sola por minuto aunque haya varios procesos"""
+    _encolar(storage, tipo, {}, "Programador", programado=f"{tipo}@{minuto.isoformat(timespec='minutes')}")
 
-def _load_other_module_data(context, module_name):
-    """Carga datos de otros módulos para análisis cruzado"""
-    file_path = os.path.join(context["DATA_DIR"], f"{module_name}.json")
+def _ejecutar_trabajo(storage, trabajo_id):
+    """Ejecuta un trabajo pendiente y guarda su resultado o su error"""
+    with storage.transaction():
+        trabajo = storage.get(DOCUMENT, "trabajos", trabajo_id)
+        if trabajo is None or trabajo.get("estado") != "pendiente":
+            return
+        en_proceso = storage.update(DOCUMENT, "trabajos", trabajo_id, {
+            "estado": "en_proceso",
+            "fecha_inicio": datetime.now().isoformat(),
+            "pid": os.getpid()
+        })
+        events.changed(storage, __name__, "trabajos", trabajo, en_proceso)
     
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
+    try:
+        resultado = _generar_informe(storage, trabajo["tipo"], trabajo.get("params") or {},
+                                     trabajo.get("generado_por", "Sistema"))
+    except Exception as e:
+        fallido = storage.update(DOCUMENT, "trabajos", trabajo_id, {
+            "estado": "error",
+            "error": str(e),
+            "fecha_fin": datetime.now().isoformat()
+        })
+        events.changed(storage, __name__, "trabajos", en_proceso, fallido)
+        return
     
-    return {}
+    completado = storage.update(DOCUMENT, "trabajos", trabajo_id, {
+        "estado": "completado",
+        "fecha_fin": datetime.now().isoformat(),
+        "informe_id": resultado["informe"]["id"],
+        "cache": resultado["cache"],
+        "archivados": resultado["archivados"]
+    })
+    events.changed(storage, __name__, "trabajos", en_proceso, completado)
 
-def get_data(context):
-    """Obtiene todos los datos del módulo de informes"""
-    return _load_data(context)
+def _recuperar_trabajos(storage, cola):
+    """Vuelve a encolar los trabajos sin terminar de procesos que ya no existen"""
+    for estado in TRABAJOS_ABIERTOS:
+        for trabajo in list(storage.iter_records(DOCUMENT, "trabajos", {"estado": estado})):
+            if trabajo.get("pid") != os.getpid() and jobs.pid_alive(trabajo.get("pid")):
+                continue
+            with storage.transaction():
+                actual = storage.get(DOCUMENT, "trabajos", trabajo["id"])
+                if actual is None or actual.get("estado") != estado or actual.get("pid") != trabajo.get("pid"):
+                    continue
+                storage.update(DOCUMENT, "trabajos", trabajo["id"], {"estado": "pendiente", "pid": os.getpid()})
+            cola.submit(_ejecutar_trabajo, storage, trabajo["id"])
 
-def execute(context):
-    """Ejecuta acciones en el módulo de informes"""
-    action = context.get("action", "")
-    params = context.get("params", {})
+def _por_clave(totales, vacio):
+    """Agrupación con claves de texto (las vacías se agrupan como vacio)"""
+    return {(vacio if clave in (None, "") else str(clave)): valor for clave, valor in totales.items()}
+
+def _calcular_contenido(storage, tipo):
+    """Contenido de un informe de tipo tipo"""
+    # Los informes se calculan con los agregados que cada módulo mantiene
+    # al día en su execute(): el coste no depende del volumen de datos
+    informe_contenido = {}
     
-    data = _load_data(context)
+    if tipo == "general":
+        crm = aggregates.current(storage, "crm_clientes")
+        proyectos = aggregates.current(storage, "proyectos")
+        formularios = aggregates.current(storage, "formularios")
+        
+        informe_contenido = {
+            "tipo": "Informe General",
+            "clientes_totales": crm.get("clientes", 0),
+            "proyectos_totales": proyectos.get("proyectos", 0),
+            "formularios_activos": formularios.get("formularios.activos", 0),
+            "oportunidades_abiertas": sum(crm.get(f"oportunidades.estado.{e}", 0) for e in ESTADOS_ABIERTOS),
+        }
     
-    if action == "generar_informe":
-        # Generar un nuevo informe
-        tipo = params.get("tipo", "general")
+    elif tipo == "ventas":
+        crm = aggregates.current(storage, "crm_clientes")
+        total_oportunidades = crm.get("oportunidades", 0)
+        total_pipeline = sum(crm.get(f"oportunidades.valor.{e}", 0) for e in ESTADOS_ABIERTOS)
+        ganadas = crm.get("oportunidades.estado.ganada", 0)
+        total_ganado = crm.get("oportunidades.valor.ganada", 0)
         
-        # Cargar datos de todos los módulos
-        crm_data = _load_other_module_data(context, "crm_clientes")
-        proyectos_data = _load_other_module_data(context, "proyectos")
-        formularios_data = _load_other_module_data(context, "formularios")
+        informe_contenido = {
+            "tipo": "Informe de Ventas",
+            "total_oportunidades": total_oportunidades,
+            "valor_pipeline": total_pipeline,
+            "oportunidades_ganadas": ganadas,
+            "valor_ganado": total_ganado,
+            "tasa_conversion": (ganadas / total_oportunidades * 100) if total_oportunidades else 0
+        }
+    
+    elif tipo == "proyectos":
+        agg = aggregates.current(storage, "proyectos")
         
-        # Generar informe según el tipo
-        informe_contenido = {}
+        # Análisis por estado (sin campo estado cuentan como "sin_estado" y
+        # con estado None bajo la clave None, como al recorrer los proyectos)
+        prefijo = "proyectos.estado."
+        estados_proyectos = {
+            (None if key[len(prefijo):] == "None" else key[len(prefijo):]): n
+            for key, n in agg.items() if key.startswith(prefijo) and n
+        }
         
-        if tipo == "general":
-            informe_contenido = {
-                "tipo": "Informe General",
-                "clientes_totales": len(crm_data.get("clientes", [])),
-                "proyectos_totales": len(proyectos_data.get("proyectos", [])),
-                "formularios_activos": len([f for f in formularios_data.get("formularios", []) if f.get("activo")]),
-                "oportunidades_abiertas": len([o for o in crm_data.get("oportunidades", []) if o.get("estado") in ["abierta", "en_proceso"]]),
-            }
+        # Análisis de tareas
+        total_horas_estimadas = agg.get("tareas.horas_estimadas", 0)
+        total_horas_reales = agg.get("tareas.horas_reales", 0)
         
-        elif tipo == "ventas":
-            oportunidades = crm_data.get("oportunidades", [])
-            total_pipeline = sum(o.get("valor", 0) for o in oportunidades if o.get("estado") in ["abierta", "en_proceso"])
-            ganadas = [o for o in oportunidades if o.get("estado") == "ganada"]
-            total_ganado = sum(o.get("valor", 0) for o in ganadas)
-            
-            informe_contenido = {
-                "tipo": "Informe de Ventas",
-                "total_oportunidades": len(oportunidades),
-                "valor_pipeline": total_pipeline,
-                "oportunidades_ganadas": len(ganadas),
-                "valor_ganado": total_ganado,
-                "tasa_conversion": (len(ganadas) / len(oportunidades) * 100) if oportunidades else 0
-            }
+        informe_contenido = {
+            "tipo": "Informe de Proyectos",
+            "total_proyectos": agg.get("proyectos", 0),
+            "estados": estados_proyectos,
+            "total_tareas": agg.get("tareas", 0),
+            "horas_estimadas": total_horas_estimadas,
+            "horas_reales": total_horas_reales,
+            "desviacion_tiempo": total_horas_reales - total_horas_estimadas
+        }
+    
+    elif tipo == "ventas_mensual":
+        # Analítica en columnas sobre las oportunidades
+        t = columnar.table(storage, "crm_clientes", "oportunidades",
+                           numeric=("valor",), categorical=("estado",),
+                           months=("fecha_creacion", "fecha_cierre"))
+        ganadas = t.mask("estado", ["ganada"])
         
-        elif tipo == "proyectos":
-            proyectos = proyectos_data.get("proyectos", [])
-            tareas = proyectos_data.get("tareas", [])
-            
-            # Análisis por estado
-            estados_proyectos = defaultdict(int)
-            for p in proyectos:
-                estados_proyectos[p.get("estado", "sin_estado")] += 1
-            
-            # Análisis de tareas
-            total_horas_estimadas = sum(t.get("tiempo_estimado", 0) for t in tareas)
-            total_horas_reales = sum(t.get("tiempo_real", 0) for t in tareas)
-            
-            informe_contenido = {
-                "tipo": "Informe de Proyectos",
-                "total_proyectos": len(proyectos),
-                "estados": dict(estados_proyectos),
-                "total_tareas": len(tareas),
-                "horas_estimadas": total_horas_estimadas,
-                "horas_reales": total_horas_reales,
-                "desviacion_tiempo": total_horas_reales - total_horas_estimadas
-            }
+        informe_contenido = {
+            "tipo": "Informe de Ventas Mensual",
+            "valor_ganado_por_mes": _por_clave(t.group_sum("fecha_cierre.mes", "valor", ganadas), "sin_fecha"),
+            "ganadas_por_mes": _por_clave(t.group_sum("fecha_cierre.mes", mask=ganadas), "sin_fecha"),
+            "creadas_por_mes": _por_clave(t.group_sum("fecha_creacion.mes"), "sin_fecha"),
+            "valor_por_estado": _por_clave(t.group_sum("estado", "valor"), "sin_estado")
+        }
+    
+    elif tipo == "horas":
+        # Analítica en columnas sobre las tareas
+        t = columnar.table(storage, "proyectos", "tareas",
+                           numeric=("tiempo_estimado", "tiempo_real"),
+                           categorical=("proyecto_id", "asignado_a", "estado"),
+                           months=("fecha_completada",))
         
-        elif tipo == "integracion":
-            # Informe de integración entre módulos
-            clientes = crm_data.get("clientes", [])
-            proyectos = proyectos_data.get("proyectos", [])
-            formularios = formularios_data.get("formularios", [])
-            
-            # Clientes con proyectos
-            clientes_con_proyectos = len(set(p.get("cliente_id") for p in proyectos if p.get("cliente_id")))
-            
-            # Formularios vinculados
-            formularios_vinculados_crm = len([f for f in formularios if f.get("cliente_id")])
-            formularios_vinculados_proyectos = len([f for f in formularios if f.get("proyecto_id")])
-            
-            informe_contenido = {
-                "tipo": "Informe de Integración",
-                "clientes_totales": len(clientes),
-                "clientes_con_proyectos": clientes_con_proyectos,
-                "proyectos_totales": len(proyectos),
-                "formularios_vinculados_crm": formularios_vinculados_crm,
-                "formularios_vinculados_proyectos": formularios_vinculados_proyectos,
-                "tasa_integracion_clientes": (clientes_con_proyectos / len(clientes) * 100) if clientes else 0
-            }
+        desviacion = {}
+        for campo in ("proyecto_id", "asignado_a"):
+            estimadas = t.group_sum(campo, "tiempo_estimado")
+            reales = t.group_sum(campo, "tiempo_real")
+            desviacion[campo] = {clave: reales[clave] - estimadas[clave] for clave in estimadas}
         
-        # Guardar el informe generado
-        informe = {
-            "id": len(data["informes_generados"]) + 1,
-            "tipo": tipo,
-            "fecha_generacion": datetime.now().isoformat(),
-            "contenido": informe_contenido,
-            "generado_por": context.get("session", {}).get("usuario", "Sistema")
+        informe_contenido = {
+            "tipo": "Informe de Horas",
+            "desviacion_por_proyecto": _por_clave(desviacion["proyecto_id"], "sin_proyecto"),
+            "desviacion_por_asignado": _por_clave(desviacion["asignado_a"], "sin_asignar"),
+            "completadas_por_mes": _por_clave(
+                t.group_sum("fecha_completada.mes", mask=t.mask("estado", ["completada"])), "sin_fecha"
+            )
         }
+    
+    elif tipo == "integracion":
+        # Informe de integración entre módulos (con los índices de claves foráneas)
+        clientes_totales = storage.count("crm_clientes", "clientes")
+        proyectos_por_cliente = storage.count_by("proyectos", "proyectos", "cliente_id")
+        formularios_por_cliente = storage.count_by("formularios", "formularios", "cliente_id")
+        formularios_por_proyecto = storage.count_by("formularios", "formularios", "proyecto_id")
         
-        data["informes_generados"].append(informe)
-        _save_data(context, data)
+        # Clientes con proyectos
+        clientes_con_proyectos = len([c for c in proyectos_por_cliente if c])
         
-        return {"informe": informe, "message": "Informe generado exitosamente"}
+        # Formularios vinculados
+        formularios_vinculados_crm = sum(n for c, n in formularios_por_cliente.items() if c)
+        formularios_vinculados_proyectos = sum(n for p, n in formularios_por_proyecto.items() if p)
+        
+        informe_contenido = {
+            "tipo": "Informe de Integración",
+            "clientes_totales": clientes_totales,
+            "clientes_con_proyectos": clientes_con_proyectos,
+            "proyectos_totales": storage.count("proyectos", "proyectos"),
+            "formularios_vinculados_crm": formularios_vinculados_crm,
+            "formularios_vinculados_proyectos": formularios_vinculados_proyectos,
+            "tasa_integracion_clientes": (clientes_con_proyectos / clientes_totales * 100) if clientes_totales else 0
+        }
+    
+    return informe_contenido
+
+def get_data(context):
+    """Obtiene todos los datos del módulo de informes"""
+    return _load_data(context)
+
+def export(context):
+    """Recorre registro a registro una colección del módulo Informes (exportación NDJSON)"""
+    return export_document(get_storage(context), DOCUMENT, context.get("query"))
+
+def execute(context):
+    """Ejecuta acciones en el módulo de informes"""
+    action = context.get("action", "")
+    params = context.get("params", {})
+    
+    storage = get_storage(context)
+    
+    if action == "generar_informe":
+        # Encolar la generación: la petición vuelve enseguida con el trabajo,
+        # que se consulta con get_trabajo
+        tipo = params.get("tipo", "general")
+        usuario = context.get("session", {}).get("usuario", "Sistema")
+        trabajo = _encolar(storage, tipo, params, usuario)
+        return {"trabajo": trabajo, "message": f"Informe en preparación (trabajo {trabajo['id']})"}
+    
+    elif action == "get_trabajo":
+        # Estado de un trabajo y, si ha terminado, el informe generado
+        trabajo = storage.get(DOCUMENT, "trabajos", params.get("id"))
+        if trabajo is None:
+            return {"error": "Trabajo no encontrado"}
+        informe = None
+        if trabajo.get("informe_id"):
+            informe = storage.get(DOCUMENT, "informes_generados", trabajo["informe_id"])
+        return {"trabajo": trabajo, "informe": informe}
+    
+    elif action == "get_trabajos":
+        # Trabajos sin terminar y estado de la cola de este proceso
+        return {
+            "trabajos": [t for estado in TRABAJOS_ABIERTOS
+                         for t in storage.iter_records(DOCUMENT, "trabajos", {"estado": estado})],
+            "cola": jobs.stats().get(DOCUMENT)
+        }
     
     elif action == "get_informes":
         # Obtener historial de informes
-        return {"informes": data["informes_generados"]}
+        return {"informes": _load_data(context)["informes_generados"]}
+    
+    elif action == "archivar":
+        # Aplicar ahora la política de retención
+        archivados = _aplicar_retencion(storage)
+        return {
+            "segmentos": archivados,
+            "message": f"{sum(archivados.values())} informes archivados"
+        }
+    
+    elif action == "get_archivo":
+        # Consultar informes archivados (meses desde..hasta "AAAA-MM", tipo opcional)
+        filtros = {"tipo": params["tipo"]} if params.get("tipo") else None
+        informes = archive.read(storage.data_dir, DOCUMENT, params.get("desde"), params.get("hasta"), filtros)
+        if params.get("limit"):
+            informes = islice(informes, int(params["limit"]))
+        return {
+            "informes": list(informes),
+            "segmentos": archive.segments(storage.data_dir, DOCUMENT)
+        }
+    
+    elif action == "get_by_cliente":
+        # Vista consolidada de un cliente en todos los módulos (índices por cliente_id)
+        cliente_id = params.get("cliente_id")
+        proyectos = storage.find("proyectos", "proyectos", "cliente_id", cliente_id)
+        return {
+            "cliente": storage.get("crm_clientes", "clientes", cliente_id),
+            "contactos": storage.find("crm_clientes", "contactos", "cliente_id", cliente_id),
+            "oportunidades": storage.find("crm_clientes", "oportunidades", "cliente_id", cliente_id),
+            "proyectos": proyectos,
+            "tareas": [t for p in proyectos for t in storage.find("proyectos", "tareas", "proyecto_id", p["id"])],
+            "formularios": storage.find("formularios", "formularios", "cliente_id", cliente_id)
+        }
+    
+    elif action == "rebuild_aggregates":
+        # Recalcular los agregados del resumen y comprobar desviaciones
+        return aggregates.rebuild(storage, DOCUMENT, lambda: _compute_aggregates(storage))
     
     else:
         return {"error": f"Acción desconocida: {action}"}
 
 def get_summary(context):
     """Obtiene un resumen para el dashboard"""
-    data = _load_data(context)
+    storage = get_storage(context)
+    agg = aggregates.ensure(storage, DOCUMENT, lambda: _compute_aggregates(storage))
     
-    total_informes = len(data["informes_generados"])
+    archivados = agg.get("informes_archivados", 0)
+    total_informes = agg.get("informes_generados", 0) + archivados
     
-    # Tipo de informe más generado
-    tipos_count = defaultdict(int)
-    for informe in data["informes_generados"]:
-        tipos_count[informe.get("tipo", "general")] += 1
+    # Tipo de informe más generado (hay un contador por tipo)
+    tipos_count = {key[len("informes.tipo."):]: n for key, n in agg.items() if key.startswith("informes.tipo.") and n > 0}
     
     tipo_popular = max(tipos_count.items(), key=lambda x: x[1])[0] if tipos_count else "Ninguno"
     
+    ultimo = storage.get(DOCUMENT, "informes_generados", agg.get("ultimo.id")) if agg.get("ultimo.id") else None
+    
     return {
         "total_informes": total_informes,
+        "informes_archivados": archivados,
         "tipo_popular": tipo_popular,
-        "ultimo_informe": data["informes_generados"][-1].get("tipo") if data["informes_generados"] else "Ninguno"
+        "ultimo_informe": ultimo.get("tipo") if ultimo else "Ninguno"
     }
@@ -3,10 +3,13 @@ Módulo de Gestión de Proyectos
 Originalmente un programa independiente para gestionar tareas y proyectos
 """
 
-import os
-import json
 from datetime import datetime
 
+from ._storage import get_storage, query_document, export_document
+from . import _aggregates as aggregates
+from . import _events as events
+from . import _records as records
+
 MODULE_INFO = {
     "name": "Gestión de Proyectos",
     "description": "Organiza proyectos, tareas y asignaciones de equipo",
@@ -14,75 +17,91 @@ MODULE_INFO = {
     "category": "proyectos"
 }
 
-def _get_data_file(context):
-    """Ruta del archivo de datos"""
-    return os.path.join(context["DATA_DIR"], "proyectos.json")
+DOCUMENT = "proyectos"
 
 def _load_data(context):
-    """Carga los datos del archivo JSON"""
-    file_path = _get_data_file(context)
-    
-    if os.path.exists(file_path):
-        with open(file_path, "r", encoding="utf-8") as f:
-            return json.load(f)
-    
-    return {
-        "proyectos": [],
-        "tareas": []
-    }
+    """Carga los datos del módulo (con la consulta de la petición, si la hay)"""
+    return query_document(get_storage(context), DOCUMENT, context.get("query"))
 
-def _save_data(context, data):
-    """Guarda los datos en el archivo JSON"""
-    file_path = _get_data_file(context)
-    
-    with open(file_path, "w", encoding="utf-8") as f:
-        json.dump(data, f, indent=2, ensure_ascii=False)
+def _deltas(collection, record, sign):
+    """Contribución de un registro a los agregados del resumen"""
+    # Sin campo estado cuenta como "sin_estado"; con estado None, como "None"
+    deltas = {collection: sign, f"{collection}.estado.{record.get('estado', 'sin_estado')}": sign}
+    if collection == "tareas":
+        deltas["tareas.horas_estimadas"] = sign * (record.get("tiempo_estimado") or 0)
+        deltas["tareas.horas_reales"] = sign * (record.get("tiempo_real") or 0)
+    return deltas
+
+def _compute_aggregates(storage):
+    """Agregados calculados desde cero"""
+    return aggregates.compute(_deltas, storage.load(DOCUMENT))
+
+aggregates.register(DOCUMENT, _compute_aggregates)
+
+# Las tareas son la colección grande: registros compactos en memoria
+records.register(DOCUMENT, "tareas", (
+    "id", "proyecto_id", "titulo", "descripcion", "estado", "prioridad", "asignado_a",
+    "fecha_creacion", "fecha_vencimiento", "tiempo_estimado", "tiempo_real", "fecha_completada"
+), enums=("estado", "prioridad", "asignado_a"))
+
+def _track(storage, collection, before, after):
+    """Actualiza los agregados con el cambio de un registro y lo publica para la interfaz"""
+    deltas = aggregates.changed(_deltas, collection, before, after)
+    aggregates.track(storage, DOCUMENT, lambda: _compute_aggregates(storage), deltas)
+    events.changed(storage, __name__, collection, before, after, deltas,
+                   lambda: get_summary({"storage": storage}))
 
 def get_data(context):
     """Obtiene todos los datos del módulo de proyectos"""
     return _load_data(context)
 
+def export(context):
+    """Recorre registro a registro una colección del módulo Proyectos (exportación NDJSON)"""
+    return export_document(get_storage(context), DOCUMENT, context.get("query"))
+
 def execute(context):
     """Ejecuta acciones en el módulo de proyectos"""
     action = context.get("action", "")
     params = context.get("params", {})
     
-    data = _load_data(context)
+    storage = get_storage(context)
     
     if action == "add_proyecto":
         # Añadir un nuevo proyecto
-        proyecto = {
-            "id": len(data["proyectos"]) + 1,
-            "nombre": params.get("nombre", ""),
-            "descripcion": params.get("descripcion", ""),
-            "cliente_id": params.get("cliente_id"),  # Vinculación con CRM
-            "estado": "planificacion",  # planificacion, en_proceso, completado
-            "fecha_inicio": params.get("fecha_inicio", datetime.now().isoformat()),
-            "fecha_fin": params.get("fecha_fin"),
-            "presupuesto": params.get("presupuesto", 0),
-            "responsable": params.get("responsable", "")
-        }
-        data["proyectos"].append(proyecto)
-        _save_data(context, data)
+        with storage.transaction():
+            proyecto = {
+                "id": storage.next_id(DOCUMENT, "proyectos"),
+                "nombre": params.get("nombre", ""),
+                "descripcion": params.get("descripcion", ""),
+                "cliente_id": params.get("cliente_id"),  # Vinculación con CRM
+                "estado": "planificacion",  # planificacion, en_proceso, completado
+                "fecha_inicio": params.get("fecha_inicio", datetime.now().isoformat()),
+                "fecha_fin": params.get("fecha_fin"),
+                "presupuesto": params.get("presupuesto", 0),
+                "responsable": params.get("responsable", "")
+            }
+            storage.insert(DOCUMENT, "proyectos", proyecto)
+            _track(storage, "proyectos", None, proyecto)
         return {"proyecto": proyecto, "message": "Proyecto creado"}
     
     elif action == "add_tarea":
         # Añadir una nueva tarea a un proyecto
-        tarea = {
-            "id": len(data["tareas"]) + 1,
-            "proyecto_id": params.get("proyecto_id"),
-            "titulo": params.get("titulo", ""),
-            "descripcion": params.get("descripcion", ""),
-            "estado": "pendiente",  # pendiente, en_proceso, completada
-            "prioridad": params.get("prioridad", "media"),  # baja, media, alta
-            "asignado_a": params.get("asignado_a", ""),
-            "fecha_creacion": datetime.now().isoformat(),
-            "fecha_vencimiento": params.get("fecha_vencimiento"),
-            "tiempo_estimado": params.get("tiempo_estimado", 0),  # en horas
-            "tiempo_real": 0
-        }
-        data["tareas"].append(tarea)
-        _save_data(context, data)
+        with storage.transaction():
+            tarea = {
+                "id": storage.next_id(DOCUMENT, "tareas"),
+                "proyecto_id": params.get("proyecto_id"),
+                "titulo": params.get("titulo", ""),
+                "descripcion": params.get("descripcion", ""),
+                "estado": "pendiente",  # pendiente, en_proceso, completada
+                "prioridad": params.get("prioridad", "media"),  # baja, media, alta
+                "asignado_a": params.get("asignado_a", ""),
+                "fecha_creacion": datetime.now().isoformat(),
+                "fecha_vencimiento": params.get("fecha_vencimiento"),
+                "tiempo_estimado": params.get("tiempo_estimado", 0),  # en horas
+                "tiempo_real": 0
+            }
+            storage.insert(DOCUMENT, "tareas", tarea)
+            _track(storage, "tareas", None, tarea)
         return {"tarea": tarea, "message": "Tarea creada"}
     
     elif action == "update_tarea_estado":
@@ -90,43 +109,70 @@ def execute(context):
         tarea_id = params.get("id")
         nuevo_estado = params.get("estado")
         
-        for tarea in data["tareas"]:
-            if tarea["id"] == tarea_id:
-                tarea["estado"] = nuevo_estado
-                if nuevo_estado == "completada":
-                    tarea["fecha_completada"] = datetime.now().isoformat()
-                _save_data(context, data)
-                return {"tarea": tarea, "message": "Estado actualizado"}
+        cambios = {"estado": nuevo_estado}
+        if nuevo_estado == "completada":
+            cambios["fecha_completada"] = datetime.now().isoformat()
         
-        return {"error": "Tarea no encontrada"}
+        with storage.transaction():
+            tarea = storage.get(DOCUMENT, "tareas", tarea_id)
+            if tarea is None:
+                return {"error": "Tarea no encontrada"}
+            
+            antes = dict(tarea)
+            tarea = storage.update(DOCUMENT, "tareas", tarea_id, cambios)
+            _track(storage, "tareas", antes, tarea)
+        
+        return {"tarea": tarea, "message": "Estado actualizado"}
     
     elif action == "registrar_tiempo":
         # Registrar tiempo trabajado en una tarea
         tarea_id = params.get("id")
         horas = params.get("horas", 0)
         
-        for tarea in data["tareas"]:
-            if tarea["id"] == tarea_id:
-                tarea["tiempo_real"] = tarea.get("tiempo_real", 0) + horas
-                _save_data(context, data)
-                return {"tarea": tarea, "message": f"Registradas {horas} horas"}
-        
-        return {"error": "Tarea no encontrada"}
+        with storage.transaction():
+            tarea = storage.get(DOCUMENT, "tareas", tarea_id)
+            if tarea is None:
+                return {"error": "Tarea no encontrada"}
+            
+            antes = dict(tarea)
+            tarea = storage.update(DOCUMENT, "tareas", tarea_id, {
+                "tiempo_real": tarea.get("tiempo_real", 0) + horas
+            })
+            _track(storage, "tareas", antes, tarea)
+        return {"tarea": tarea, "message": f"Registradas {horas} horas"}
+    
+    elif action == "get_by_cliente":
+        # Obtener los proyectos de un cliente del CRM (índice por cliente_id)
+        cliente_id = params.get("cliente_id")
+        return {"proyectos": storage.find(DOCUMENT, "proyectos", "cliente_id", cliente_id)}
+    
+    elif action == "get_by_proyecto":
+        # Obtener las tareas de un proyecto (índice por proyecto_id)
+        proyecto_id = params.get("proyecto_id")
+        return {
+            "proyecto": storage.get(DOCUMENT, "proyectos", proyecto_id),
+            "tareas": storage.find(DOCUMENT, "tareas", "proyecto_id", proyecto_id)
+        }
+    
+    elif action == "rebuild_aggregates":
+        # Recalcular los agregados del resumen y comprobar desviaciones
+        return aggregates.rebuild(storage, DOCUMENT, lambda: _compute_aggregates(storage))
     
     else:
         return {"error": f"Acción desconocida: {action}"}
 
 def get_summary(context):
     """Obtiene un resumen para el dashboard"""
-    data = _load_data(context)
+    storage = get_storage(context)
+    agg = aggregates.ensure(storage, DOCUMENT, lambda: _compute_aggregates(storage))
     
-    total_proyectos = len(data["proyectos"])
-    proyectos_activos = len([p for p in data["proyectos"] if p.get("estado") in ["planificacion", "en_proceso"]])
+    total_proyectos = agg.get("proyectos", 0)
+    proyectos_activos = sum(agg.get(f"proyectos.estado.{estado}", 0) for estado in ["planificacion", "en_proceso"])
     
-    total_tareas = len(data["tareas"])
-    tareas_pendientes = len([t for t in data["tareas"] if t.get("estado") == "pendiente"])
-    tareas_en_proceso = len([t for t in data["tareas"] if t.get("estado") == "en_proceso"])
-    tareas_completadas = len([t for t in data["tareas"] if t.get("estado") == "completada"])
+    total_tareas = agg.get("tareas", 0)
+    tareas_pendientes = agg.get("tareas.estado.pendiente", 0)
+    tareas_en_proceso = agg.get("tareas.estado.en_proceso", 0)
+    tareas_completadas = agg.get("tareas.estado.completada", 0)
     
     # Calcular progreso general
     progreso = 0
@@ -0,0 +1,203 @@
+"""
+Servidor de producción de Jocarsa Suite
+Arranca la suite sin modo debug en varios procesos worker que comparten el
+mismo puerto, cada uno con un pool de hilos de tamaño fijo.
+
+La aplicación (y con ella el registro de módulos) se importa una sola vez en
+el proceso principal antes de crear los workers. El código de los módulos se
+importa en cada worker la primera vez que se usa, salvo con --preload, que
+lo importa en el proceso principal para que los workers lo compartan.
+
+Los workers se coordinan a través del almacenamiento: bloqueo entre procesos
+para las escrituras y versiones compartidas de cada documento para saber
+cuándo recargarlo.
+
+Cada flujo de /api/events ocupa un hilo del worker mientras está abierto:
+--event-streams limita cuántos puede haber a la vez (por defecto la mitad de
+los hilos, para que siempre queden hilos para la API; 0 los desactiva). Para
+muchos navegadores conectados a la vez conviene servir la API con asgi.py.
+
+Uso:
+    python serve.py [--host 127.0.0.1] [--port 5000] [--workers 4] [--threads 8]
+                    [--event-streams 4] [--preload]
+
+SIGTERM o Ctrl+C paran los workers de forma ordenada: dejan de aceptar
+conexiones, terminan las peticiones en curso y cierran el almacenamiento.
+"""
+
+import os
+import sys
+import signal
+import socket
+import time
+import argparse
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from werkzeug.serving import BaseWSGIServer, WSGIRequestHandler
+
+# Carga de módulos y almacenamiento antes de crear los workers
+import app as suite
+
+# Segundos mínimos entre reinicios de un worker que muere nada más arrancar
+RESPAWN_DELAY = 1.0
+
+
+class _RequestHandler(WSGIRequestHandler):
+    # Sin keep-alive: cada conexión ocuparía un hilo del pool mientras siga abierta
+    protocol_version = "HTTP/1.0"
+
+
+class PooledWSGIServer(BaseWSGIServer):
+    """Servidor WSGI que atiende las peticiones en un pool de hilos de tamaño fijo"""
+
+    multithread = True
+
+    def __init__(self, host, port, wsgi_app, threads, fd=None):
+        super().__init__(host, port, wsgi_app, handler=_RequestHandler, fd=fd)
+        self._pool = ThreadPoolExecutor(max_workers=threads, thread_name_prefix="http")
+
+    def process_request(self, request, client_address):
+        self._pool.submit(self._process, request, client_address)
+
+    def _process(self, request, client_address):
+        try:
+            self.finish_request(request, client_address)
+        except Exception:
+            self.handle_error(request, client_address)
+        finally:
+            self.shutdown_request(request)
+
+    def drain(self):
+        """Espera a que terminen las peticiones en curso"""
+        self._pool.shutdown(wait=True)
+
+
+def serve(args, fd=None):
+    """Atiende peticiones hasta recibir SIGTERM o SIGINT y cierra de forma ordenada"""
+    server = PooledWSGIServer(args.host, args.port, suite.app, args.threads, fd=fd)
+    if suite.MODULES_RELOAD:
+        # El hilo vigilante del proceso principal no sobrevive al fork
+        suite.watch_modules()
+    # Los hilos de fondo (informes programados...) tampoco: se arrancan en cada worker
+    suite.start_modules()
+
+    def stop(signum, frame):
+        # shutdown() espera al bucle de serve_forever: desde otro hilo
+        threading.Thread(target=server.shutdown, daemon=True).start()
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    server.serve_forever()
+    # Los flujos de /api/events no terminan solos: sin esto drain() esperaría para siempre
+    suite.EVENTS_STOP.set()
+    server.drain()
+    server.server_close()
+    suite.STORAGE.close()
+
+
+def spawn_worker(args, listener):
+    """Crea un proceso worker que atiende el socket compartido"""
+    pid = os.fork()
+    if pid:
+        return pid
+
+    # Proceso hijo
+    code = 0
+    try:
+        serve(args, fd=listener.fileno())
+    except BaseException as e:
+        print(f"❌ Worker {os.getpid()}: {e}", file=sys.stderr)
+        code = 1
+    finally:
+        # Sin volver a la pila del proceso principal ni repetir sus atexit
+        os._exit(code)
+
+
+def run_workers(args):
+    """Proceso principal: crea los workers, los repone si mueren y los para al salir"""
+    listener = socket.create_server((args.host, args.port), backlog=128)
+    listener.set_inheritable(True)
+
+    workers = {}
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    for _ in range(args.workers):
+        workers[spawn_worker(args, listener)] = time.monotonic()
+
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        started = workers.pop(pid, None)
+        if not stopping:
+            print(f"⚠️  Worker {pid} terminado (estado {status}), arrancando otro")
+            if started is not None and time.monotonic() - started < RESPAWN_DELAY:
+                # Un worker que falla al arrancar fallará otra vez: sin bucle de forks
+                time.sleep(RESPAWN_DELAY)
+            workers[spawn_worker(args, listener)] = time.monotonic()
+
+    listener.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Servidor de producción de Jocarsa Suite")
+    parser.add_argument("--host", default=os.environ.get("JOCARSA_HOST", "127.0.0.1"))
+    parser.add_argument("--port", type=int, default=int(os.environ.get("JOCARSA_PORT", "5000")))
+    parser.add_argument("--workers", type=int, default=int(os.environ.get("JOCARSA_WORKERS", os.cpu_count() or 1)),
+                        help="Procesos worker (por defecto uno por CPU)")
+    parser.add_argument("--threads", type=int, default=int(os.environ.get("JOCARSA_THREADS", "8")),
+                        help="Hilos por worker")
+    parser.add_argument("--event-streams", type=int, default=None,
+                        help="Flujos de /api/events abiertos a la vez por worker (por defecto la mitad de los hilos)")
+    parser.add_argument("--preload", action="store_true", default=os.environ.get("JOCARSA_PRELOAD") == "1",
+                        help="Importar todos los módulos antes de crear los workers")
+    args = parser.parse_args()
+
+    if args.event_streams is None:
+        env = os.environ.get("JOCARSA_EVENTS_MAX_STREAMS")
+        args.event_streams = int(env) if env else args.threads // 2
+    # Nunca todos los hilos: al menos uno queda para la API
+    suite.EVENTS_MAX_STREAMS = max(0, min(args.event_streams, args.threads - 1))
+
+    if args.workers > 1 and not hasattr(os, "fork"):
+        print("⚠️  Este sistema no permite crear procesos con fork: se usa un solo worker")
+        args.workers = 1
+    if args.workers > 1 and suite.STORAGE_BACKEND == "jsonlog":
+        # El log de operaciones vive en memoria de un único proceso
+        print("⚠️  El almacenamiento jsonlog admite un solo proceso: se usa un solo worker")
+        args.workers = 1
+
+    print("=" * 60)
+    print(" Jocarsa Suite - Servidor de producción")
+    print("=" * 60)
+    print(f"📦 Módulos cargados: {len(suite.BACKEND_MODULES)}")
+    print(f"💾 Almacenamiento: {suite.STORAGE_BACKEND}")
+    print(f"⚙️  Workers: {args.workers} x {args.threads} hilos ({suite.EVENTS_MAX_STREAMS} para eventos)")
+    print(f"🌐 Escuchando en http://{args.host}:{args.port}/")
+    print("=" * 60)
+
+    if args.preload:
+        suite.BACKEND_MODULES.load_all()
+
+    if args.workers == 1:
+        serve(args)
+    else:
+        run_workers(args)
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,11 @@
 const state = {
     modules: [],
     currentModule: null,
-    dashboardData: null
+    dashboardData: null,
+    // Datos ya cargados de cada módulo ({tipo: datos}), al día mientras live
+    moduleData: {},
+    // Conectado a /api/events: los cambios llegan solos y no hace falta recargar
+    live: false
 };
 
 // Inicializar aplicación
@@ -34,6 +38,11 @@ async function loadModules() {
         state.modules = data.modules;
         renderModules();
         
+        // Solo si el servidor ofrece eventos (tiene hilos para ellos)
+        if (data.events) {
+            connectEvents();
+        }
+        
         console.log(`✅ ${state.modules.length} módulos cargados`);
     } catch (error) {
         console.error("Error cargando módulos:", error);
@@ -102,10 +111,23 @@ async function selectModule(moduleType) {
     document.getElementById("dashboard-section").classList.remove("active");
     document.getElementById("module-section").classList.add("active");
     
-    // Cargar datos del módulo
-    await loadModuleData(moduleType);
+    // Cargar datos del módulo (si llegan los cambios por /api/events basta con los que ya hay)
+    if (state.live && state.moduleData[moduleType]) {
+        renderModuleContent(moduleType, state.moduleData[moduleType]);
+    } else {
+        await loadModuleData(moduleType);
+    }
 }
 
+// Colecciones y campos que necesita cada vista de módulo
+// (los módulos sin entrada reciben todos sus datos)
+const MODULE_QUERIES = {
+    crm: "collection=clientes,oportunidades",
+    proyectos: "collection=proyectos,tareas&fields=tareas.proyecto_id",
+    formularios: "collection=formularios",
+    informes: "collection=informes_generados"
+};
+
 /**
  * Carga los datos de un módulo específico
  */
@@ -114,11 +136,16 @@ async function loadModuleData(moduleType) {
     container.innerHTML = '<div class="loading">Cargando datos del módulo...</div>';
     
     try {
-        const response = await fetch(`/api/module/${moduleType}`);
+        const query = MODULE_QUERIES[moduleType];
+        const url = query ? `/api/module/${moduleType}?${query}` : `/api/module/${moduleType}`;
+        const response = await fetch(url);
         const result = await response.json();
         
         if (result.ok) {
-            renderModuleContent(moduleType, result.data);
+            state.moduleData[moduleType] = result.data;
+            if (state.currentModule === moduleType) {
+                renderModuleContent(moduleType, result.data);
+            }
         } else {
             showError(result.error || "Error cargando módulo");
         }
@@ -303,6 +330,8 @@ function renderInformesContent(data) {
                 <button class="btn" onclick="generarInforme('ventas')">💰 Informe de Ventas</button>
                 <button class="btn" onclick="generarInforme('proyectos')">📋 Informe de Proyectos</button>
                 <button class="btn" onclick="generarInforme('integracion')">🔗 Informe de Integración</button>
+                <button class="btn" onclick="generarInforme('ventas_mensual')">📅 Ventas por Mes</button>
+                <button class="btn" onclick="generarInforme('horas')">⏱️ Desviación de Horas</button>
             </div>
             <div style="margin-top: 1rem;">
     `;
@@ -360,13 +389,18 @@ function renderDashboard() {
         const module = state.modules.find(m => m.type === modSummary.module);
         if (!module) return;
         
+        // Un resumen obsoleto es el último conocido de un módulo que ha tardado demasiado
+        const stale = modSummary.stale
+            ? ' <small title="Datos no actualizados: el módulo ha tardado demasiado">⏳</small>'
+            : '';
+        
         html += `
             <div class="dashboard-card">
-                <h3>${module.icon} ${module.name}</h3>
+                <h3>${module.icon} ${module.name}${stale}</h3>
         `;
         
         // Renderizar estadísticas del módulo
-        const summary = modSummary.summary;
+        const summary = modSummary.summary || {};
         for (const [key, value] of Object.entries(summary)) {
             const label = key.replace(/_/g, ' ').replace(/\b\w/g, l => l.toUpperCase());
             html += `
@@ -397,8 +431,109 @@ function showDashboard() {
     
     state.currentModule = null;
     
-    // Recargar datos del dashboard
+    // Recargar datos del dashboard (conectados a /api/events ya están al día)
+    if (state.live) {
+        renderDashboard();
+    } else {
+        loadDashboard();
+    }
+}
+
+// Espera antes de volver a conectar si el servidor no admite más flujos de eventos
+const EVENTS_BUSY_RETRY_MS = 30000;
+
+/**
+ * Recibe los cambios de los módulos por Server-Sent Events
+ */
+function connectEvents(reconnect = false) {
+    if (!window.EventSource) return;
+    
+    const source = new EventSource("/api/events");
+    let reconnecting = reconnect;
+    
+    source.addEventListener("open", () => {
+        state.live = true;
+        // Lo que cambió mientras no había conexión se ha perdido: se vuelve a pedir todo
+        if (reconnecting) {
+            reloadAll();
+        }
+        reconnecting = false;
+    });
+    source.addEventListener("error", () => {
+        state.live = false;
+        reconnecting = true;
+        // Con el servidor lleno (503) el navegador no reintenta solo
+        if (source.readyState === EventSource.CLOSED) {
+            setTimeout(() => connectEvents(true), EVENTS_BUSY_RETRY_MS);
+        }
+    });
+    source.addEventListener("change", event => applyChange(JSON.parse(event.data)));
+    source.addEventListener("summary", event => applySummary(JSON.parse(event.data)));
+    // El servidor ha descartado eventos (conexión demasiado lenta)
+    source.addEventListener("reset", () => reloadAll());
+}
+
+/**
+ * Descarta los datos guardados y recarga el dashboard y el módulo actual
+ */
+function reloadAll() {
+    state.moduleData = {};
     loadDashboard();
+    if (state.currentModule) {
+        loadModuleData(state.currentModule);
+    }
+}
+
+/**
+ * Aplica un evento de cambio (alta, modificación o borrado) a los datos cargados
+ */
+function applyChange(change) {
+    const data = state.moduleData[change.module];
+    const records = data && data[change.collection];
+    if (!Array.isArray(records)) return;
+    
+    if (change.op === 'insert') {
+        if (!records.some(r => r.id === change.record.id)) {
+            records.push(change.record);
+        }
+    } else if (change.op === 'update') {
+        const record = records.find(r => r.id === change.record.id);
+        if (record) Object.assign(record, change.record);
+    } else if (change.op === 'delete') {
+        const ids = new Set(change.ids);
+        data[change.collection] = records.filter(r => !ids.has(r.id));
+    }
+    
+    if (state.currentModule === change.module) {
+        scheduleRender('module', () => renderModuleContent(change.module, state.moduleData[change.module]));
+    }
+}
+
+/**
+ * Sustituye el resumen de un módulo en el dashboard
+ */
+function applySummary(event) {
+    if (!state.dashboardData || !state.dashboardData.modules_summary) return;
+    
+    const entry = state.dashboardData.modules_summary.find(m => m.module === event.module);
+    if (!entry) return;
+    
+    entry.summary = event.summary;
+    entry.stale = false;
+    delete entry.error;
+    scheduleRender('dashboard', renderDashboard);
+}
+
+// Repintados pendientes: varios eventos seguidos se pintan una sola vez
+const pendingRenders = {};
+
+function scheduleRender(name, render) {
+    if (pendingRenders[name]) return;
+    pendingRenders[name] = true;
+    requestAnimationFrame(() => {
+        pendingRenders[name] = false;
+        render();
+    });
 }
 
 /**
@@ -462,8 +597,55 @@ function createFormulario() {
     });
 }
 
+// Intervalo y número máximo de consultas del estado de un informe en preparación
+const TRABAJO_POLL_MS = 1000;
+const TRABAJO_POLL_MAX = 300;
+
+/**
+ * Llama a una acción de un módulo y devuelve su resultado (o lanza el error)
+ */
+async function callModuleAction(moduleType, action, params) {
+    const response = await fetch(`/api/module/${moduleType}`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ action, params })
+    });
+    const result = await response.json();
+    if (!result.ok) throw new Error(result.error);
+    return result.result;
+}
+
+/**
+ * Encola la generación de un informe y consulta su trabajo hasta que termina
+ */
 async function generarInforme(tipo) {
-    await executeModuleAction('informes', 'generar_informe', { tipo });
+    try {
+        const { trabajo } = await callModuleAction('informes', 'generar_informe', { tipo });
+        
+        for (let i = 0; i < TRABAJO_POLL_MAX; i++) {
+            await new Promise(resolve => setTimeout(resolve, TRABAJO_POLL_MS));
+            const estado = await callModuleAction('informes', 'get_trabajo', { id: trabajo.id });
+            
+            if (estado.trabajo.estado === 'completado') {
+                alert("✅ Informe generado exitosamente");
+                if (!state.live) {
+                    if (state.currentModule === 'informes') {
+                        loadModuleData('informes');
+                    }
+                    loadDashboard();
+                }
+                return;
+            }
+            if (estado.trabajo.estado === 'error') {
+                showError(estado.trabajo.error);
+                return;
+            }
+        }
+        alert(`⏳ El informe sigue en preparación (trabajo ${trabajo.id})`);
+    } catch (error) {
+        console.error("Error:", error);
+        showError(error.message || "Error de conexión con el servidor");
+    }
 }
 
 /**
@@ -483,13 +665,16 @@ async function executeModuleAction(moduleType, action, params) {
             console.log("✅ Acción ejecutada:", result.result);
             alert("✅ " + (result.result.message || "Acción completada"));
             
-            // Recargar datos del módulo actual
-            if (state.currentModule === moduleType) {
-                loadModuleData(moduleType);
+            // Conectados a /api/events el cambio ya llega como evento; si no, se recarga
+            if (!state.live) {
+                // Recargar datos del módulo actual
+                if (state.currentModule === moduleType) {
+                    loadModuleData(moduleType);
+                }
+                
+                // Recargar dashboard
+                loadDashboard();
             }
-            
-            // Recargar dashboard
-            loadDashboard();
         } else {
             showError(result.error);
         }
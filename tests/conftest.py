@@ -0,0 +1,32 @@
+"""
+Pruebas de Jocarsa Suite
+Se ejecutan desde la raíz del proyecto con: python -m pytest
+"""
+
+import os
+import sys
+
+import pytest
+
+# Los módulos se importan como el paquete "modules" de la raíz del proyecto
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from modules._results import ResultCache  # noqa: E402
+from modules._storage import create_storage  # noqa: E402
+
+
+@pytest.fixture(params=["json", "sqlite"])
+def suite(request, tmp_path, monkeypatch):
+    """app.py sobre un almacenamiento nuevo en tmp_path (JSON y SQLite)"""
+    import app as suite
+
+    storage = create_storage(request.param, str(tmp_path))
+    monkeypatch.setattr(suite, "STORAGE_BACKEND", request.param)
+    monkeypatch.setattr(suite, "STORAGE", storage)
+    monkeypatch.setattr(suite, "DATA_DIR", str(tmp_path))
+    # Sin respuestas guardadas de otras pruebas
+    monkeypatch.setattr(suite, "RESPONSE_CACHE", ResultCache(max_entries=512, max_bytes=16 * 1024 * 1024))
+    try:
+        yield suite
+    finally:
+        storage.close()
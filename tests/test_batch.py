@@ -0,0 +1,78 @@
+"""
+Lotes de acciones (execute_batch en app.py): todas en una transacción, con
+resultado por acción; atomic aplica todas o ninguna y, sin él, más de
+MAX_BATCH_ERRORS acciones con excepción abortan el lote entero.
+"""
+
+ADD = {"action": "add_cliente", "params": {"nombre": "Nuevo"}}
+# Acción que el módulo rechaza devolviendo {"error": ...}
+NOT_FOUND = {"action": "update_estado_oportunidad", "params": {"id": 999, "estado": "ganada"}}
+# Acción que lanza una excepción dentro del módulo (params no es un diccionario)
+RAISES = {"action": "add_cliente", "params": ["no", "es", "un", "diccionario"]}
+
+
+def _batch(suite, actions, **options):
+    response = suite.app.test_client().post("/api/module/crm", json={
+        "action": "execute_batch", "params": dict(options, actions=actions)
+    })
+    return response.status_code, response.get_json()
+
+
+def _clientes(suite):
+    return [c["id"] for c in suite.STORAGE.iter_records("crm_clientes", "clientes")]
+
+
+def test_batch_reports_each_action(suite):
+    status, body = _batch(suite, [ADD, NOT_FOUND, RAISES, ADD])
+    assert status == 200
+    result = body["result"]
+    assert [r["ok"] for r in result["results"]] == [True, False, False, True]
+    assert result["results"][1]["error"] == "Oportunidad no encontrada"
+    assert result["applied"] == 2 and result["failed"] == 2
+    assert [r["result"]["cliente"]["id"] for r in result["results"] if r["ok"]] == [1, 2]
+
+    # Lo que hizo la acción descartada antes de fallar no queda guardado
+    assert _clientes(suite) == [1, 2]
+    assert suite.STORAGE.next_id("crm_clientes", "clientes") == 3
+
+
+def test_atomic_batch_applies_nothing_on_error(suite):
+    for failing in (NOT_FOUND, RAISES):
+        status, body = _batch(suite, [ADD, ADD, failing, ADD], atomic=True)
+        assert status == 400
+        assert body["ok"] is False
+        assert body["failed_index"] == 2
+    assert _clientes(suite) == []
+
+    status, body = _batch(suite, [ADD, ADD], atomic=True)
+    assert status == 200
+    assert body["result"]["applied"] == 2
+    assert _clientes(suite) == [1, 2]
+
+
+def test_too_many_exceptions_abort_the_batch(suite, monkeypatch):
+    monkeypatch.setattr(suite, "MAX_BATCH_ERRORS", 2)
+
+    # Hasta el límite se descartan y el resto se aplica
+    status, body = _batch(suite, [RAISES, ADD, RAISES])
+    assert status == 200
+    assert body["result"]["applied"] == 1
+
+    # Una más y no se aplica nada (las que devuelven error no cuentan)
+    status, body = _batch(suite, [ADD, RAISES, NOT_FOUND, RAISES, ADD, RAISES])
+    assert status == 400
+    assert body["failed_index"] == 5
+    assert _clientes(suite) == [1]
+
+
+def test_invalid_batches_are_rejected(suite, monkeypatch):
+    monkeypatch.setattr(suite, "MAX_BATCH_SIZE", 3)
+    assert _batch(suite, [ADD] * 4)[0] == 400
+    assert _batch(suite, "no es una lista")[0] == 400
+    assert _batch(suite, [ADD, "no es una acción"])[0] == 400
+
+    # Un lote dentro de otro se descarta como acción fallida
+    status, body = _batch(suite, [ADD, {"action": "execute_batch", "params": {"actions": [ADD]}}])
+    assert status == 200
+    assert [r["ok"] for r in body["result"]["results"]] == [True, False]
+    assert _clientes(suite) == [1]
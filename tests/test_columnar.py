@@ -0,0 +1,75 @@
+"""
+Analítica en columnas (modules/_columnar.py): mismos resultados con NumPy y
+en Python puro, y tablas reconstruidas cuando cambia el documento, también
+si se edita fuera de la suite.
+"""
+
+import json
+import os
+
+from modules import _columnar as columnar
+from modules import _storage
+from modules._storage import create_storage
+
+TAREAS = [
+    {"id": 1, "proyecto_id": 1, "estado": "completada", "tiempo_real": 3, "fecha_completada": "2026-01-10T09:00:00"},
+    {"id": 2, "proyecto_id": 2, "estado": "pendiente", "tiempo_real": 1.5},
+    {"id": 3, "proyecto_id": 1, "estado": "completada", "tiempo_real": "2", "fecha_completada": "2026-02-01T09:00:00"},
+    {"id": 4, "estado": None, "tiempo_real": True},
+    {"id": 5, "proyecto_id": 2, "estado": "completada", "tiempo_real": None, "fecha_completada": "2026-01-31T23:00:00"},
+]
+
+
+def _groups(tabla):
+    return (
+        tabla.group_sum("proyecto_id", "tiempo_real"),
+        tabla.group_sum("estado"),
+        tabla.group_sum("fecha_completada.mes", mask=tabla.mask("estado", ["completada"])),
+        tabla.sum("tiempo_real"),
+    )
+
+
+def _build(records):
+    return columnar.ColumnTable(records, numeric=("tiempo_real",), categorical=("proyecto_id", "estado"),
+                                months=("fecha_completada",))
+
+
+def test_numpy_and_pure_python_agree(monkeypatch):
+    # Lo que no es número (texto, booleanos, None) cuenta como 0
+    expected = (
+        {1: 3.0, 2: 1.5, None: 0.0},
+        {"completada": 3, "pendiente": 1, None: 1},
+        {"2026-01": 2, "2026-02": 1},
+        4.5,
+    )
+    assert _groups(_build(TAREAS)) == expected
+
+    monkeypatch.setattr(columnar, "np", None)
+    assert _groups(_build(TAREAS)) == expected
+
+
+def test_table_is_rebuilt_after_external_edit(tmp_path, monkeypatch):
+    # Se vuelve a comprobar el archivo en cada lectura
+    monkeypatch.setattr(_storage, "REVALIDATE_INTERVAL", 0)
+    storage = create_storage("json", str(tmp_path))
+    try:
+        for tarea in TAREAS[:2]:
+            storage.insert("proyectos", "tareas", dict(tarea))
+        first = columnar.table(storage, "proyectos", "tareas", numeric=("tiempo_real",))
+        assert columnar.table(storage, "proyectos", "tareas", numeric=("tiempo_real",)) is first
+        assert first.sum("tiempo_real") == 4.5
+
+        path = os.path.join(str(tmp_path), "proyectos.json")
+        with open(path, encoding="utf-8") as f:
+            data = json.load(f)
+        data["tareas"].append({"id": 9, "tiempo_real": 10})
+        stat = os.stat(path)
+        with open(path, "w", encoding="utf-8") as f:
+            json.dump(data, f)
+        os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+        again = columnar.table(storage, "proyectos", "tareas", numeric=("tiempo_real",))
+        assert again is not first
+        assert again.sum("tiempo_real") == 14.5
+    finally:
+        storage.close()
@@ -0,0 +1,100 @@
+"""
+Peticiones condicionales (app.py): GET /api/module/<name> y /api/dashboard
+responden 304 mientras los datos no cambian, la ETag cambia con cada
+escritura y la respuesta comprimida lleva su propia variante (-gzip).
+"""
+
+import gzip
+
+
+def _add_clientes(client, count):
+    for i in range(count):
+        response = client.post("/api/module/crm", json={
+            "action": "add_cliente", "params": {"nombre": f"Cliente {i}", "email": f"c{i}@example.com"}
+        })
+        assert response.status_code == 200
+
+
+def test_module_get_revalidates_with_etag(suite):
+    client = suite.app.test_client()
+    _add_clientes(client, 1)
+
+    first = client.get("/api/module/crm")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert first.headers["Cache-Control"] == "no-cache"
+
+    again = client.get("/api/module/crm", headers={"If-None-Match": etag})
+    assert again.status_code == 304
+    assert again.headers["ETag"] == etag
+    assert not again.data
+
+    # Otros argumentos, otra ETag
+    assert client.get("/api/module/crm?collection=clientes").headers["ETag"] != etag
+
+    # Una escritura cambia la ETag: la copia del cliente ya no vale
+    _add_clientes(client, 1)
+    changed = client.get("/api/module/crm", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    assert len(changed.get_json()["data"]["clientes"]) == 2
+
+
+def test_dashboard_revalidates_with_weak_etag(suite):
+    client = suite.app.test_client()
+    _add_clientes(client, 1)
+    # La primera vez se calculan (y guardan) los agregados de cada módulo
+    client.get("/api/dashboard")
+
+    first = client.get("/api/dashboard")
+    etag = first.headers["ETag"]
+    assert first.status_code == 200
+    assert etag.startswith('W/"')
+
+    assert client.get("/api/dashboard", headers={"If-None-Match": etag}).status_code == 304
+
+    _add_clientes(client, 1)
+    changed = client.get("/api/dashboard", headers={"If-None-Match": etag})
+    assert changed.status_code == 200
+    assert changed.headers["ETag"] != etag
+    crm = next(m for m in changed.get_json()["modules_summary"] if m["module"] == "crm")
+    assert crm["summary"]["total_clientes"] == 2
+
+
+def test_gzip_response_has_its_own_etag(suite):
+    client = suite.app.test_client()
+    # Lo bastante grande para que se comprima
+    _add_clientes(client, 30)
+
+    plain = client.get("/api/module/crm")
+    compressed = client.get("/api/module/crm", headers={"Accept-Encoding": "gzip"})
+    assert "Content-Encoding" not in plain.headers
+    assert compressed.headers["Content-Encoding"] == "gzip"
+
+    etag = plain.headers["ETag"]
+    gzip_etag = compressed.headers["ETag"]
+    assert gzip_etag == etag[:-1] + '-gzip"'
+    assert gzip.decompress(compressed.data) == plain.data
+
+    # Cualquiera de las dos variantes sirve para revalidar
+    for candidate in (etag, gzip_etag):
+        response = client.get("/api/module/crm", headers={"If-None-Match": candidate, "Accept-Encoding": "gzip"})
+        assert response.status_code == 304
+        assert response.headers["ETag"] == candidate
+        assert "Accept-Encoding" in response.headers["Vary"]
+
+    # Sin gzip aceptable (q=0) no se comprime
+    refused = client.get("/api/module/crm", headers={"Accept-Encoding": "gzip;q=0"})
+    assert "Content-Encoding" not in refused.headers
+    assert refused.headers["ETag"] == etag
+
+
+def test_modules_list_is_revalidated_while_watching(suite, monkeypatch):
+    client = suite.app.test_client()
+    monkeypatch.setattr(suite, "MODULES_MAX_AGE", 86400)
+    assert client.get("/api/modules").headers["Cache-Control"] == "public, max-age=86400"
+
+    # Con la recarga en caliente la lista puede cambiar en cualquier momento
+    monkeypatch.setattr(suite.BACKEND_MODULES, "watch", lambda interval: None)
+    suite.watch_modules()
+    assert client.get("/api/modules").headers["Cache-Control"] == "no-cache"
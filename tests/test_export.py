@@ -0,0 +1,80 @@
+"""
+Exportación NDJSON (GET /api/module/<name>/export en app.py y asgi.py): se
+comprime con gzip solo si el cliente lo acepta, con la misma negociación de
+Accept-Encoding que el resto de respuestas.
+"""
+
+import asyncio
+import gzip
+
+import pytest
+
+import asgi
+
+ACCEPT_ENCODING = [
+    ("gzip", True),
+    ("br;q=1.0, gzip;q=0.5", True),
+    ("*", True),
+    ("gzip;q=0", False),
+    ("x-gzip-whatever", False),
+    ("identity", False),
+    (None, False),
+]
+
+
+def _add_clientes(suite, count):
+    client = suite.app.test_client()
+    for i in range(count):
+        client.post("/api/module/crm", json={"action": "add_cliente", "params": {"nombre": f"Cliente {i}"}})
+
+
+def _lines(body, compressed):
+    return (gzip.decompress(body) if compressed else body).decode().splitlines()
+
+
+@pytest.mark.parametrize("accept_encoding, compressed", ACCEPT_ENCODING)
+def test_export_negotiates_gzip(suite, accept_encoding, compressed):
+    _add_clientes(suite, 3)
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding is not None else {}
+
+    response = suite.app.test_client().get("/api/module/crm/export?collection=clientes", headers=headers)
+    assert response.status_code == 200
+    assert (response.headers.get("Content-Encoding") == "gzip") is compressed
+    assert len(_lines(response.data, compressed)) == 3
+
+
+def test_export_gzip_parameter_forces_compression(suite):
+    _add_clientes(suite, 2)
+    response = suite.app.test_client().get("/api/module/crm/export?collection=clientes&gzip=1",
+                                           headers={"Accept-Encoding": "identity"})
+    assert response.headers["Content-Encoding"] == "gzip"
+    assert len(_lines(response.data, True)) == 2
+
+
+def _asgi_get(path, query, headers):
+    """Respuesta (estado, cabeceras, cuerpo) de una petición GET a asgi.application"""
+    scope = {"type": "http", "method": "GET", "path": path, "query_string": query.encode(),
+             "headers": [(name.lower().encode(), value.encode()) for name, value in headers.items()]}
+    messages = []
+
+    async def receive():
+        return {"type": "http.request", "body": b"", "more_body": False}
+
+    async def send(message):
+        messages.append(message)
+
+    asyncio.run(asgi.application(scope, receive, send))
+    start = messages[0]
+    body = b"".join(m.get("body", b"") for m in messages[1:])
+    return start["status"], dict(start["headers"]), body
+
+
+@pytest.mark.parametrize("accept_encoding, compressed", ACCEPT_ENCODING)
+def test_asgi_export_negotiates_gzip(suite, accept_encoding, compressed):
+    _add_clientes(suite, 3)
+    headers = {"Accept-Encoding": accept_encoding} if accept_encoding is not None else {}
+
+    status, response_headers, body = _asgi_get("/api/module/crm/export", "collection=clientes", headers)
+    assert status == 200
+    assert (response_headers.get(b"content-encoding") == b"gzip") is compressed
+    assert len(_lines(body, compressed)) == 3
@@ -0,0 +1,111 @@
+"""
+Respuestas de formularios repartidas en shards (modules/formularios.py): las
+que versiones anteriores guardaban en el documento principal se mueven a su
+shard sin perder ninguna y sin repetir ids.
+"""
+
+import json
+import os
+
+import pytest
+
+from modules import formularios
+from modules._storage import create_storage, shard_document
+
+BACKENDS = ["json", "jsonlog", "sqlite"]
+
+FORMULARIOS = [
+    {"id": 1, "titulo": "Contacto", "activo": True, "respuestas_count": 3},
+    {"id": 2, "titulo": "Encuesta", "activo": True, "respuestas_count": 1},
+    {"id": 3, "titulo": "Sin respuestas", "activo": False, "respuestas_count": 0},
+]
+
+RESPUESTAS = [
+    {"id": 1, "formulario_id": 1, "respuestas": {"nombre": "a"}, "usuario": "Anónimo"},
+    {"id": 2, "formulario_id": 2, "respuestas": {"nombre": "b"}, "usuario": "Anónimo"},
+    {"id": 4, "formulario_id": 1, "respuestas": {"nombre": "c"}, "usuario": "Anónimo"},
+    {"id": 5, "formulario_id": 1, "respuestas": {"nombre": "d"}, "usuario": "Anónimo"},
+]
+
+
+def _execute(storage, data_dir, action, params):
+    return formularios.execute({"storage": storage, "DATA_DIR": data_dir, "session": {},
+                                "action": action, "params": params})
+
+
+def _write_legacy(backend, data_dir):
+    """Documento principal con formularios y respuestas, como en versiones anteriores"""
+    storage = create_storage(backend, data_dir)
+    try:
+        with storage.transaction():
+            for formulario in FORMULARIOS:
+                storage.insert("formularios", "formularios", dict(formulario))
+            for respuesta in RESPUESTAS:
+                storage.insert("formularios", "respuestas", dict(respuesta))
+    finally:
+        storage.close()
+
+
+def _check_migrated(storage, data_dir, next_expected):
+    # La primera acción del módulo reparte las respuestas: cada una en el
+    # shard de su formulario y ninguna en el documento principal
+    for formulario_id in (1, 2, 3):
+        expected = [r for r in RESPUESTAS if r["formulario_id"] == formulario_id]
+        found = _execute(storage, data_dir, "get_respuestas", {"formulario_id": formulario_id})["respuestas"]
+        assert found == expected
+    assert storage.count("formularios", "respuestas") == 0
+    counts = {shard: storage.count(shard, "respuestas") for shard in storage.shards("formularios", "respuestas")}
+    # (SQLite crea al consultarla la tabla vacía del shard del formulario 3)
+    assert {shard: n for shard, n in counts.items() if n} == {
+        shard_document("formularios", "respuestas", 1): 3,
+        shard_document("formularios", "respuestas", 2): 1,
+    }
+
+    # Las nuevas respuestas siguen la numeración anterior
+    respuesta = _execute(storage, data_dir, "submit_respuesta", {"formulario_id": 2})["respuesta"]
+    assert respuesta["id"] == next_expected
+    assert [r["id"] for r in _execute(storage, data_dir, "get_respuestas", {"formulario_id": 2})["respuestas"]] == [2, next_expected]
+
+    # El resumen cuenta las respuestas de todos los shards
+    summary = formularios.get_summary({"storage": storage, "DATA_DIR": data_dir})
+    assert summary["total_respuestas"] == len(RESPUESTAS) + 1
+    assert summary["formulario_popular"] == "Contacto"
+    assert summary["respuestas_popular"] == 3
+    assert storage.get("formularios", "formularios", 2)["respuestas_count"] == 2
+    assert _execute(storage, data_dir, "rebuild_aggregates", {})["drift"] == {}
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+def test_legacy_respuestas_move_to_shards(tmp_path, backend):
+    data_dir = str(tmp_path)
+    _write_legacy(backend, data_dir)
+
+    storage = create_storage(backend, data_dir)
+    try:
+        _check_migrated(storage, data_dir, next_expected=7)
+    finally:
+        storage.close()
+
+    # Al volver a abrir no queda nada por migrar y el contador se conserva
+    storage = create_storage(backend, data_dir)
+    try:
+        assert storage.count("formularios", "respuestas") == 0
+        assert _execute(storage, data_dir, "submit_respuesta", {"formulario_id": 3})["respuesta"]["id"] == 8
+        assert sum(storage.count(shard, "respuestas") for shard in storage.shards("formularios", "respuestas")) == 6
+    finally:
+        storage.close()
+
+
+@pytest.mark.parametrize("backend", ["json", "jsonlog"])
+def test_legacy_sequence_is_kept(tmp_path, backend):
+    # Archivo con contador de ids por encima del id máximo (respuestas borradas)
+    data_dir = str(tmp_path)
+    with open(os.path.join(data_dir, "formularios.json"), "w", encoding="utf-8") as f:
+        json.dump({"formularios": FORMULARIOS, "respuestas": RESPUESTAS,
+                   "_meta": {"sequences": {"formularios": 3, "respuestas": 10}}}, f)
+
+    storage = create_storage(backend, data_dir)
+    try:
+        _check_migrated(storage, data_dir, next_expected=12)
+    finally:
+        storage.close()
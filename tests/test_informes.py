@@ -0,0 +1,233 @@
+"""
+Informes (modules/informes.py): los informes calculados con los agregados
+que mantiene cada módulo coinciden con los de la versión anterior, que
+recorría todos los registros de los documentos, y no se sirven de la caché
+datos que han cambiado fuera de la suite.
+"""
+
+import json
+import os
+import random
+from collections import defaultdict
+
+import pytest
+
+from modules import crm, proyectos, formularios, informes
+from modules import _storage
+from modules._storage import create_storage
+
+BACKENDS = ["json", "jsonlog", "sqlite"]
+TIPOS = ["general", "ventas", "proyectos", "integracion"]
+
+
+def _informe_anterior(storage, tipo):
+    """Contenido del informe como lo calculaba la versión anterior de generar_informe"""
+    crm_data = storage.load("crm_clientes")
+    proyectos_data = storage.load("proyectos")
+    formularios_data = storage.load("formularios")
+
+    if tipo == "general":
+        return {
+            "tipo": "Informe General",
+            "clientes_totales": len(crm_data.get("clientes", [])),
+            "proyectos_totales": len(proyectos_data.get("proyectos", [])),
+            "formularios_activos": len([f for f in formularios_data.get("formularios", []) if f.get("activo")]),
+            "oportunidades_abiertas": len([o for o in crm_data.get("oportunidades", []) if o.get("estado") in ["abierta", "en_proceso"]]),
+        }
+
+    if tipo == "ventas":
+        oportunidades = crm_data.get("oportunidades", [])
+        total_pipeline = sum(o.get("valor", 0) for o in oportunidades if o.get("estado") in ["abierta", "en_proceso"])
+        ganadas = [o for o in oportunidades if o.get("estado") == "ganada"]
+        total_ganado = sum(o.get("valor", 0) for o in ganadas)
+        return {
+            "tipo": "Informe de Ventas",
+            "total_oportunidades": len(oportunidades),
+            "valor_pipeline": total_pipeline,
+            "oportunidades_ganadas": len(ganadas),
+            "valor_ganado": total_ganado,
+            "tasa_conversion": (len(ganadas) / len(oportunidades) * 100) if oportunidades else 0
+        }
+
+    if tipo == "proyectos":
+        lista = proyectos_data.get("proyectos", [])
+        tareas = proyectos_data.get("tareas", [])
+        estados_proyectos = defaultdict(int)
+        for p in lista:
+            estados_proyectos[p.get("estado", "sin_estado")] += 1
+        total_horas_estimadas = sum(t.get("tiempo_estimado", 0) for t in tareas)
+        total_horas_reales = sum(t.get("tiempo_real", 0) for t in tareas)
+        return {
+            "tipo": "Informe de Proyectos",
+            "total_proyectos": len(lista),
+            "estados": dict(estados_proyectos),
+            "total_tareas": len(tareas),
+            "horas_estimadas": total_horas_estimadas,
+            "horas_reales": total_horas_reales,
+            "desviacion_tiempo": total_horas_reales - total_horas_estimadas
+        }
+
+    if tipo == "integracion":
+        clientes = crm_data.get("clientes", [])
+        lista = proyectos_data.get("proyectos", [])
+        forms = formularios_data.get("formularios", [])
+        clientes_con_proyectos = len(set(p.get("cliente_id") for p in lista if p.get("cliente_id")))
+        return {
+            "tipo": "Informe de Integración",
+            "clientes_totales": len(clientes),
+            "clientes_con_proyectos": clientes_con_proyectos,
+            "proyectos_totales": len(lista),
+            "formularios_vinculados_crm": len([f for f in forms if f.get("cliente_id")]),
+            "formularios_vinculados_proyectos": len([f for f in forms if f.get("proyecto_id")]),
+            "tasa_integracion_clientes": (clientes_con_proyectos / len(clientes) * 100) if clientes else 0
+        }
+
+    raise ValueError(tipo)
+
+
+def _seed(storage):
+    """Proyectos editados a mano: con estado None, sin estado y con otro estado"""
+    for extra in ({"estado": None}, {}, {"estado": "en_proceso", "cliente_id": 1}):
+        storage.insert("proyectos", "proyectos", dict(extra, id=storage.next_id("proyectos", "proyectos"), nombre="a mano"))
+
+
+def _random_actions(storage, data_dir, rng, count):
+    """Secuencia aleatoria de acciones de crm, proyectos y formularios"""
+    ids = defaultdict(list)
+
+    def run(module, action, params):
+        result = module.execute({"storage": storage, "DATA_DIR": data_dir, "session": {},
+                                 "action": action, "params": params})
+        assert "error" not in result, result
+        return result
+
+    for _ in range(count):
+        choice = rng.randrange(9)
+        if choice == 0 or not ids["clientes"]:
+            ids["clientes"].append(run(crm, "add_cliente", {"nombre": "c"})["cliente"]["id"])
+        elif choice == 1:
+            ids["oportunidades"].append(run(crm, "add_oportunidad", {
+                "cliente_id": rng.choice(ids["clientes"]), "valor": rng.randrange(0, 5000)
+            })["oportunidad"]["id"])
+        elif choice == 2 and ids["oportunidades"]:
+            run(crm, "update_estado_oportunidad", {
+                "id": rng.choice(ids["oportunidades"]),
+                "estado": rng.choice(["abierta", "en_proceso", "ganada", "perdida"])
+            })
+        elif choice == 3:
+            ids["proyectos"].append(run(proyectos, "add_proyecto", {
+                "cliente_id": rng.choice(ids["clientes"] + [None])
+            })["proyecto"]["id"])
+        elif choice == 4 and ids["proyectos"]:
+            ids["tareas"].append(run(proyectos, "add_tarea", {
+                "proyecto_id": rng.choice(ids["proyectos"]), "tiempo_estimado": rng.randrange(0, 40) / 2
+            })["tarea"]["id"])
+        elif choice == 5 and ids["tareas"]:
+            run(proyectos, "update_tarea_estado", {
+                "id": rng.choice(ids["tareas"]), "estado": rng.choice(["pendiente", "en_proceso", "completada"])
+            })
+        elif choice == 6 and ids["tareas"]:
+            run(proyectos, "registrar_tiempo", {"id": rng.choice(ids["tareas"]), "horas": rng.randrange(1, 16) / 2})
+        elif choice == 7:
+            ids["formularios"].append(run(formularios, "create_formulario", {
+                "cliente_id": rng.choice(ids["clientes"] + [None]),
+                "proyecto_id": rng.choice(ids["proyectos"] + [None])
+            })["formulario"]["id"])
+        elif choice == 8 and ids["formularios"]:
+            run(formularios, "toggle_formulario", {"id": rng.choice(ids["formularios"])})
+
+
+def _assert_equivalent(storage):
+    for tipo in TIPOS:
+        assert informes._calcular_contenido(storage, tipo) == _informe_anterior(storage, tipo), tipo
+
+
+@pytest.mark.parametrize("backend", BACKENDS)
+@pytest.mark.parametrize("seed", [1, 2, 3])
+def test_reports_match_previous_implementation(tmp_path, backend, seed):
+    data_dir = str(tmp_path)
+    storage = create_storage(backend, data_dir)
+    try:
+        _seed(storage)
+        _assert_equivalent(storage)
+
+        # Los agregados se mantienen al día con cada acción
+        _random_actions(storage, data_dir, random.Random(seed), 300)
+        _assert_equivalent(storage)
+    finally:
+        storage.close()
+
+    # Y los persistidos siguen coincidiendo al volver a abrir el almacenamiento
+    storage = create_storage(backend, data_dir)
+    try:
+        _assert_equivalent(storage)
+    finally:
+        storage.close()
+
+
+def test_estado_none_and_missing_are_kept_apart(tmp_path):
+    storage = create_storage("json", str(tmp_path))
+    try:
+        _seed(storage)
+        estados = informes._calcular_contenido(storage, "proyectos")["estados"]
+        assert estados == {None: 1, "sin_estado": 1, "en_proceso": 1}
+    finally:
+        storage.close()
+
+
+def _edit_by_hand(data_dir, document, edit):
+    """Modifica el archivo de un documento fuera de la suite, como un editor"""
+    path = os.path.join(data_dir, f"{document}.json")
+    with open(path, encoding="utf-8") as f:
+        data = json.load(f)
+    edit(data)
+    stat = os.stat(path)
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(data, f)
+    # Con otra fecha aunque el sistema de archivos tenga poca resolución
+    os.utime(path, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10 ** 9))
+
+
+def test_report_cache_sees_external_edits(tmp_path, monkeypatch):
+    # Se vuelve a comprobar el archivo en cada lectura
+    monkeypatch.setattr(_storage, "REVALIDATE_INTERVAL", 0)
+    data_dir = str(tmp_path)
+    storage = create_storage("json", data_dir)
+    try:
+        crm.execute({"storage": storage, "action": "add_cliente", "params": {"nombre": "a"}})
+        first = informes._generar_informe(storage, "integracion", {}, "prueba")
+        assert first["informe"]["contenido"]["clientes_totales"] == 1
+        assert informes._generar_informe(storage, "integracion", {}, "prueba")["cache"]["hit"]
+
+        # El contador de versiones no cambia, pero sí el archivo
+        version = storage.version("crm_clientes")
+        _edit_by_hand(data_dir, "crm_clientes", lambda data: data["clientes"].append({"id": 2, "nombre": "b"}))
+        assert storage.version("crm_clientes") == version
+
+        again = informes._generar_informe(storage, "integracion", {}, "prueba")
+        assert not again["cache"]["hit"]
+        assert again["informe"]["contenido"]["clientes_totales"] == 2
+    finally:
+        storage.close()
+
+
+def test_aggregates_follow_external_edits(tmp_path, monkeypatch):
+    monkeypatch.setattr(_storage, "REVALIDATE_INTERVAL", 0)
+    data_dir = str(tmp_path)
+    storage = create_storage("json", data_dir)
+    try:
+        context = {"storage": storage, "DATA_DIR": data_dir, "session": {}}
+        crm.execute(dict(context, action="add_cliente", params={"nombre": "a"}))
+        assert crm.get_summary(context)["total_oportunidades"] == 0
+
+        _edit_by_hand(data_dir, "crm_clientes", lambda data: data["oportunidades"].extend([
+            {"id": 1, "cliente_id": 1, "valor": 100, "estado": "abierta"},
+            {"id": 2, "cliente_id": 1, "valor": 50, "estado": "ganada"},
+        ]))
+
+        # Los agregados guardados en el archivo se recalculan al releerlo
+        assert crm.get_summary(context)["total_oportunidades"] == 2
+        _assert_equivalent(storage)
+        assert crm.execute(dict(context, action="rebuild_aggregates", params={}))["drift"] == {}
+    finally:
+        storage.close()
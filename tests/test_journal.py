@@ -0,0 +1,150 @@
+"""
+Almacenamiento JSON con log de operaciones (modules/_journal.py): el estado
+se reconstruye como archivo + log, una escritura interrumpida se descarta y
+una compactación interrumpida no aplica dos veces la misma operación.
+"""
+
+import os
+import shutil
+
+from modules import _serializer as serializer
+from modules._journal import JournaledJsonStorage
+
+DOCUMENT = "proyectos"
+
+
+def _storage(data_dir):
+    # Sin compactaciones automáticas durante la prueba
+    return JournaledJsonStorage(str(data_dir), compact_every=10 ** 6, compact_interval=3600)
+
+
+def _abandon(storage):
+    """Deja el almacenamiento como tras una caída: sin compactar lo pendiente"""
+    storage._stop.set()
+    storage._wake.set()
+    if storage._compactor is not None:
+        storage._compactor.join()
+    for state in storage._states.values():
+        if state.log_file is not None:
+            state.log_file.close()
+            state.log_file = None
+
+
+def _write_sample(storage):
+    """Varias transacciones con altas, cambios y bajas"""
+    with storage.transaction():
+        for i in range(1, 6):
+            storage.insert(DOCUMENT, "tareas", {"id": storage.next_id(DOCUMENT, "tareas"),
+                                                "proyecto_id": i % 2, "titulo": f"t{i}"})
+    storage.update(DOCUMENT, "tareas", 2, {"proyecto_id": 7})
+    storage.delete(DOCUMENT, "tareas", [3])
+    storage.insert(DOCUMENT, "proyectos", {"id": storage.next_id(DOCUMENT, "proyectos"), "nombre": "p"})
+
+
+def _snapshot(storage):
+    return {collection: [dict(r) for r in records] for collection, records in storage.load(DOCUMENT).items()}
+
+
+def _log_path(data_dir):
+    return os.path.join(str(data_dir), f"{DOCUMENT}.log")
+
+
+def test_replay_rebuilds_state_from_log(tmp_path):
+    storage = _storage(tmp_path)
+    _write_sample(storage)
+    expected = _snapshot(storage)
+    _abandon(storage)
+
+    # Nada compactado: todo está en el log
+    assert not os.path.exists(os.path.join(str(tmp_path), f"{DOCUMENT}.json"))
+
+    recovered = _storage(tmp_path)
+    assert _snapshot(recovered) == expected
+    assert [r["id"] for r in recovered.load(DOCUMENT)["tareas"]] == [1, 2, 4, 5]
+    assert [r["id"] for r in recovered.find(DOCUMENT, "tareas", "proyecto_id", 7)] == [2]
+    # Los contadores de ids también se recuperan
+    assert recovered.next_id(DOCUMENT, "tareas") == 6
+    recovered.close()
+
+
+def test_torn_last_line_is_discarded(tmp_path):
+    storage = _storage(tmp_path)
+    _write_sample(storage)
+    expected = _snapshot(storage)
+    _abandon(storage)
+
+    log_path = _log_path(tmp_path)
+    good_size = os.path.getsize(log_path)
+    with open(log_path, "ab") as f:
+        f.write(b'{"seq":99,"ops":[{"op":"insert","collection":"tareas","record":{"id":')
+
+    recovered = _storage(tmp_path)
+    assert _snapshot(recovered) == expected
+    # La línea incompleta se quita del log y las nuevas escrituras siguen detrás
+    assert os.path.getsize(log_path) == good_size
+
+    recovered.insert(DOCUMENT, "tareas", {"id": recovered.next_id(DOCUMENT, "tareas"), "titulo": "nueva"})
+    expected = _snapshot(recovered)
+    _abandon(recovered)
+
+    again = _storage(tmp_path)
+    assert _snapshot(again) == expected
+    again.close()
+
+
+def test_compaction_writes_file_and_empties_log(tmp_path):
+    storage = _storage(tmp_path)
+    _write_sample(storage)
+    seq = storage._state(DOCUMENT).seq
+    storage.compact(DOCUMENT)
+
+    with open(os.path.join(str(tmp_path), f"{DOCUMENT}.json"), "rb") as f:
+        on_disk = serializer.loads(f.read())
+    assert on_disk["_journal"] == {"seq": seq}
+    assert [r["id"] for r in on_disk["tareas"]] == [1, 2, 4, 5]
+    assert not os.path.exists(_log_path(tmp_path))
+    assert not storage._rotated_logs(DOCUMENT)
+
+    # Lo escrito después de compactar va a un log nuevo
+    storage.update(DOCUMENT, "tareas", 1, {"titulo": "cambiada"})
+    expected = _snapshot(storage)
+    _abandon(storage)
+
+    recovered = _storage(tmp_path)
+    assert _snapshot(recovered) == expected
+    recovered.close()
+
+
+def test_interrupted_compaction_does_not_apply_twice(tmp_path):
+    storage = _storage(tmp_path)
+    _write_sample(storage)
+    log_path = _log_path(tmp_path)
+    # Copia del log con operaciones que la compactación ya incluye en el archivo
+    shutil.copy(log_path, f"{log_path}.saved")
+    compacted_seq = storage._state(DOCUMENT).seq
+    storage.compact(DOCUMENT)
+
+    storage.insert(DOCUMENT, "tareas", {"id": storage.next_id(DOCUMENT, "tareas"), "titulo": "t6"})
+    storage.update(DOCUMENT, "tareas", 4, {"titulo": "t4b"})
+    expected = _snapshot(storage)
+    last_seq = storage._state(DOCUMENT).seq
+    _abandon(storage)
+
+    # Compactación interrumpida: el log actual rotado sin llegar a escribir
+    # el archivo, y un log rotado antiguo que no se llegó a borrar
+    os.replace(log_path, f"{log_path}.{last_seq}")
+    os.replace(f"{log_path}.saved", f"{log_path}.{compacted_seq}")
+
+    recovered = _storage(tmp_path)
+    assert _snapshot(recovered) == expected
+    assert [r["id"] for r in recovered.load(DOCUMENT)["tareas"]] == [1, 2, 4, 5, 6]
+    assert recovered._state(DOCUMENT).seq == last_seq
+
+    # La siguiente compactación deja un solo archivo con todo y borra los logs rotados
+    recovered.compact(DOCUMENT)
+    assert not recovered._rotated_logs(DOCUMENT)
+    recovered.close()
+
+    final = _storage(tmp_path)
+    assert _snapshot(final) == expected
+    final.close()
@@ -0,0 +1,83 @@
+"""
+Bloqueos entre procesos (modules/_locks.py): varios procesos escribiendo en
+el mismo data_dir no pierden escrituras ni repiten ids.
+"""
+
+import os
+import multiprocessing
+
+import pytest
+
+from modules._locks import InterProcessLock
+from modules._storage import create_storage
+
+PROCESSES = 4
+WRITES = 50
+
+pytestmark = pytest.mark.skipif(not hasattr(os, "fork"), reason="necesita procesos con fork")
+
+
+def _context():
+    return multiprocessing.get_context("fork")
+
+
+def _run(target, *args):
+    processes = [_context().Process(target=target, args=args) for _ in range(PROCESSES)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join(60)
+        assert process.exitcode == 0
+
+
+def _increment(lock_path, counter_path):
+    # Leer, esperar y escribir: sin el bloqueo se perderían incrementos
+    lock = InterProcessLock(lock_path)
+    for _ in range(WRITES):
+        lock.acquire()
+        try:
+            with open(counter_path) as f:
+                value = int(f.read())
+            os.sched_yield()
+            with open(counter_path, "w") as f:
+                f.write(str(value + 1))
+        finally:
+            lock.release()
+
+
+def test_inter_process_lock_serializes_updates(tmp_path):
+    counter_path = str(tmp_path / "counter")
+    with open(counter_path, "w") as f:
+        f.write("0")
+
+    _run(_increment, str(tmp_path / ".lock"), counter_path)
+
+    with open(counter_path) as f:
+        assert int(f.read()) == PROCESSES * WRITES
+
+
+def _insert(backend, data_dir):
+    # Cada proceso abre su propio almacenamiento, como un worker de serve.py
+    storage = create_storage(backend, data_dir)
+    try:
+        for _ in range(WRITES):
+            with storage.transaction():
+                record_id = storage.next_id("crm_clientes", "clientes")
+                storage.insert("crm_clientes", "clientes", {"id": record_id, "pid": os.getpid()})
+    finally:
+        storage.close()
+
+
+@pytest.mark.parametrize("backend", ["json", "sqlite"])
+def test_ids_are_unique_across_processes(tmp_path, backend):
+    data_dir = str(tmp_path)
+    _run(_insert, backend, data_dir)
+
+    storage = create_storage(backend, data_dir)
+    try:
+        ids = [record["id"] for record in storage.iter_records("crm_clientes", "clientes")]
+        assert sorted(ids) == list(range(1, PROCESSES * WRITES + 1))
+        assert len({record["pid"] for record in storage.iter_records("crm_clientes", "clientes")}) == PROCESSES
+        assert storage.next_id("crm_clientes", "clientes") == PROCESSES * WRITES + 1
+    finally:
+        storage.close()